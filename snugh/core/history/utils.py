@@ -1,26 +1,31 @@
-
+from collections import Counter
 from core.major.models import Major
 from core.requirement.models import Requirement
 from core.lecture.models import SemesterLecture
 from core.history.models import LectureTypeChangeHistory, CreditChangeHistory, RequirementChangeHistory
 from core.lecture.const import *
 from datetime import date
-from typing import List
+from django.db.models import Q
+from functools import reduce
+from operator import or_
+from typing import Iterable, List, Tuple
 from user.models import User
 
+# Fields identifying a history row of an entrance year.
+LECTURETYPE_HISTORY_FIELDS = ('major_id', 'lecture_id', 'past_lecture_type', 'curr_lecture_type')
+CREDIT_HISTORY_FIELDS = ('major_id', 'lecture_id', 'year_taken', 'past_credit', 'curr_credit')
 
-def lecturetype_history_generator(
-    user: User, 
+
+def lecturetype_history_keys(
     semesterlecture: SemesterLecture, 
     lecture_type: str,
+    none_major: Major,
     curr_recognized_majors: List[Major] = [],
     curr_lecture_types: List[str] = []
-    ) -> bool:
-    """Generate lecture type change history."""
-    none_major = Major.objects.get(id=DEFAULT_MAJOR_ID)
-    user_entrance = user.userprofile.entrance_year
-    lecture = semesterlecture.lecture
-    histories = []
+    ) -> List[Tuple[int, int, str, str]]:
+    """Keys of LECTURETYPE_HISTORY_FIELDS of lecture type change histories of semester lecture."""
+    lecture_id = semesterlecture.lecture_id
+    keys = []
     if lecture_type in [GENERAL, GENERAL_ELECTIVE]:
         recognized_majors = [none_major, semesterlecture.recognized_major1, semesterlecture.recognized_major2]
         past_lecture_types = [NONE, semesterlecture.lecture_type1, semesterlecture.lecture_type2]
@@ -32,15 +37,7 @@ def lecturetype_history_generator(
             curr_lecture_type = curr_lecture_types[i]
 
             if i==0 or recognized_major != none_major:
-                lecturetypechangehistory, _ = LectureTypeChangeHistory.objects.get_or_create(
-                    major=recognized_major,
-                    lecture=lecture,
-                    entrance_year=user_entrance,
-                    past_lecture_type=past_lecture_type,
-                    curr_lecture_type=curr_lecture_type)
-                lecturetypechangehistory.change_count += 1
-                lecturetypechangehistory.updated_at = date.today()
-                histories.append(lecturetypechangehistory)
+                keys.append((recognized_major.id, lecture_id, past_lecture_type, curr_lecture_type))
 
     elif lecture_type in [MAJOR_ELECTIVE, MAJOR_REQUIREMENT]:
 
@@ -56,67 +53,80 @@ def lecturetype_history_generator(
                         curr_recognized_major_check[j] = True
                         past_recognized_major_check[i] = True
                         if past_lecture_types[i] != curr_lecture_types[j] and past_recognized_major != none_major:
-                            lecturetypechangehistory, _ = LectureTypeChangeHistory.objects.get_or_create(
-                                major=past_recognized_major,
-                                lecture=lecture,
-                                entrance_year=user_entrance,
-                                past_lecture_type=past_lecture_types[i],
-                                curr_lecture_type=curr_lecture_types[j])
-                            lecturetypechangehistory.change_count += 1
-                            lecturetypechangehistory.updated_at = date.today()
-                            histories.append(lecturetypechangehistory)
+                            keys.append((past_recognized_major.id, lecture_id, past_lecture_types[i], curr_lecture_types[j]))
 
             if not (past_recognized_major_check[i] or past_lecture_types[i] in [NONE, GENERAL_ELECTIVE]):
-                lecturetypechangehistory, _ = LectureTypeChangeHistory.objects.get_or_create(
-                    major=past_recognized_major,
-                    lecture=lecture,
-                    entrance_year=user_entrance,
-                    past_lecture_type=past_lecture_types[i],
-                    curr_lecture_type=NONE)
-                lecturetypechangehistory.change_count += 1
-                lecturetypechangehistory.updated_at = date.today()
-                histories.append(lecturetypechangehistory)
+                keys.append((past_recognized_major.id, lecture_id, past_lecture_types[i], NONE))
 
         for i, curr_recognized_major in enumerate(curr_recognized_majors):
             if not (curr_recognized_major_check[i] or curr_lecture_types[i] in [NONE, GENERAL_ELECTIVE]):
-                lecturetypechangehistory, _ = LectureTypeChangeHistory.objects.get_or_create(
-                    major=curr_recognized_major,
-                    lecture=lecture,
-                    entrance_year=user_entrance,
-                    past_lecture_type=NONE,
-                    curr_lecture_type=curr_lecture_types[i])
-                lecturetypechangehistory.change_count += 1
-                lecturetypechangehistory.updated_at = date.today()
-                histories.append(lecturetypechangehistory)
-                
-    LectureTypeChangeHistory.objects.bulk_update(histories, fields=['change_count', 'updated_at'])
-    return True
+                keys.append((curr_recognized_major.id, lecture_id, NONE, curr_lecture_types[i]))
+    # A history is counted once per change, even if it is found twice.
+    return list(dict.fromkeys(keys))
 
 
-def credit_history_generator(user: User, semesterlecture: SemesterLecture, credit: int) -> bool:
-    """Create semester lecture credit change histroy"""
+def lecturetype_history_generator(
+    user: User, 
+    semesterlecture: SemesterLecture, 
+    lecture_type: str,
+    curr_recognized_majors: List[Major] = [],
+    curr_lecture_types: List[str] = []
+    ) -> bool:
+    """Generate lecture type change history."""
     none_major = Major.objects.get(id=DEFAULT_MAJOR_ID)
-    user_entrance = user.userprofile.entrance_year
+    keys = lecturetype_history_keys(semesterlecture, lecture_type, none_major, curr_recognized_majors, curr_lecture_types)
+    count_histories(LectureTypeChangeHistory, LECTURETYPE_HISTORY_FIELDS, user.userprofile.entrance_year, keys)
+    return True
+
+
+def credit_history_keys(
+    semesterlecture: SemesterLecture, 
+    credit: int, 
+    none_major: Major) -> List[Tuple[int, int, int, int, int]]:
+    """Keys of CREDIT_HISTORY_FIELDS of credit change histories of semester lecture."""
     recognized_majors = list(set([semesterlecture.recognized_major1, semesterlecture.recognized_major2]))
     year_taken = semesterlecture.semester.year
     if len(recognized_majors) > 1:
         recognized_majors = [rm for rm in recognized_majors if rm != none_major]
-    histories = []
-    for recognized_major in recognized_majors:
-        creditchangehistory, _ = CreditChangeHistory.objects.get_or_create(
-            major=recognized_major,
-            lecture=semesterlecture.lecture,
-            entrance_year=user_entrance,
-            year_taken=year_taken,
-            past_credit=semesterlecture.credit,
-            curr_credit=credit)
-        creditchangehistory.change_count += 1
-        creditchangehistory.updated_at = date.today()
-        histories.append(creditchangehistory)
-    CreditChangeHistory.objects.bulk_update(histories, fields=['change_count', 'updated_at'])
+    return [
+        (recognized_major.id, semesterlecture.lecture_id, year_taken, semesterlecture.credit, credit)
+        for recognized_major in recognized_majors]
+
+
+def credit_history_generator(user: User, semesterlecture: SemesterLecture, credit: int) -> bool:
+    """Create semester lecture credit change histroy"""
+    none_major = Major.objects.get(id=DEFAULT_MAJOR_ID)
+    keys = credit_history_keys(semesterlecture, credit, none_major)
+    count_histories(CreditChangeHistory, CREDIT_HISTORY_FIELDS, user.userprofile.entrance_year, keys)
     return True
 
 
+def count_histories(model, fields: Tuple[str, ...], entrance_year: int, keys: Iterable[tuple]):
+    """
+    Add one to change_count of history of entrance_year for each key of fields, creating missing histories.
+    Histories are read with one query and written with one statement for updated and one for created ones.
+    """
+    counts = Counter(keys)
+    if not counts:
+        return
+    query = reduce(or_, (Q(**dict(zip(fields, key))) for key in counts))
+    histories = {
+        tuple(getattr(history, field) for field in fields): history
+        for history in model.objects.filter(query, entrance_year=entrance_year)}
+    updated = []
+    created = []
+    for key, count in counts.items():
+        history = histories.get(key)
+        if history is None:
+            created.append(model(entrance_year=entrance_year, change_count=count, **dict(zip(fields, key))))
+        else:
+            history.change_count += count
+            history.updated_at = date.today()
+            updated.append(history)
+    model.objects.bulk_update(updated, fields=['change_count', 'updated_at'])
+    model.objects.bulk_create(created)
+
+
 def requirement_histroy_generator(
     requirement: Requirement, 
     entrance_year: int,
@@ -0,0 +1,33 @@
+"""Constants related to Job."""
+
+# Job Type
+CALCULATE_JOB = 'calculate'
+MAJOR_JOB = 'major'
+COPY_JOB = 'copy'
+
+JOB_TYPE = (
+    (CALCULATE_JOB, 'calculate'),
+    (MAJOR_JOB, 'major'),
+    (COPY_JOB, 'copy'),
+)
+
+# Job Status
+PENDING = 'pending'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+
+JOB_STATUS = (
+    (PENDING, 'pending'),
+    (RUNNING, 'running'),
+    (SUCCEEDED, 'succeeded'),
+    (FAILED, 'failed'),
+)
+
+# Running jobs whose lease was not extended for JOB_TIMEOUT seconds are taken again, as their worker died.
+JOB_TIMEOUT = 60
+# Seconds between heartbeats of a worker extending the lease of its running job.
+JOB_HEARTBEAT_INTERVAL = 10
+JOB_MAX_ATTEMPTS = 3
+# Seconds a worker sleeps when no job is pending.
+JOB_POLL_INTERVAL = 1
@@ -0,0 +1,50 @@
+import multiprocessing
+import time
+from django.core.management.base import BaseCommand
+from django.db import connections
+from core.job.const import JOB_POLL_INTERVAL
+from core.job.utils import claim_job, run_job, run_pending_jobs
+
+
+class Command(BaseCommand):
+    help = "Run background jobs of plans, such as calculate, major and copy. Keep it running next to uWSGI."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=1, help='Number of worker processes.')
+        parser.add_argument('--interval', type=float, default=JOB_POLL_INTERVAL, help='Seconds to wait when no job is pending.')
+        parser.add_argument('--once', action='store_true', help='Exit once no job is pending.')
+
+    def handle(self, *args, **options):
+        if options['once']:
+            count = run_pending_jobs()
+            self.stdout.write(self.style.SUCCESS(f'Successfully ran {count} jobs.'))
+            return
+        self.stdout.write(self.style.NOTICE(f"Starting {options['workers']} workers..."))
+        if options['workers'] == 1:
+            self.work(options['interval'])
+            return
+        # Forked workers must open their own database connections.
+        connections.close_all()
+        workers = [
+            multiprocessing.Process(target=self.work, args=(options['interval'],), daemon=True)
+            for _ in range(options['workers'])]
+        for worker in workers:
+            worker.start()
+        try:
+            for worker in workers:
+                worker.join()
+        except KeyboardInterrupt:
+            for worker in workers:
+                worker.terminate()
+
+    def work(self, interval: float):
+        try:
+            while True:
+                job = claim_job()
+                if job is None:
+                    time.sleep(interval)
+                    continue
+                job = run_job(job)
+                self.stdout.write(f'Job {job.id} {job.job_type} {job.status}')
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,40 @@
+from django.db import models
+from core.job.const import *
+from core.plan.models import Plan
+from user.models import User
+
+
+class Job(models.Model):
+    """
+    Heavy plan operation requested in background, run by runjobs workers.
+
+        # Fields
+        user (User): User who requested the job.
+        plan (Plan): Plan the job operates on. Null once the plan is deleted.
+        job_type (str): Operation of the job, such as calculate, major, copy.
+        params (dict): Request data of the operation.
+        status (str): pending, running, succeeded or failed.
+        progress (int): Percentage of the job done.
+        attempts (int): Number of times a worker started the job. Fences off writes of workers that lost the job.
+        result (dict): Serialized plan, once succeeded.
+        error (str): Detail of the error, once failed.
+        heartbeat_at (datetime): When the worker running the job last extended its lease.
+    """
+    user = models.ForeignKey(User, related_name='job', on_delete=models.CASCADE)
+    plan = models.ForeignKey(Plan, related_name='job', on_delete=models.SET_NULL, null=True)
+    job_type = models.CharField(max_length=50, choices=JOB_TYPE)
+    params = models.JSONField(default=dict)
+    status = models.CharField(max_length=50, choices=JOB_STATUS, default=PENDING)
+    progress = models.PositiveSmallIntegerField(default=0)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    result = models.JSONField(null=True)
+    error = models.TextField(default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True)
+    finished_at = models.DateTimeField(null=True)
+    heartbeat_at = models.DateTimeField(null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'id']),
+        ]
@@ -0,0 +1,21 @@
+from rest_framework import serializers
+from core.job.models import Job
+
+
+class JobSerializer(serializers.ModelSerializer):
+    """Serializer for status of jobs."""
+
+    class Meta:
+        model = Job
+        fields = (
+            'id',
+            'plan',
+            'job_type',
+            'status',
+            'progress',
+            'result',
+            'error',
+            'created_at',
+            'started_at',
+            'finished_at',
+        )
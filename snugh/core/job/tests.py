@@ -0,0 +1,204 @@
+from datetime import timedelta
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework import status
+from user.utils import UserFactory
+from user.const import *
+from core.job.const import *
+from core.job.models import Job
+from core.job.utils import JobHeartbeat, claim_job, report_progress, run_job, run_pending_jobs
+from core.plan.models import Plan
+from core.plan.utils import plan_major_requirement_generator
+
+
+class JobTestCase(TestCase):
+    """
+    # Test Job APIs.
+        [PUT] plan/<plan_id>/calculate/?background=true
+        [PUT] plan/<plan_id>/major/?background=true
+        [POST] plan/<plan_id>/copy/?background=true
+        [GET] job/<job_id>/
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.majors = [
+            {
+                "major_name": "경영학과",
+                "major_type": "major"
+            }
+        ]
+        cls.user = UserFactory.create(
+            email = "jaejae2374@test.com",
+            password = "waffle1234",
+            entrance_year = 2018,
+            full_name = "test user",
+            majors = cls.majors,
+            status = ACTIVE
+        )
+        cls.user_token = "Token " + str(cls.user.auth_token)
+        cls.stranger = UserFactory.auto_create()
+        cls.stranger_token = "Token " + str(cls.stranger.auth_token)
+        cls.plan = Plan.objects.create(user=cls.user, plan_name="plan example")
+        plan_major_requirement_generator(cls.plan, cls.majors, 2018)
+
+    def test_background_job(self):
+        """
+        Test cases in running plan operations in background.
+            1) enqueue jobs.
+            2) not plan's owner.
+            3) not job's owner.
+            4) job not found.
+            5) same result with synchronous operations.
+            6) failed job.
+            7) job of a dead worker is taken again.
+            8) heartbeat extends lease of job.
+            9) job whose result was committed is not run again.
+            10) worker whose job was taken again saves nothing.
+        """
+        # 1) enqueue jobs.
+        response = self.client.put(
+            f"/plan/{self.plan.id}/calculate/?background=true",
+            content_type="application/json",
+            HTTP_AUTHORIZATION=self.user_token,
+        )
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        data = response.json()
+        self.assertEqual(data['job_type'], CALCULATE_JOB)
+        self.assertEqual(data['status'], PENDING)
+        calculate_job_id = data['id']
+
+        response = self.client.put(
+            f"/plan/{self.plan.id}/major/?background=true",
+            data={
+                "majors": [
+                    {
+                        "major_name": "컴퓨터공학부",
+                        "major_type": "major"
+                    }
+                ]
+            },
+            content_type="application/json",
+            HTTP_AUTHORIZATION=self.user_token,
+        )
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        major_job_id = response.json()['id']
+
+        response = self.client.post(
+            f"/plan/{self.plan.id}/copy/?background=true",
+            HTTP_AUTHORIZATION=self.user_token,
+        )
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        copy_job_id = response.json()['id']
+
+        # 2) not plan's owner.
+        response = self.client.put(
+            f"/plan/{self.plan.id}/calculate/?background=true",
+            content_type="application/json",
+            HTTP_AUTHORIZATION=self.stranger_token,
+        )
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        # 3) not job's owner.
+        response = self.client.get(
+            f"/job/{calculate_job_id}/",
+            HTTP_AUTHORIZATION=self.stranger_token,
+        )
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        # 4) job not found.
+        response = self.client.get(
+            "/job/9999/",
+            HTTP_AUTHORIZATION=self.user_token,
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        # 5) same result with synchronous operations.
+        self.assertEqual(run_pending_jobs(), 3)
+        response = self.client.get(
+            f"/job/{major_job_id}/",
+            HTTP_AUTHORIZATION=self.user_token,
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()
+        self.assertEqual(data['status'], SUCCEEDED)
+        self.assertEqual(data['progress'], 100)
+        self.assertEqual(data['result']['majors'][0]['major_name'], "컴퓨터공학부")
+        response = self.client.put(
+            f"/plan/{self.plan.id}/calculate/",
+            content_type="application/json",
+            HTTP_AUTHORIZATION=self.user_token,
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(Job.objects.get(id=calculate_job_id).status, SUCCEEDED)
+        copied = Job.objects.get(id=copy_job_id).result
+        self.assertEqual(copied['plan_name'], "plan example (복사본)")
+        self.assertTrue(Plan.objects.filter(id=copied['id'], user=self.user).exists())
+
+        # 6) failed job.
+        response = self.client.put(
+            f"/plan/{self.plan.id}/major/?background=true",
+            data={
+                "majors": [
+                    {
+                        "major_name": "없는학과",
+                        "major_type": "major"
+                    }
+                ]
+            },
+            content_type="application/json",
+            HTTP_AUTHORIZATION=self.user_token,
+        )
+        job_id = response.json()['id']
+        run_pending_jobs()
+        response = self.client.get(
+            f"/job/{job_id}/",
+            HTTP_AUTHORIZATION=self.user_token,
+        )
+        data = response.json()
+        self.assertEqual(data['status'], FAILED)
+        self.assertEqual(data['error'], "Does not exist [Major]")
+        self.assertTrue(self.plan.planmajor.filter(major__major_name="컴퓨터공학부").exists())
+
+        # 7) job of a dead worker is taken again.
+        job = Job.objects.create(
+            user=self.user,
+            plan=self.plan,
+            job_type=CALCULATE_JOB,
+            status=RUNNING,
+            attempts=1,
+            started_at=timezone.now(),
+            heartbeat_at=timezone.now())
+        self.assertIsNone(claim_job())
+        expired = timezone.now() - timedelta(seconds=JOB_TIMEOUT + 1)
+        Job.objects.filter(id=job.id).update(heartbeat_at=expired)
+        job = claim_job()
+        self.assertEqual(job.attempts, 2)
+
+        # 8) heartbeat extends lease of job.
+        Job.objects.filter(id=job.id).update(heartbeat_at=expired)
+        report_progress(job, 1, 4)
+        self.assertTrue(JobHeartbeat(job).beat())
+        self.assertIsNone(claim_job())
+        job.refresh_from_db()
+        self.assertEqual(job.progress, 25)
+
+        # 9) job whose result was committed is not run again.
+        count = Plan.objects.filter(user=self.user).count()
+        job = Job.objects.create(user=self.user, plan=self.plan, job_type=COPY_JOB, status=RUNNING, attempts=1,
+                                 result=copied, heartbeat_at=expired)
+        self.assertEqual(run_job(claim_job()).status, SUCCEEDED)
+        self.assertEqual(Plan.objects.filter(user=self.user).count(), count)
+        job.refresh_from_db()
+        self.assertEqual(job.result, copied)
+
+        # 10) worker whose job was taken again saves nothing.
+        job = Job.objects.create(user=self.user, plan=self.plan, job_type=COPY_JOB, status=RUNNING, attempts=1,
+                                 heartbeat_at=expired)
+        lost_job = claim_job()
+        Job.objects.filter(id=job.id).update(attempts=3)
+        self.assertFalse(JobHeartbeat(lost_job).beat())
+        run_job(lost_job)
+        self.assertEqual(Plan.objects.filter(user=self.user).count(), count)
+        job.refresh_from_db()
+        self.assertEqual(job.status, RUNNING)
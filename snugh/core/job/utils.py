@@ -0,0 +1,167 @@
+"""Utils related to Job APIs and runjobs workers."""
+
+import logging
+import threading
+from datetime import timedelta
+from typing import Optional
+from django.contrib.auth import get_user_model
+from django.db import DatabaseError, connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+from core.job.const import *
+from core.job.models import Job
+from core.lecture.utils import update_lecture_info
+from core.plan.models import Plan
+from core.plan.serializers import PlanSerializer
+from core.plan.utils import copy_plan, update_plan_majors
+from snugh.exceptions import BaseError, NotFound, ServerError
+
+logger = logging.getLogger(__name__)
+
+User = get_user_model()
+
+
+def enqueue_job(user: User, plan: Plan, job_type: str, params: dict = None) -> Job:
+    """Create a pending job, taken by a runjobs worker once the current transaction commits."""
+    return Job.objects.create(user=user, plan=plan, job_type=job_type, params=params or {})
+
+
+def claim_job() -> Optional[Job]:
+    """
+    Take the oldest pending job, or a running job whose lease expired as its worker died, and mark it running.
+    Locked rows are skipped, so that workers never take the same job.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        job = Job.objects.select_for_update(skip_locked=True)\
+            .filter(Q(status=PENDING) | Q(status=RUNNING, heartbeat_at__lt=now - timedelta(seconds=JOB_TIMEOUT)))\
+            .order_by('id')\
+            .first()
+        if job is None:
+            return None
+        job.status = RUNNING
+        job.progress = 0
+        job.attempts += 1
+        job.started_at = now
+        job.heartbeat_at = now
+        job.save(update_fields=['status', 'progress', 'attempts', 'started_at', 'heartbeat_at'])
+    return job
+
+
+class JobHeartbeat(threading.Thread):
+    """
+    Thread extending the lease of a running job and saving its progress every JOB_HEARTBEAT_INTERVAL seconds.
+    It writes from its own database connection, as the job runs in a transaction.
+
+        # Fields
+        job (Job): Running job.
+        stopped (Event): Set once the job is finished.
+    """
+
+    def __init__(self, job: Job):
+        super().__init__(daemon=True)
+        self.job = job
+        self.stopped = threading.Event()
+
+    def run(self):
+        try:
+            while not self.stopped.wait(JOB_HEARTBEAT_INTERVAL):
+                try:
+                    self.beat()
+                except DatabaseError:
+                    logger.exception('Heartbeat of job %d failed', self.job.id)
+        finally:
+            connection.close()
+
+    def beat(self) -> bool:
+        """Extend the lease of job. False if another worker took it."""
+        return Job.objects.filter(id=self.job.id, status=RUNNING, attempts=self.job.attempts)\
+            .update(heartbeat_at=timezone.now(), progress=self.job.progress) > 0
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+def report_progress(job: Job, done: int, total: int):
+    """Set progress of job by steps done, saved by its heartbeat. 100 is left for the end of the job."""
+    if total:
+        job.progress = min(done * 100 // total, 99)
+
+
+def run_job(job: Job) -> Job:
+    """
+    Run the operation of job in a transaction, and save its result or error.
+    The result is recorded in the same transaction, so a job taken again after its worker died
+    right after the commit is not run twice, such as copying a plan.
+    Writes are fenced by attempts, so a worker whose job was taken again saves nothing.
+    """
+    heartbeat = JobHeartbeat(job)
+    heartbeat.start()
+    try:
+        if job.result is None:
+            if job.attempts > JOB_MAX_ATTEMPTS:
+                raise ServerError()
+            with transaction.atomic():
+                result = JOB_HANDLERS[job.job_type](job)
+                if not Job.objects.filter(id=job.id, attempts=job.attempts).update(result=result):
+                    raise ServerError()
+            job.result = result
+    except BaseError as e:
+        job.status = FAILED
+        job.error = str(e.detail)
+    except Exception:
+        logger.exception('Job %d failed', job.id)
+        job.status = FAILED
+        job.error = str(ServerError.default_detail)
+    else:
+        job.status = SUCCEEDED
+        job.progress = 100
+    finally:
+        heartbeat.stop()
+    job.finished_at = timezone.now()
+    Job.objects.filter(id=job.id, attempts=job.attempts).update(
+        status=job.status, progress=job.progress, result=job.result, error=job.error, finished_at=job.finished_at)
+    return job
+
+
+def run_pending_jobs() -> int:
+    """Run jobs until none is pending. Returns the number of jobs run."""
+    count = 0
+    job = claim_job()
+    while job:
+        run_job(job)
+        count += 1
+        job = claim_job()
+    return count
+
+
+def __get_plan(job: Job) -> Plan:
+    try:
+        return Plan.objects.get(id=job.plan_id)
+    except Plan.DoesNotExist:
+        raise NotFound()
+
+
+def calculate_job(job: Job) -> dict:
+    plan = update_lecture_info(job.user, job.plan_id, progress=lambda done, total: report_progress(job, done, total))
+    return PlanSerializer(plan).data
+
+
+def major_job(job: Job) -> dict:
+    plan = update_plan_majors(
+        job.user, __get_plan(job), job.params.get('majors', []),
+        progress=lambda done, total: report_progress(job, done, total))
+    return PlanSerializer(plan).data
+
+
+def copy_job(job: Job) -> dict:
+    plan = copy_plan(job.user, job.plan_id, progress=lambda done, total: report_progress(job, done, total))
+    return PlanSerializer(plan).data
+
+
+JOB_HANDLERS = {
+    CALCULATE_JOB: calculate_job,
+    MAJOR_JOB: major_job,
+    COPY_JOB: copy_job,
+}
@@ -0,0 +1,20 @@
+from rest_framework import status, viewsets
+from rest_framework.response import Response
+from snugh.permissions import IsOwner
+from core.job.models import Job
+from core.job.serializers import JobSerializer
+
+
+class JobViewSet(viewsets.GenericViewSet):
+    """
+    Generic ViewSet of Job Object.
+    """
+    queryset = Job.objects.all()
+    serializer_class = JobSerializer
+    permission_classes = [IsOwner]
+
+    # GET /job/:jobId
+    def retrieve(self, request, pk=None):
+        """Status, progress and result of user's job."""
+        job = self.get_object()
+        return Response(self.get_serializer(job).data, status=status.HTTP_200_OK)
@@ -0,0 +1,282 @@
+"""Process-resident snapshot of Lecture used by lecture search APIs."""
+
+import copy
+import logging
+import sys
+import threading
+from array import array
+import heapq
+from bisect import bisect_left, bisect_right
+from collections import Counter
+from typing import Iterable, List, Optional
+
+from core.lecture.const import *
+from core.lecture.models import Lecture
+from core.lecture.search import (
+    cache_versions, fuzzy_grams, jamo, lecture_ngrams, search_mode, substring_distance)
+
+logger = logging.getLogger(__name__)
+
+CATALOG_FIELDS = (
+    'id',
+    'lecture_code',
+    'lecture_name',
+    'open_department',
+    'open_major',
+    'open_semester',
+    'lecture_type',
+    'credit',
+    'grade',
+    'prev_lecture_name',
+    'recent_open_year',
+    'lecture_name_choseong',
+    'lecture_name_jamo',
+    'popularity',
+)
+
+
+class LectureCatalog:
+    """
+    Immutable columnar snapshot of Lecture.
+    Search, filtering and ranking of lecture search APIs run on it without database round-trips.
+
+        # Fields
+        version (str): Catalog version the snapshot was loaded at.
+        popularity_version (str): Popularity version the popularities were loaded at.
+        ids (array): Lecture ids in ascending order. Row i of every column belongs to ids[i].
+        columns (dict): Tuple of values of each field in CATALOG_FIELDS. Strings are interned.
+        postings (dict): Rows having each gram of lecture name, same grams with LectureNgram.
+        prefix_index (tuple): Sorted jamo of lecture names and lowercased lecture codes with their rows,
+                              and rows in order of autocomplete rank, built on the first autocomplete.
+    """
+
+    def __init__(self, version: str, rows: List[tuple], popularity_version: str = None):
+        self.version = version
+        self.popularity_version = popularity_version
+        values = list(zip(*rows)) if rows else [() for _ in CATALOG_FIELDS]
+        self.columns = {}
+        for field, column in zip(CATALOG_FIELDS, values):
+            self.columns[field] = tuple(sys.intern(v) if isinstance(v, str) else v for v in column)
+        self.ids = array('q', self.columns.pop('id'))
+        self.years = array('h', self.columns.pop('recent_open_year'))
+        self.popularities = array('i', self.columns.pop('popularity'))
+        self.names = self.columns['lecture_name']
+        self.lower_names = tuple(sys.intern(name.lower()) for name in self.names)
+        postings = {}
+        for row, name in enumerate(self.names):
+            for gram in lecture_ngrams(name):
+                postings.setdefault(gram, array('i')).append(row)
+        self.postings = postings
+        self._prefix_index = None
+
+    @classmethod
+    def load(cls, version: str, popularity_version: str = None) -> 'LectureCatalog':
+        rows = list(Lecture.objects.order_by('id').values_list(*CATALOG_FIELDS))
+        catalog = cls(version, rows, popularity_version)
+        logger.info(
+            'Loaded lecture catalog %s: %d lectures, %.1f MiB',
+            version, len(catalog), catalog.memory_usage() / 2**20)
+        return catalog
+
+    def refresh_popularities(self, popularity_version: str) -> 'LectureCatalog':
+        """Copy of the catalog with popularities reloaded, sharing every other column."""
+        popularities = dict(Lecture.objects.values_list('id', 'popularity'))
+        catalog = copy.copy(self)
+        catalog.popularity_version = popularity_version
+        catalog.popularities = array('i', (popularities.get(lecture_id, 0) for lecture_id in self.ids))
+        catalog._prefix_index = None
+        return catalog
+
+    def __len__(self):
+        return len(self.ids)
+
+    def row(self, lecture_id: int) -> Optional[int]:
+        row = bisect_left(self.ids, lecture_id)
+        if row < len(self.ids) and self.ids[row] == lecture_id:
+            return row
+        return None
+
+    def candidates(self, grams: Iterable[str]) -> set:
+        """Rows having every gram."""
+        postings = sorted((self.postings.get(gram, ()) for gram in set(grams)), key=len)
+        if not postings:
+            return set(range(len(self)))
+        rows = set(postings[0])
+        for posting in postings[1:]:
+            rows.intersection_update(posting)
+        return rows
+
+    def search(self, keyword: str, year_standard: int, exclude: Iterable[int] = ()) -> List[tuple]:
+        """
+        Lectures matching keyword, same as Lecture.objects.search(keyword).rank(keyword).
+        Returns sorted keys of SEARCH_ORDERING, which end with lecture id.
+        """
+        mode = search_mode(keyword)
+        if mode == CHOSEONG_SEARCH:
+            key, column = keyword, self.columns['lecture_name_choseong']
+            rows = {row for row in self.candidates(keyword) if keyword in column[row]}
+        elif mode == JAMO_SEARCH:
+            key, column = jamo(keyword), self.columns['lecture_name_jamo']
+            rows = {row for row in self.candidates(key) if key in column[row]}
+        else:
+            key, column = keyword, self.names
+            rows = self.candidates(keyword.lower())
+        rows = self.exclude(rows, year_standard, exclude)
+
+        lower_column = self.lower_names if mode == PLAIN_SEARCH else column
+        lower_key = key.lower()
+
+        def rank(row):
+            first_letter = 0 if column[row].startswith(key[0]) else 1
+            icontains_priority = 0 if lower_key in lower_column[row] else 1
+            return (
+                first_letter + icontains_priority,
+                len(self.names[row]),
+                -self.popularities[row],
+                self.years[row],
+                self.names[row],
+                self.ids[row])
+
+        return sorted(rank(row) for row in rows)
+
+    def fuzzy(self, keyword: str, year_standard: int, exclude: Iterable[int] = ()) -> List[tuple]:
+        """
+        Lectures with a part of name within FUZZY_DISTANCE of keyword, at most FUZZY_SEARCH_LIMIT.
+        Candidates are rows having enough grams of keyword in postings, verified by substring_distance.
+        Returns sorted keys of SEARCH_ORDERING, with priorities ranked after every exact match.
+        """
+        grams = fuzzy_grams(keyword)
+        if grams is None:
+            return []
+        grams, least = grams
+        counts = Counter()
+        for gram in grams:
+            counts.update(self.postings.get(gram, ()))
+        rows = self.exclude({row for row, count in counts.items() if count >= least}, year_standard, exclude)
+        lower_keyword = keyword.lower()
+        keys = []
+        for row in rows:
+            distance = substring_distance(lower_keyword, self.lower_names[row])
+            if distance <= FUZZY_DISTANCE:
+                keys.append((FUZZY_PRIORITY + distance, len(self.names[row]), -self.popularities[row],
+                             self.years[row], self.names[row], self.ids[row]))
+        return heapq.nsmallest(FUZZY_SEARCH_LIMIT, keys)
+
+    def autocomplete(self, prefix: str, year_standard: int = 0, limit: int = AUTOCOMPLETE_LIMIT) -> List[int]:
+        """
+        Ids of lectures opened since year_standard whose name or code starts with prefix, most popular first.
+        Half-composed syllables complete by jamo. ex) 경여 -> 경영학원론
+        Every entry starting with prefix is ranked. Ranges longer than AUTOCOMPLETE_SCAN_LIMIT, of short prefixes,
+        are walked in order of rank instead, which stops at limit matches.
+        """
+        keys, rows, ranked_rows = self.prefix_index
+        prefix = jamo(prefix)
+        start = bisect_left(keys, prefix)
+        end = bisect_right(keys, prefix + '\uffff', start)
+        if end - start <= AUTOCOMPLETE_SCAN_LIMIT:
+            matches = {row for row in rows[start:end] if self.years[row] >= year_standard}
+            matches = heapq.nsmallest(limit, matches, key=self.autocomplete_rank)
+        else:
+            names = self.columns['lecture_name_jamo']
+            codes = self.columns['lecture_code']
+            matches = []
+            for row in ranked_rows:
+                if self.years[row] >= year_standard \
+                        and (names[row].startswith(prefix) or codes[row].lower().startswith(prefix)):
+                    matches.append(row)
+                    if len(matches) == limit:
+                        break
+        return [self.ids[row] for row in matches]
+
+    def autocomplete_rank(self, row: int) -> tuple:
+        return -self.popularities[row], len(self.names[row]), self.names[row], row
+
+    @property
+    def prefix_index(self) -> tuple:
+        if self._prefix_index is None:
+            entries = [(key, row) for row, key in enumerate(self.columns['lecture_name_jamo'])]
+            entries += [(code.lower(), row) for row, code in enumerate(self.columns['lecture_code'])]
+            entries.sort()
+            self._prefix_index = (
+                tuple(key for key, _ in entries),
+                array('i', (row for _, row in entries)),
+                array('i', sorted(range(len(self)), key=self.autocomplete_rank)))
+        return self._prefix_index
+
+    def curriculum(
+        self,
+        major_names: Iterable[str],
+        department_names: Iterable[str],
+        lecture_type: str,
+        year_standard: int,
+        exclude: Iterable[int] = ()) -> List[tuple]:
+        """
+        Lectures opened by majors or departments.
+        Returns sorted keys of CURRICULUM_ORDERING, which end with lecture id.
+        """
+        major_names = set(major_names)
+        department_names = set(department_names)
+        open_majors = self.columns['open_major']
+        open_departments = self.columns['open_department']
+        lecture_types = self.columns['lecture_type']
+        rows = {
+            row for row in range(len(self))
+            if lecture_types[row] == lecture_type
+            and (open_majors[row] in major_names or open_departments[row] in department_names)}
+        rows = self.exclude(rows, year_standard, exclude)
+        return sorted((self.names[row], self.years[row], self.ids[row]) for row in rows)
+
+    def exclude(self, rows: set, year_standard: int, exclude: Iterable[int]) -> set:
+        """Drop rows opened before year_standard or of excluded lecture ids."""
+        excluded_rows = {self.row(lecture_id) for lecture_id in exclude}
+        return {row for row in rows if self.years[row] >= year_standard and row not in excluded_rows}
+
+    def lectures(self, lecture_ids: Iterable[int]) -> List[Lecture]:
+        """Unsaved Lecture instances of lecture ids, to be serialized."""
+        lectures = []
+        for lecture_id in lecture_ids:
+            row = self.row(lecture_id)
+            if row is None:
+                continue
+            values = {field: column[row] for field, column in self.columns.items()}
+            lectures.append(Lecture(
+                id=lecture_id, recent_open_year=self.years[row], popularity=self.popularities[row], **values))
+        return lectures
+
+    def memory_usage(self) -> int:
+        """Approximate bytes held by the snapshot."""
+        seen = set()
+        size = 0
+        containers = [self.ids, self.years, self.popularities, self.lower_names, self.postings] + list(self.columns.values())
+        containers += list(self.postings.values())
+        for container in containers:
+            size += sys.getsizeof(container)
+        for column in list(self.columns.values()) + [self.lower_names, self.postings.keys()]:
+            for value in column:
+                if id(value) not in seen:
+                    seen.add(id(value))
+                    size += sys.getsizeof(value)
+        return size
+
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+
+def get_catalog() -> LectureCatalog:
+    """
+    Catalog of this worker, reloaded when the catalog version changes.
+    Only popularities are reloaded when the popularity version changes.
+    """
+    global _catalog
+    version, popularity_version = cache_versions(CATALOG_VERSION_KEY, POPULARITY_VERSION_KEY)
+    catalog = _catalog
+    if catalog is None or catalog.version != version or catalog.popularity_version != popularity_version:
+        with _catalog_lock:
+            catalog = _catalog
+            if catalog is None or catalog.version != version:
+                catalog = LectureCatalog.load(version, popularity_version)
+            elif catalog.popularity_version != popularity_version:
+                catalog = catalog.refresh_popularities(popularity_version)
+            _catalog = catalog
+    return catalog
@@ -12,3 +12,55 @@ LECTURE_TYPE = (
 )
 
 UPDATED_YEAR = 2021
+
+NGRAM_BATCH_SIZE = 5000
+POPULARITY_BATCH_SIZE = 5000
+RECOGNITION_BATCH_SIZE = 5000
+RECALCULATION_BATCH_SIZE = 1000
+
+# Sparse ordering of semester lectures: recent_sequence is a key with gaps, exposed as a dense sequence.
+# A move takes a key between its neighbours, and a semester out of room is rebalanced to SEQUENCE_GAP apart.
+SEQUENCE_GAP = 1024
+SEQUENCE_MIN_GAP = 16
+
+# Keyword search mode
+PLAIN_SEARCH = 'plain'
+CHOSEONG_SEARCH = 'choseong'
+JAMO_SEARCH = 'jamo'
+
+CATALOG_VERSION_KEY = 'lecture:catalog:version'
+# Popularity changes apart from the rest of Lecture data, so catalogs refresh it in place.
+POPULARITY_VERSION_KEY = 'lecture:popularity:version'
+
+# Lecture search pagination
+LECTURE_PAGE_SIZE = 20
+SEARCH_ORDERING = ('priority', 'match_rate', 'popularity_priority', 'recent_open_year', 'lecture_name', 'id')
+CURRICULUM_ORDERING = ('lecture_name', 'recent_open_year', 'id')
+# Type of each ordering value in a cursor
+ORDERING_TYPES = {
+    'priority': int,
+    'match_rate': int,
+    'popularity_priority': int,
+    'recent_open_year': int,
+    'lecture_name': str,
+    'id': int,
+}
+
+# Search session: ordered lecture ids of a search, reused by the following pages
+SEARCH_SESSION_KEY = 'lecture:search:{}:{}'
+SEARCH_SESSION_TIMEOUT = 60 * 10
+PLAN_SEARCH_VERSION_KEY = 'lecture:search:plan:{}:version'
+
+# Major curriculum: ordered lecture keys of a major, shared by every plan
+CURRICULUM_KEY = 'lecture:curriculum:{}'
+CURRICULUM_TIMEOUT = 60 * 60 * 24
+
+# Fuzzy keyword search: lectures within edit distance, ranked after every exact match
+FUZZY_DISTANCE = 1
+FUZZY_MIN_LENGTH = 3
+FUZZY_SEARCH_LIMIT = 20
+FUZZY_PRIORITY = 3
+
+# Autocomplete: lectures whose name or code starts with a prefix
+AUTOCOMPLETE_LIMIT = 10
+AUTOCOMPLETE_SCAN_LIMIT = 1000
@@ -0,0 +1,47 @@
+"""Year interval index of curriculum rows valid from start_year to end_year, such as MajorLecture and LectureCredit."""
+
+from bisect import bisect_right
+from collections import defaultdict
+from typing import Any, Hashable, Iterable, Iterator, Tuple
+
+
+class YearIntervalIndex:
+    """
+    Values of rows valid for a year, grouped by key.
+    Years of each key are split at every start_year and end_year + 1, so that rows valid
+    in a segment are computed once and a lookup is a bisect over the boundaries.
+
+        # Fields
+        boundaries (dict): Sorted first years of segments by key.
+        segments (dict): Values valid in each segment by key, in the order rows were given.
+    """
+
+    def __init__(self, rows: Iterable[Tuple[Hashable, int, int, Any]]):
+        intervals = defaultdict(list)
+        for key, start_year, end_year, value in rows:
+            intervals[key].append((start_year, end_year, value))
+        self.boundaries = {}
+        self.segments = {}
+        for key, rows in intervals.items():
+            boundaries = sorted({start_year for start_year, _, _ in rows} | {end_year + 1 for _, end_year, _ in rows})
+            self.boundaries[key] = boundaries
+            self.segments[key] = [
+                tuple(value for start_year, end_year, value in rows if start_year <= year <= end_year)
+                for year in boundaries]
+
+    def get(self, key: Hashable, year: int) -> tuple:
+        """Values of rows of key valid for year."""
+        boundaries = self.boundaries.get(key)
+        if boundaries is None:
+            return ()
+        segment = bisect_right(boundaries, year) - 1
+        if segment < 0:
+            return ()
+        return self.segments[key][segment]
+
+    def intervals(self) -> Iterator[Tuple[Hashable, int, int, tuple]]:
+        """(key, start_year, end_year, values) of every segment having values."""
+        for key, boundaries in self.boundaries.items():
+            for start_year, end_year, values in zip(boundaries, boundaries[1:], self.segments[key]):
+                if values:
+                    yield key, start_year, end_year - 1, values
@@ -0,0 +1,65 @@
+"""Base command for benchmarks on synthetic data."""
+
+import math
+import random
+import time
+from typing import Callable, Iterable, List
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+
+class BenchmarkCommand(BaseCommand):
+    """
+    Creates synthetic data, measures latencies and rolls every change back.
+    Subclasses implement setup() and run().
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=5, help='Number of times each query is measured.')
+        parser.add_argument('--seed', type=int, default=0, help='Seed of synthetic data.')
+
+    def handle(self, *args, **options):
+        self.repeat = options['repeat']
+        self.random = random.Random(options['seed'])
+        with transaction.atomic():
+            self.notice('Creating synthetic data...')
+            self.setup(**options)
+            self.notice('Measuring...')
+            self.run(**options)
+            transaction.set_rollback(True)
+        self.success('Finished benchmark. Synthetic data was rolled back.')
+
+    def setup(self, **options):
+        raise NotImplementedError
+
+    def run(self, **options):
+        raise NotImplementedError
+
+    def measure(self, label: str, func: Callable, inputs: Iterable) -> List[float]:
+        """Measure latencies(ms) of func over inputs and report p50/p99."""
+        latencies = []
+        for value in inputs:
+            for _ in range(self.repeat):
+                start = time.perf_counter()
+                func(value)
+                latencies.append((time.perf_counter() - start) * 1000)
+        latencies.sort()
+        self.info(f'{label}: p50 {self.percentile(latencies, 50):.3f}ms, '
+                  f'p99 {self.percentile(latencies, 99):.3f}ms ({len(latencies)} runs)')
+        return latencies
+
+    @staticmethod
+    def percentile(latencies: List[float], p: int) -> float:
+        if not latencies:
+            return 0
+        return latencies[max(math.ceil(len(latencies) * p / 100) - 1, 0)]
+
+    def info(self, msg, ending=None):
+        self.stdout.write(msg, ending=ending)
+
+    def notice(self, msg, ending=None):
+        self.stdout.write(self.style.NOTICE(msg), ending=ending)
+
+    def success(self, msg, ending=None):
+        self.stdout.write(self.style.SUCCESS(msg), ending=ending)
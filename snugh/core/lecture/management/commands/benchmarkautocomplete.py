@@ -0,0 +1,44 @@
+import time
+from core.lecture.catalog import LectureCatalog
+from core.lecture.const import UPDATED_YEAR
+from core.lecture.management.benchmark import BenchmarkCommand
+from core.lecture.management.commands.benchmarksearch import BENCHMARK_CODE_PREFIX, BENCHMARK_WORDS
+from core.lecture.models import Lecture
+from core.lecture.search import jamo
+from core.lecture.utils import search_year_standard
+
+
+class Command(BenchmarkCommand):
+    help = "Measure latency of lecture autocomplete on the lecture catalog"
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--lectures', type=int, default=50000, help='Number of synthetic lectures.')
+        parser.add_argument('--prefixes', type=int, default=200, help='Number of sampled prefixes.')
+
+    def setup(self, **options):
+        lectures = []
+        for i in range(options['lectures']):
+            name = ''.join(self.random.sample(BENCHMARK_WORDS, self.random.randint(2, 4)))
+            lectures.append(Lecture(
+                lecture_code=f'{BENCHMARK_CODE_PREFIX}{i}',
+                lecture_name=name[:50],
+                lecture_name_jamo=jamo(name[:50]),
+                recent_open_year=self.random.randint(2013, UPDATED_YEAR),
+                popularity=self.random.randint(0, 100)))
+        Lecture.objects.bulk_create(lectures, batch_size=5000)
+        self.prefixes = []
+        for _ in range(options['prefixes']):
+            lecture = self.random.choice(lectures)
+            text = self.random.choice([lecture.lecture_name, lecture.lecture_name_jamo, lecture.lecture_code])
+            self.prefixes.append(text[:self.random.randint(1, 6)])
+
+    def run(self, **options):
+        catalog = LectureCatalog.load('benchmark')
+        start = time.perf_counter()
+        catalog.prefix_index
+        self.info(f'prefix index build: {(time.perf_counter() - start) * 1000:.1f}ms')
+        year_standard = search_year_standard(UPDATED_YEAR)
+        self.measure('autocomplete', lambda prefix: catalog.autocomplete(prefix, year_standard), self.prefixes)
+        self.measure('autocomplete with lectures',
+                     lambda prefix: catalog.lectures(catalog.autocomplete(prefix, year_standard)), self.prefixes)
@@ -0,0 +1,87 @@
+from core.lecture.const import *
+from core.lecture.intervals import YearIntervalIndex
+from core.lecture.management.benchmark import BenchmarkCommand
+from core.lecture.management.commands.benchmarksearch import BENCHMARK_CODE_PREFIX
+from core.lecture.models import Lecture, LectureCredit, MajorLecture
+from core.major.const import MAJOR
+from core.major.models import Major
+
+
+class Command(BenchmarkCommand):
+    help = "Measure latency of MajorLecture and LectureCredit validity lookups by year"
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--lectures', type=int, default=2000, help='Number of synthetic lectures.')
+        parser.add_argument('--majors', type=int, default=20, help='Number of synthetic majors.')
+        parser.add_argument('--start-year', type=int, default=2013, help='First year of curriculums.')
+        parser.add_argument('--end-year', type=int, default=UPDATED_YEAR, help='Last year of curriculums.')
+        parser.add_argument('--lookups', type=int, default=500, help='Number of sampled lookups.')
+
+    def setup(self, **options):
+        start_year, end_year = options['start_year'], options['end_year']
+        Major.objects.bulk_create(
+            Major(major_name=f'{BENCHMARK_CODE_PREFIX}{i}', major_type=MAJOR) for i in range(options['majors']))
+        Lecture.objects.bulk_create(
+            (Lecture(lecture_code=f'{BENCHMARK_CODE_PREFIX}{i}', lecture_name=f'{BENCHMARK_CODE_PREFIX}{i}')
+             for i in range(options['lectures'])), batch_size=5000)
+        lectures = list(Lecture.objects.filter(lecture_code__startswith=BENCHMARK_CODE_PREFIX))
+        majors = list(Major.objects.filter(major_name__startswith=BENCHMARK_CODE_PREFIX))
+
+        def curriculum_years():
+            # Consecutive curriculums of random lengths, as revised over the years.
+            year = start_year
+            while year <= end_year:
+                last_year = min(end_year, year + self.random.randint(0, 4))
+                yield year, last_year
+                year = last_year + 1
+
+        majorlectures, lecturecredits = [], []
+        for lecture in lectures:
+            for major in self.random.sample(majors, self.random.randint(1, 3)):
+                lecture_type = self.random.choice([MAJOR_REQUIREMENT, MAJOR_ELECTIVE])
+                for first_year, last_year in curriculum_years():
+                    majorlectures.append(MajorLecture(
+                        lecture=lecture, major=major, lecture_type=lecture_type,
+                        start_year=first_year, end_year=last_year))
+            for first_year, last_year in curriculum_years():
+                lecturecredits.append(LectureCredit(
+                    lecture=lecture, credit=self.random.randint(1, 4), start_year=first_year, end_year=last_year))
+        MajorLecture.objects.bulk_create(majorlectures, batch_size=5000)
+        LectureCredit.objects.bulk_create(lecturecredits, batch_size=5000)
+        self.info(f'{len(majorlectures)} major lectures, {len(lecturecredits)} lecture credits')
+        self.lecture_ids = [lecture.id for lecture in lectures]
+        self.major_ids = [major.id for major in majors]
+        self.lookups = [
+            (self.random.choice(self.lecture_ids), self.random.choice(self.major_ids),
+             self.random.randint(start_year, end_year))
+            for _ in range(options['lookups'])]
+
+    def run(self, **options):
+        self.measure(
+            'MajorLecture range query',
+            lambda lookup: list(MajorLecture.objects.filter(
+                lecture_id=lookup[0], major_id=lookup[1], start_year__lte=lookup[2], end_year__gte=lookup[2])
+                .values_list('lecture_type', flat=True)),
+            self.lookups)
+        self.measure(
+            'LectureCredit range query',
+            lambda lookup: list(LectureCredit.objects.filter(
+                lecture_id=lookup[0], start_year__lte=lookup[2], end_year__gte=lookup[2])
+                .values_list('credit', flat=True)),
+            self.lookups)
+        majorlectures = YearIntervalIndex(
+            ((lecture_id, major_id), start_year, end_year, lecture_type)
+            for lecture_id, major_id, start_year, end_year, lecture_type in MajorLecture.objects.filter(
+                lecture_id__in=self.lecture_ids).values_list(
+                'lecture_id', 'major_id', 'start_year', 'end_year', 'lecture_type'))
+        lecturecredits = YearIntervalIndex(LectureCredit.objects.filter(
+            lecture_id__in=self.lecture_ids).order_by('id').values_list('lecture_id', 'start_year', 'end_year', 'credit'))
+        self.measure(
+            'MajorLecture interval index',
+            lambda lookup: majorlectures.get((lookup[0], lookup[1]), lookup[2]),
+            self.lookups)
+        self.measure(
+            'LectureCredit interval index',
+            lambda lookup: lecturecredits.get(lookup[0], lookup[2]),
+            self.lookups)
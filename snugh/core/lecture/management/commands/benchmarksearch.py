@@ -0,0 +1,62 @@
+from django.db.models import Q
+from core.lecture.catalog import LectureCatalog
+from core.lecture.management.benchmark import BenchmarkCommand
+from core.lecture.models import Lecture
+import core.lecture.const as LECTURE_TYPES
+
+BENCHMARK_CODE_PREFIX = 'BENCH.'
+BENCHMARK_WORDS = ['경영', '과학', '컴퓨터', '개론', '원론', '회계', '고급', '알고리즘', '데이터', '통계',
+                   '물리', '화학', '생명', '사회', '문화', '역사', '철학', '공학', '설계', '실험',
+                   '세미나', '특강', '이론', '응용', '기초', '현대', '한국', '국제', '관리', '마케팅']
+
+
+class Command(BenchmarkCommand):
+    help = "Compare lecture keyword search latency of chained icontains filters and the n-gram index, " \
+           "and measure fuzzy search of the lecture catalog"
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--lectures', type=int, default=50000, help='Number of synthetic lectures.')
+        parser.add_argument('--keywords', type=int, default=50, help='Number of sampled keywords.')
+
+    def setup(self, **options):
+        lectures = []
+        for i in range(options['lectures']):
+            name = ''.join(self.random.sample(BENCHMARK_WORDS, self.random.randint(2, 4)))
+            lectures.append(Lecture(
+                lecture_code=f'{BENCHMARK_CODE_PREFIX}{i}',
+                lecture_name=name[:50],
+                lecture_type=self.random.choice([LECTURE_TYPES.MAJOR_REQUIREMENT,
+                                                 LECTURE_TYPES.MAJOR_ELECTIVE,
+                                                 LECTURE_TYPES.GENERAL]),
+                recent_open_year=self.random.randint(2013, 2022)))
+        Lecture.objects.bulk_create(lectures, batch_size=5000)
+        Lecture.objects.filter(lecture_code__startswith=BENCHMARK_CODE_PREFIX).index_ngrams()
+        self.keywords = []
+        for _ in range(options['keywords']):
+            name = self.random.choice(lectures).lecture_name
+            start = self.random.randrange(len(name))
+            self.keywords.append(name[start:start + self.random.randint(1, 4)])
+        self.typos = []
+        for _ in range(options['keywords']):
+            name = self.random.choice(lectures).lecture_name
+            position = self.random.randrange(len(name))
+            self.typos.append(name[:position] + self.random.choice('가나다라마바사') + name[position + 1:])
+
+    def run(self, **options):
+        self.measure('chained icontains', self.legacy_search, self.keywords)
+        self.measure('n-gram index', self.search, self.keywords)
+        catalog = LectureCatalog.load('benchmark')
+        self.measure('fuzzy search', lambda keyword: catalog.fuzzy(keyword, 0), self.typos)
+        self.measure('fuzzy search in database', lambda keyword: Lecture.objects.fuzzy(keyword), self.typos)
+
+    @staticmethod
+    def legacy_search(keyword):
+        query = Q()
+        for c in keyword:
+            query &= Q(lecture_name__icontains=c)
+        return list(Lecture.objects.filter(query).values_list('id', flat=True))
+
+    @staticmethod
+    def search(keyword):
+        return list(Lecture.objects.search(keyword).values_list('id', flat=True))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from core.lecture.const import RECOGNITION_BATCH_SIZE
+from core.lecture.models import LectureRecognition
+from core.lecture.recognition import build_recognitions
+
+
+class Command(BaseCommand):
+    help = "Build lecture recognitions of majors from major lectures. Run after importing curriculums."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=RECOGNITION_BATCH_SIZE, help='Number of rows inserted at once.')
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.NOTICE('Building lecture recognitions from major lectures...'))
+        build = build_recognitions(options['batch_size'])
+        count = LectureRecognition.objects.filter(build=build).count()
+        self.stdout.write(self.style.SUCCESS(f'Successfully built {count} lecture recognitions as build {build.id}.'))
@@ -1,11 +1,13 @@
 from django.core.management.base import BaseCommand, CommandError
 from core.lecture.models import Lecture
+from core.lecture.search import bump_catalog_version
 from core.major.models import Major
 from core.requirement.models import Requirement
 
 
 class Command(BaseCommand):
     help = "Copies data for testing from remote database 'remote'"
+    # Only static data is copied. Semester lectures and the ledger of earned credits of plans are not touched.
 
     src_db = 'remote'
     dest_db = 'default'
@@ -13,7 +15,9 @@ class Command(BaseCommand):
     def handle(self, *args, **options):
         self.notice('Starting migration')
         self.notice('Loading lectures')
-        lectures = Lecture.objects.using(self.src_db).all()
+        lectures = list(Lecture.objects.using(self.src_db).all())
+        for lecture in lectures:
+            lecture.update_search_keys()
         self.success('Successfully loaded lectures')
         self.notice('Loading majors')
         majors = Major.objects.using(self.src_db).all()
@@ -24,6 +28,10 @@ class Command(BaseCommand):
         self.notice('Saving lectures')
         Lecture.objects.using(self.dest_db).bulk_create(lectures)
         self.success('Successfully saved lectures')
+        self.notice('Indexing lectures')
+        count = Lecture.objects.using(self.dest_db).filter(id__in=[lecture.id for lecture in lectures]).index_ngrams()
+        bump_catalog_version()
+        self.success(f'Successfully indexed {count} grams')
         self.notice('Saving majors')
         Major.objects.using(self.dest_db).bulk_create(majors)
         self.success('Successfully saved majors')
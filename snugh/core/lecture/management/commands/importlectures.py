@@ -6,6 +6,7 @@ import requests
 import xlrd
 
 from core.lecture.models import Lecture
+from core.lecture.search import bump_catalog_version
 import core.semester.const as SEMESTER_TYPES
 import core.lecture.const as LECTURE_TYPES
 
@@ -23,6 +24,7 @@ class Command(BaseCommand):
         parser.add_argument('--dry-run', action='store_true', help="Show the number of lectures that will be modified; don't actually update them.")
         parser.add_argument('--ignore-errors', action='store_true', help='Ignore unexpected errors detected while importing.')
         parser.add_argument('--noinput', '--no-input', action='store_false', dest='interactive', help='Do NOT prompt the user for input of any kind.')
+        parser.add_argument('--rebuild-index', action='store_true', help='Rebuild the search index of all lectures, not only of the created ones.')
 
     def handle(self, *args, **options):
         year = options['year']
@@ -31,6 +33,7 @@ class Command(BaseCommand):
         self.dry_run = options['dry_run']
         self.ignore_errors = options['ignore_errors']
         self.interactive = options['interactive']
+        self.rebuild_index = options['rebuild_index']
 
         url = 'https://sugang.snu.ac.kr/sugang/cc/cc100InterfaceExcel.action'
         semester_params = { SEMESTER_TYPES.FIRST: 'U000200001U000300001',
@@ -120,6 +123,8 @@ class Command(BaseCommand):
         self.info(f'{existing_lectures.count()} lectures already exist.')
         existing_lecture_codes = [lecture.lecture_code for lecture in existing_lectures]
         new_lectures = [Lecture(**values) for values in lecture_values_list if values['lecture_code'] not in existing_lecture_codes]
+        for lecture in new_lectures:
+            lecture.update_search_keys()
         self.info(f'{len(new_lectures)} lectures will be created.')
 
         lectures_to_set_year = existing_lectures.filter(recent_open_year__lt=year)
@@ -155,6 +160,15 @@ class Command(BaseCommand):
                 lectures_to_set_semester.update(open_semester=semester)
                 lectures_to_add_semester.update(open_semester=SEMESTER_TYPES.ALL)
                 existing_lectures.filter(open_semester=SEMESTER_TYPES.UNKNOWN).update(open_semester=semester)
+
+            if self.rebuild_index:
+                self.notice('Rebuilding search index of all lectures...')
+                lectures_to_index = Lecture.objects.all()
+            else:
+                self.notice('Indexing new lectures...')
+                lectures_to_index = Lecture.objects.filter(lecture_code__in=[lecture.lecture_code for lecture in new_lectures])
+            self.info(f'{lectures_to_index.index_ngrams()} grams were indexed.')
+            bump_catalog_version()
             self.success('Successfully imported all lectures.')
         else:
             self.notice('No lectures were created or updated because --dry-run was requested.')
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from core.lecture.catalog import LectureCatalog
+from core.lecture.search import catalog_version
+
+
+class Command(BaseCommand):
+    help = "Load the lecture catalog and report how much memory it takes in each worker"
+
+    def handle(self, *args, **options):
+        version = catalog_version()
+        self.stdout.write(self.style.NOTICE(f'Loading lecture catalog {version}...'))
+        catalog = LectureCatalog.load(version)
+        self.stdout.write(f'{len(catalog)} lectures, {len(catalog.postings)} grams.')
+        self.stdout.write(self.style.SUCCESS(f'Each worker holds about {catalog.memory_usage() / 2**20:.1f} MiB.'))
@@ -0,0 +1,43 @@
+from itertools import groupby
+from operator import itemgetter
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from core.lecture.const import RECALCULATION_BATCH_SIZE, SEQUENCE_MIN_GAP
+from core.lecture.models import SemesterLecture
+from core.lecture.utils import rebalance_sequences
+
+
+class Command(BaseCommand):
+    help = "Spread recent_sequence of semester lectures in semesters running out of room between them. Run periodically, e.g. daily with cron."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--min-gap', type=int, default=SEQUENCE_MIN_GAP, help='Rebalance semesters having a smaller gap between lectures.')
+        parser.add_argument('--batch-size', type=int, default=RECALCULATION_BATCH_SIZE, help='Number of semesters rebalanced in a transaction.')
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.NOTICE('Finding crowded semesters...'))
+        semester_ids = list(self.crowded_semesters(options['min_gap']))
+        updated = 0
+        for i in range(0, len(semester_ids), options['batch_size']):
+            with transaction.atomic():
+                semesterlectures = SemesterLecture.objects\
+                    .filter(semester_id__in=semester_ids[i:i+options['batch_size']])\
+                    .select_for_update()\
+                    .order_by('semester_id', 'recent_sequence', 'id')
+                changed = []
+                for _, sequence in groupby(semesterlectures, key=lambda semesterlecture: semesterlecture.semester_id):
+                    changed += rebalance_sequences(list(sequence))
+                SemesterLecture.objects.bulk_update(changed, ['recent_sequence'], batch_size=RECALCULATION_BATCH_SIZE)
+                updated += len(changed)
+        self.stdout.write(self.style.SUCCESS(
+            f'Successfully rebalanced {len(semester_ids)} semesters, updating {updated} semester lectures.'))
+
+    @staticmethod
+    def crowded_semesters(min_gap: int):
+        """Ids of semesters having adjacent semester lectures less than min_gap apart."""
+        sequences = SemesterLecture.objects.order_by('semester_id', 'recent_sequence')\
+            .values_list('semester_id', 'recent_sequence')
+        for semester_id, rows in groupby(sequences.iterator(), key=itemgetter(0)):
+            sequence = [recent_sequence for _, recent_sequence in rows]
+            if any(after - before < min_gap for before, after in zip(sequence, sequence[1:])):
+                yield semester_id
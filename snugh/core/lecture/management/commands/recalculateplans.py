@@ -0,0 +1,82 @@
+import multiprocessing
+import os
+import time
+from itertools import islice
+from typing import Iterable, Iterator, List, Tuple
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+
+from core.lecture.utils import recalculate_plans
+from core.plan.models import Plan
+
+
+def recalculate_chunk(args: Tuple[List[int], bool]) -> Tuple[int, int, int, int]:
+    """Recalculate a chunk of plans in a transaction. Returns (last plan id, plans, semester lectures, semesters)."""
+    plan_ids, dry_run = args
+    with transaction.atomic():
+        semesterlectures, semesters = recalculate_plans(plan_ids, dry_run)
+    return plan_ids[-1], len(plan_ids), semesterlectures, semesters
+
+
+class Command(BaseCommand):
+    help = "Recalculate lecture info of every plan. Run after loading new MajorLecture or LectureCredit data."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=200, help='Number of plans recalculated in a transaction.')
+        parser.add_argument('--processes', type=int, default=os.cpu_count(), help='Number of worker processes.')
+        parser.add_argument('--start-after', type=int, default=0, help='Resume from plans after this plan id.')
+        parser.add_argument('--dry-run', action='store_true', help="Show the number of rows that will be modified; don't actually update them.")
+
+    def handle(self, *args, **options):
+        self.dry_run = options['dry_run']
+        plan_ids = Plan.objects.filter(id__gt=options['start_after']).order_by('id').values_list('id', flat=True)
+        self.total = plan_ids.count()
+        self.notice(f'Recalculating {self.total} plans after plan id {options["start_after"]}...')
+        chunks = ((chunk, self.dry_run) for chunk in self.chunks(plan_ids.iterator(), options['chunk_size']))
+        self.last_plan_id = options['start_after']
+        try:
+            if options['processes'] > 1:
+                # Forked workers must open their own database connections.
+                connections.close_all()
+                with multiprocessing.Pool(options['processes']) as pool:
+                    self.report(pool.imap(recalculate_chunk, chunks))
+            else:
+                self.report(map(recalculate_chunk, chunks))
+        except Exception as e:
+            raise CommandError(
+                f'Failed after plan id {self.last_plan_id}: {e!r}. Resume with --start-after {self.last_plan_id}.')
+
+    @staticmethod
+    def chunks(plan_ids: Iterable[int], chunk_size: int) -> Iterator[List[int]]:
+        plan_ids = iter(plan_ids)
+        chunk = list(islice(plan_ids, chunk_size))
+        while chunk:
+            yield chunk
+            chunk = list(islice(plan_ids, chunk_size))
+
+    def report(self, results: Iterable[Tuple[int, int, int, int]]):
+        """Report throughput of results, which come in order of plan id."""
+        start = time.perf_counter()
+        plans = semesterlectures = semesters = 0
+        for last_plan_id, chunk_plans, chunk_semesterlectures, chunk_semesters in results:
+            self.last_plan_id = last_plan_id
+            plans += chunk_plans
+            semesterlectures += chunk_semesterlectures
+            semesters += chunk_semesters
+            elapsed = time.perf_counter() - start
+            self.info(f'{plans}/{self.total} plans, up to plan id {last_plan_id}, {plans / elapsed:.1f} plans/sec')
+        if self.dry_run:
+            self.info(f'{semesterlectures} semester lectures and {semesters} semesters will be updated.')
+            self.notice('No plans were updated because --dry-run was requested.')
+        else:
+            self.success(f'Successfully updated {semesterlectures} semester lectures and {semesters} semesters.')
+
+    def info(self, msg, ending=None):
+        self.stdout.write(msg, ending=ending)
+
+    def notice(self, msg, ending=None):
+        self.stdout.write(self.style.NOTICE(msg), ending=ending)
+
+    def success(self, msg, ending=None):
+        self.stdout.write(self.style.SUCCESS(msg), ending=ending)
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from core.lecture.models import Lecture
+from core.lecture.search import bump_popularity_version
+
+
+class Command(BaseCommand):
+    help = "Recount popularity of lectures from semester lectures. Run periodically, e.g. hourly with cron."
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.NOTICE('Counting semester lectures of each lecture...'))
+        with transaction.atomic():
+            updated = Lecture.objects.all().rollup_popularity()
+        if updated:
+            bump_popularity_version()
+        self.stdout.write(self.style.SUCCESS(f'Successfully updated popularity of {updated} lectures.'))
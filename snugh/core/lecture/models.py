@@ -1,6 +1,13 @@
+import heapq
 from django.db import models
+from django.db.models import Case, When, Q, Value, IntegerField, F, Count, Exists, OuterRef
+from django.db.models.functions import Length
 from core.major.models import Major
+from core.plan.models import Plan
 from core.lecture.const import *
+from core.lecture.search import (
+    bump_catalog_version, choseong, fuzzy_grams, jamo, lecture_ngrams, search_key, search_mode,
+    substring_distance)
 from core.semester.models import Semester
 from core.semester.const import *
 
@@ -8,16 +15,105 @@ from core.semester.const import *
 class LectureQuerySet(models.QuerySet):
     """Override Queryset of Lecture related model."""
     def search(self, keyword):
-        result = self.all()
-        for c in keyword:
-            result = result.filter(lecture_name__icontains=c)
-        return result
+        """
+        Lectures matching keyword, looked up in LectureNgram.
+            plain: name contains every character of keyword.
+            choseong: initial consonants of name contain keyword.
+            jamo: jamo of name contain jamo of keyword, which has half-composed syllables.
+        """
+        if not keyword:
+            return self.all()
+        mode = search_mode(keyword)
+        if mode == CHOSEONG_SEARCH:
+            return self.filter(id__in=ngram_candidates(set(keyword)), lecture_name_choseong__contains=keyword)
+        if mode == JAMO_SEARCH:
+            keyword_jamo = jamo(keyword)
+            return self.filter(id__in=ngram_candidates(set(keyword_jamo)), lecture_name_jamo__contains=keyword_jamo)
+        return self.filter(id__in=ngram_candidates(set(keyword.lower())))
+
+    def rank(self, keyword):
+        """Order lectures by how well they match keyword."""
+        field, key = search_key(keyword)
+        return self.annotate(
+                first_letter=Case(
+                    When(**{f'{field}__startswith': key[0]}, then=Value(0)),
+                    default=Value(1),
+                    output_field=IntegerField(),),
+                icontains_priority=Case(
+                    When(**{f'{field}__icontains': key}, then=Value(0)),
+                    default=Value(1),
+                    output_field=IntegerField(),),
+                priority = F('first_letter')+F('icontains_priority'),
+                match_rate=Length('lecture_name'),
+                popularity_priority=Value(0)-F('popularity'))\
+            .order_by(*SEARCH_ORDERING)
+
+    def rollup_popularity(self):
+        """
+        Recount popularity of lectures in this queryset with one GROUP BY over SemesterLecture.
+        Returns the number of lectures whose popularity changed.
+        """
+        counts = dict(SemesterLecture.objects.filter(lecture__in=self.values('id'))\
+            .values('lecture')\
+            .annotate(count=Count('id'))\
+            .values_list('lecture', 'count'))
+        lectures = []
+        for lecture_id, popularity in self.values_list('id', 'popularity').iterator():
+            count = counts.get(lecture_id, 0)
+            if count != popularity:
+                lectures.append(Lecture(id=lecture_id, popularity=count))
+        Lecture.objects.bulk_update(lectures, ['popularity'], batch_size=POPULARITY_BATCH_SIZE)
+        return len(lectures)
+
+    def fuzzy(self, keyword):
+        """
+        Lectures with a part of name within FUZZY_DISTANCE of keyword, same as LectureCatalog.fuzzy.
+        Returns sorted keys of SEARCH_ORDERING, with priorities ranked after every exact match.
+        """
+        grams = fuzzy_grams(keyword)
+        if grams is None:
+            return []
+        grams, least = grams
+        lower_keyword = keyword.lower()
+        keys = []
+        for lecture_id, lecture_name, popularity, recent_open_year in self.filter(id__in=ngram_candidates(grams, least))\
+                .values_list('id', 'lecture_name', 'popularity', 'recent_open_year').iterator():
+            distance = substring_distance(lower_keyword, lecture_name.lower())
+            if distance <= FUZZY_DISTANCE:
+                keys.append((FUZZY_PRIORITY + distance, len(lecture_name), -popularity,
+                             recent_open_year, lecture_name, lecture_id))
+        return heapq.nsmallest(FUZZY_SEARCH_LIMIT, keys)
+
+    def autocomplete(self, prefix, year_standard=0, limit=AUTOCOMPLETE_LIMIT):
+        """Lectures opened since year_standard whose name or code starts with prefix, ranked as LectureCatalog.autocomplete."""
+        prefix = jamo(prefix)
+        return self.filter(
+                Q(lecture_name_jamo__startswith=prefix) | Q(lecture_code__istartswith=prefix),
+                recent_open_year__gte=year_standard)\
+            .order_by('-popularity', Length('lecture_name'), 'lecture_name', 'id')[:limit]
+
+    def exclude_plan(self, plan_id):
+        """Exclude lectures already in plan, as a correlated NOT EXISTS instead of a NOT IN id list."""
+        return self.exclude(Exists(SemesterLecture.objects.filter(semester__plan_id=plan_id, lecture=OuterRef('pk'))))
+
+    def index_ngrams(self):
+        """Rebuild search index of lectures in this queryset."""
+        LectureNgram.objects.filter(lecture__in=self.values('id')).delete()
+        lecturengrams = []
+        for lecture_id, lecture_name in self.values_list('id', 'lecture_name').iterator():
+            for gram in lecture_ngrams(lecture_name):
+                lecturengrams.append(LectureNgram(gram=gram, lecture_id=lecture_id))
+        LectureNgram.objects.bulk_create(lecturengrams, batch_size=NGRAM_BATCH_SIZE, ignore_conflicts=True)
+        return len(lecturengrams)
 
 
 class Lecture(models.Model):
     """
     Static model related to lectures.
     # TODO: explain fields.
+
+        # Fields
+        popularity (int): Number of semester lectures taking the lecture, recounted by rolluppopularity.
     """
     lecture_code = models.CharField(max_length=50, default="")
     lecture_name = models.CharField(max_length=50, db_index=True)
@@ -29,8 +125,59 @@ class Lecture(models.Model):
     grade = models.PositiveSmallIntegerField(null=True, blank=True)
     prev_lecture_name = models.CharField(max_length=50, null=True)
     recent_open_year = models.IntegerField(default=0)
+    lecture_name_choseong = models.CharField(max_length=50, default="")
+    lecture_name_jamo = models.CharField(max_length=250, default="")
+    popularity = models.IntegerField(default=0)
     objects = LectureQuerySet.as_manager()
 
+    def save(self, *args, **kwargs):
+        self.update_search_keys()
+        super().save(*args, **kwargs)
+        Lecture.objects.filter(id=self.id).index_ngrams()
+        bump_catalog_version()
+
+    def delete(self, *args, **kwargs):
+        # Semester lectures deleted by cascade bypass the ledger of earned credits,
+        # so plans taking the lecture are taken off the ledger until reconcileledger --fix rebuilds them.
+        plans = Plan.objects.filter(semester__semesterlecture__lecture=self).distinct()
+        for plan in list(plans):
+            plan.earnedcredit.all().delete()
+        result = super().delete(*args, **kwargs)
+        bump_catalog_version()
+        return result
+
+    def update_search_keys(self):
+        """Update choseong and jamo keys of lecture name. Call before bulk_create."""
+        self.lecture_name_choseong = choseong(self.lecture_name)
+        self.lecture_name_jamo = jamo(self.lecture_name)
+
+
+class LectureNgram(models.Model):
+    """
+    Posting list of lecture search index. Relates each gram of lecture name to lectures containing it.
+    Kept in sync by Lecture.save and importlectures.
+
+        # Fields
+        gram (str): Lowercased character or jamo of lecture name.
+        lecture (Lecture): Lecture whose name contains the gram.
+    """
+    gram = models.CharField(max_length=1)
+    lecture = models.ForeignKey(Lecture, related_name='lecturengram', on_delete=models.CASCADE)
+
+    class Meta:
+        unique_together = (
+            ('gram', 'lecture')
+        )
+
+
+def ngram_candidates(grams, least=None):
+    """Ids of lectures having every gram, or at least least of them, as a subquery."""
+    return LectureNgram.objects.filter(gram__in=grams)\
+        .values('lecture')\
+        .annotate(gram_count=Count('gram'))\
+        .filter(gram_count__gte=len(grams) if least is None else least)\
+        .values('lecture')
+
 
 class SemesterLecture(models.Model):
     """
@@ -45,7 +192,7 @@ class SemesterLecture(models.Model):
     recognized_major2 = models.ForeignKey(Major, related_name='semesterlecture2', on_delete=models.CASCADE, default=DEFAULT_MAJOR_ID)
     lecture_type2 = models.CharField(max_length=50, choices=LECTURE_TYPE, default=NONE)
     credit = models.PositiveIntegerField(default=0)
-    recent_sequence = models.PositiveSmallIntegerField()
+    recent_sequence = models.PositiveIntegerField()
     is_modified = models.BooleanField(default=False)
 
 
@@ -64,6 +211,12 @@ class MajorLecture(models.Model):
     created_at = models.DateField(auto_now_add=True)
     updated_at = models.DateField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['lecture', 'major', 'start_year', 'end_year']),
+            models.Index(fields=['major', 'lecture_type', 'start_year', 'end_year']),
+        ]
+
 
 class LectureCredit(models.Model):
     """
@@ -76,3 +229,50 @@ class LectureCredit(models.Model):
     end_year = models.PositiveSmallIntegerField()
     created_at = models.DateField(auto_now_add=True)
     updated_at = models.DateField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['lecture', 'start_year', 'end_year']),
+        ]
+
+
+class RecognitionBuild(models.Model):
+    """
+    Version of LectureRecognition rows.
+    Rows of a build are inserted before it is completed, so readers keep using
+    the last completed build while buildrecognitions runs.
+
+        # Fields
+        is_completed (bool): Whether every row of the build is inserted.
+        created_at (datetime): When the build started.
+        completed_at (datetime): When the build was completed.
+    """
+    is_completed = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(null=True)
+
+
+class LectureRecognition(models.Model):
+    """
+    Materialized lecture type of a lecture recognized by a major, built from MajorLecture by buildrecognitions.
+    The greatest lecture type of MajorLecture valid from start_year to end_year, as update_lecture_info picks.
+
+        # Fields
+        build (RecognitionBuild): Build the row belongs to.
+        lecture (Lecture): Recognized lecture.
+        major (Major): Major recognizing lecture.
+        start_year (int): First entrance or taken year the lecture type is valid for.
+        end_year (int): Last entrance or taken year the lecture type is valid for.
+        lecture_type (str): Lecture type recognized by major.
+    """
+    build = models.ForeignKey(RecognitionBuild, related_name='lecturerecognition', on_delete=models.CASCADE)
+    lecture = models.ForeignKey(Lecture, related_name='lecturerecognition', on_delete=models.CASCADE)
+    major = models.ForeignKey(Major, related_name='lecturerecognition', on_delete=models.CASCADE)
+    start_year = models.PositiveSmallIntegerField()
+    end_year = models.PositiveSmallIntegerField()
+    lecture_type = models.CharField(max_length=50, choices=LECTURE_TYPE, default=NONE)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['build', 'lecture', 'major']),
+        ]
@@ -0,0 +1,133 @@
+"""Recognition of semester lectures by majors of a plan, resolved in memory."""
+
+from itertools import groupby
+from operator import itemgetter
+from typing import Iterable, List, Optional, Tuple
+from django.utils import timezone
+from core.lecture.const import *
+from core.lecture.intervals import YearIntervalIndex
+from core.lecture.models import LectureCredit, LectureRecognition, MajorLecture, RecognitionBuild
+from core.major.models import Major
+
+
+class RecognitionEngine:
+    """
+    Resolves lecture types, recognized majors and credits of lectures taken in a plan.
+    Lecture types are loaded once from the last completed LectureRecognition build,
+    or from MajorLecture if none was built or the build has no rows of the lectures,
+    and credits from LectureCredit, instead of being filtered per semester lecture and major.
+
+        # Fields
+        majors (list): Majors of plan in order of priority.
+        build (int): Id of RecognitionBuild lecture types were loaded from, None for MajorLecture.
+        majorlectures (YearIntervalIndex): Lecture types of lectures by (lecture id, major id).
+        lecturecredits (YearIntervalIndex): Credits of LectureCredit rows by lecture id, in id order.
+    """
+
+    def __init__(self, majors: Iterable[Major], lecture_ids: Iterable[int]):
+        self.majors = list(majors)
+        lecture_ids = set(lecture_ids)
+        major_ids = [major.id for major in self.majors]
+        self.build = current_recognition_build()
+        fields = ('lecture_id', 'major_id', 'start_year', 'end_year', 'lecture_type')
+        majorlectures = []
+        if self.build is not None:
+            majorlectures = list(LectureRecognition.objects.filter(
+                build_id=self.build, lecture_id__in=lecture_ids, major_id__in=major_ids).values_list(*fields))
+        if not majorlectures and lecture_ids and major_ids:
+            # The build may have been pruned after it was read, or lectures were added after it was built.
+            self.build = None
+            majorlectures = MajorLecture.objects.filter(lecture_id__in=lecture_ids, major_id__in=major_ids)\
+                .exclude(lecture_type__in=[GENERAL, GENERAL_ELECTIVE])\
+                .values_list(*fields)
+        self.majorlectures = YearIntervalIndex(
+            ((lecture_id, major_id), start_year, end_year, lecture_type)
+            for lecture_id, major_id, start_year, end_year, lecture_type in majorlectures)
+        lecturecredits = LectureCredit.objects.filter(lecture_id__in=lecture_ids)\
+            .order_by('id')\
+            .values_list('lecture_id', 'start_year', 'end_year', 'credit')
+        self.lecturecredits = YearIntervalIndex(lecturecredits)
+
+    def lecture_type(self, lecture_id: int, major_id: int, year: int) -> Optional[str]:
+        """Lecture type of lecture in major at year. The greatest one wins, as ordered by '-lecture_type'."""
+        lecture_types = self.majorlectures.get((lecture_id, major_id), year)
+        return max(lecture_types) if lecture_types else None
+
+    def recognize(
+        self,
+        lecture_id: int,
+        entrance_year: int,
+        year: int,
+        majors: Optional[List[Major]] = None) -> List[Tuple[Major, str]]:
+        """
+        (major, lecture_type) of at most two majors recognizing lecture, as recognized_major1 and 2.
+        Majors are matched with the curriculum of entrance year first,
+        then the remaining ones with the curriculum of the year lecture is taken.
+        majors, in order of priority, default to the majors engine was built with.
+        """
+        majors = self.majors if majors is None else majors
+        recognized = []
+        for major in majors:
+            if len(recognized) > 1:
+                break
+            lecture_type = self.lecture_type(lecture_id, major.id, entrance_year)
+            if lecture_type:
+                recognized.append((major, lecture_type))
+        if len(recognized) != 2:
+            for major in majors:
+                if len(recognized) > 1:
+                    break
+                if recognized and major.id == recognized[0][0].id:
+                    continue
+                lecture_type = self.lecture_type(lecture_id, major.id, year)
+                if lecture_type:
+                    recognized.append((major, lecture_type))
+        return recognized
+
+    def credit(self, lecture_id: int, year: int) -> Optional[int]:
+        """Credit of lecture at year, from the first valid LectureCredit."""
+        credits = self.lecturecredits.get(lecture_id, year)
+        return credits[0] if credits else None
+
+
+def current_recognition_build() -> Optional[int]:
+    """Id of the last completed RecognitionBuild, None if LectureRecognition was never built."""
+    return RecognitionBuild.objects.filter(is_completed=True).order_by('-id').values_list('id', flat=True).first()
+
+
+def build_recognitions(batch_size: int = RECOGNITION_BATCH_SIZE) -> RecognitionBuild:
+    """
+    Build LectureRecognition from MajorLecture as a new RecognitionBuild.
+    Adjacent years of the same lecture type are merged into one row.
+    The previous completed build is kept for readers that already read its id,
+    and builds before it are dropped.
+    """
+    build = RecognitionBuild.objects.create()
+    majorlectures = MajorLecture.objects.exclude(lecture_type__in=[GENERAL, GENERAL_ELECTIVE])\
+        .order_by('lecture_id', 'major_id')\
+        .values_list('lecture_id', 'major_id', 'start_year', 'end_year', 'lecture_type')
+    recognitions = []
+    for (lecture_id, major_id), rows in groupby(majorlectures.iterator(), key=itemgetter(0, 1)):
+        index = YearIntervalIndex((None, start_year, end_year, lecture_type) for _, _, start_year, end_year, lecture_type in rows)
+        recognition = None
+        for _, start_year, end_year, lecture_types in index.intervals():
+            lecture_type = max(lecture_types)
+            if recognition and recognition.end_year + 1 == start_year and recognition.lecture_type == lecture_type:
+                recognition.end_year = end_year
+                continue
+            recognition = LectureRecognition(
+                build=build, lecture_id=lecture_id, major_id=major_id,
+                start_year=start_year, end_year=end_year, lecture_type=lecture_type)
+            recognitions.append(recognition)
+        if len(recognitions) >= batch_size:
+            LectureRecognition.objects.bulk_create(recognitions, batch_size=batch_size)
+            recognitions = []
+    LectureRecognition.objects.bulk_create(recognitions, batch_size=batch_size)
+    build.is_completed = True
+    build.completed_at = timezone.now()
+    build.save()
+    previous_build = RecognitionBuild.objects.filter(is_completed=True, id__lt=build.id)\
+        .order_by('-id').values_list('id', flat=True).first()
+    if previous_build is not None:
+        RecognitionBuild.objects.filter(id__lt=previous_build).delete()
+    return build
@@ -0,0 +1,179 @@
+"""Search helpers related to Lecture."""
+
+import hashlib
+import json
+import uuid
+from typing import List, Optional, Set, Tuple
+from django.core.cache import cache
+from django.db import transaction
+from core.lecture.const import *
+
+HANGUL_BASE = 0xAC00
+HANGUL_END = 0xD7A3
+CHOSEONG = 'ㄱㄲㄴㄷㄸㄹㅁㅂㅃㅅㅆㅇㅈㅉㅊㅋㅌㅍㅎ'
+JUNGSEONG = ['ㅏ', 'ㅐ', 'ㅑ', 'ㅒ', 'ㅓ', 'ㅔ', 'ㅕ', 'ㅖ', 'ㅗ', 'ㅗㅏ', 'ㅗㅐ', 'ㅗㅣ', 'ㅛ', 'ㅜ', 'ㅜㅓ', 'ㅜㅔ',
+             'ㅜㅣ', 'ㅠ', 'ㅡ', 'ㅡㅣ', 'ㅣ']
+JONGSEONG = ['', 'ㄱ', 'ㄲ', 'ㄱㅅ', 'ㄴ', 'ㄴㅈ', 'ㄴㅎ', 'ㄷ', 'ㄹ', 'ㄹㄱ', 'ㄹㅁ', 'ㄹㅂ', 'ㄹㅅ', 'ㄹㅌ', 'ㄹㅍ',
+             'ㄹㅎ', 'ㅁ', 'ㅂ', 'ㅂㅅ', 'ㅅ', 'ㅆ', 'ㅇ', 'ㅈ', 'ㅊ', 'ㅋ', 'ㅌ', 'ㅍ', 'ㅎ']
+# Compound jamo typed with two keys.
+COMPOUND_JAMO = {
+    'ㅘ': 'ㅗㅏ', 'ㅙ': 'ㅗㅐ', 'ㅚ': 'ㅗㅣ', 'ㅝ': 'ㅜㅓ', 'ㅞ': 'ㅜㅔ', 'ㅟ': 'ㅜㅣ', 'ㅢ': 'ㅡㅣ',
+    'ㄳ': 'ㄱㅅ', 'ㄵ': 'ㄴㅈ', 'ㄶ': 'ㄴㅎ', 'ㄺ': 'ㄹㄱ', 'ㄻ': 'ㄹㅁ', 'ㄼ': 'ㄹㅂ', 'ㄽ': 'ㄹㅅ',
+    'ㄾ': 'ㄹㅌ', 'ㄿ': 'ㄹㅍ', 'ㅀ': 'ㄹㅎ', 'ㅄ': 'ㅂㅅ',
+}
+
+
+def is_hangul_syllable(c: str) -> bool:
+    return HANGUL_BASE <= ord(c) <= HANGUL_END
+
+
+def is_hangul_jamo(c: str) -> bool:
+    """Compatibility jamo such as 'ㄱ', 'ㅏ' typed alone."""
+    return 'ㄱ' <= c <= 'ㅣ'
+
+
+def choseong(text: str) -> str:
+    """Initial consonants of hangul syllables. ex) 경영학원론 -> ㄱㅇㅎㅇㄹ"""
+    result = []
+    for c in text.lower():
+        if is_hangul_syllable(c):
+            result.append(CHOSEONG[(ord(c) - HANGUL_BASE) // 588])
+        else:
+            result.append(c)
+    return ''.join(result)
+
+
+def jamo(text: str) -> str:
+    """Jamo in typing order of hangul syllables. ex) 관리 -> ㄱㅗㅏㄴㄹㅣ"""
+    result = []
+    for c in text.lower():
+        if is_hangul_syllable(c):
+            code = ord(c) - HANGUL_BASE
+            result.append(CHOSEONG[code // 588])
+            result.append(JUNGSEONG[code % 588 // 28])
+            result.append(JONGSEONG[code % 28])
+        else:
+            result.append(COMPOUND_JAMO.get(c, c))
+    return ''.join(result)
+
+
+def search_mode(keyword: str) -> str:
+    """
+    Mode of keyword search.
+        choseong: keyword only has initial consonants. ex) ㄱㅇㅎ
+        jamo: keyword has jamo typed alone, as its syllables are half-composed. ex) 경여ㅇ, 한ㄱ
+        plain: keyword only has composed characters.
+    """
+    if keyword and all(c in CHOSEONG for c in keyword):
+        return CHOSEONG_SEARCH
+    if any(is_hangul_jamo(c) for c in keyword):
+        return JAMO_SEARCH
+    return PLAIN_SEARCH
+
+
+def search_key(keyword: str) -> Tuple[str, str]:
+    """Lecture field and keyword to match for the search mode of keyword."""
+    mode = search_mode(keyword)
+    if mode == CHOSEONG_SEARCH:
+        return 'lecture_name_choseong', keyword
+    if mode == JAMO_SEARCH:
+        return 'lecture_name_jamo', jamo(keyword)
+    return 'lecture_name', keyword
+
+
+def lecture_ngrams(text: str) -> Set[str]:
+    """
+    Grams of text stored in the lecture search index.
+    Keyword search matches every character of the keyword separately,
+    so the posting lists are keyed on single lowercased characters and jamo.
+    """
+    return set(text.lower()) | set(jamo(text)) if text else set()
+
+
+def fuzzy_grams(keyword: str) -> Optional[Tuple[Set[str], int]]:
+    """
+    Grams of a keyword of fuzzy search, and how many of them a matching lecture name has at least.
+    An edit drops at most one gram of keyword, so names lacking more of them cannot match.
+    None if keyword is too short or not plain.
+    """
+    if len(keyword) < FUZZY_MIN_LENGTH or search_mode(keyword) != PLAIN_SEARCH:
+        return None
+    grams = set(keyword.lower())
+    return grams, len(grams) - FUZZY_DISTANCE
+
+
+def substring_distance(keyword: str, text: str, limit: int = FUZZY_DISTANCE) -> int:
+    """
+    Least edit distance of keyword to any part of text, or limit + 1 once it exceeds limit.
+    A typo of part of a lecture name matches, as keyword search does. ex) 경영학윈 -> 경영학원론
+    """
+    previous = [0] * (len(text) + 1)
+    for i, ck in enumerate(keyword, 1):
+        current = [i]
+        for j, ct in enumerate(text, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ck != ct)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return min(min(previous), limit + 1)
+
+
+def cache_versions(*keys, timeout=None) -> List[str]:
+    """Versions stored in cache keys, set to new versions if missing."""
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            versions[key] = cache.get_or_set(key, lambda: uuid.uuid4().hex, timeout)
+    return [versions[key] for key in keys]
+
+
+def catalog_version() -> str:
+    """Version of Lecture data, shared by every worker."""
+    return cache_versions(CATALOG_VERSION_KEY)[0]
+
+
+def bump_catalog_version():
+    """Mark Lecture data as changed, so that every worker reloads its catalog."""
+    cache.set(CATALOG_VERSION_KEY, uuid.uuid4().hex, None)
+
+
+def popularity_version() -> str:
+    """Version of popularity of lectures, shared by every worker."""
+    return cache_versions(POPULARITY_VERSION_KEY)[0]
+
+
+def bump_popularity_version():
+    """
+    Mark popularity of lectures as changed, so that every worker refreshes popularity of its catalog.
+    The catalog version is kept, so that major curriculums, search sessions and plan ETags stay valid.
+    """
+    cache.set(POPULARITY_VERSION_KEY, uuid.uuid4().hex, None)
+
+
+def curriculum_key(*params) -> str:
+    """
+    Cache key of a major curriculum, which changes with Lecture data.
+    Equivalent majors and departments are given in params, so the key changes however they are written.
+    """
+    curriculum = cache_versions(CATALOG_VERSION_KEY) + list(params)
+    return CURRICULUM_KEY.format(hashlib.md5(json.dumps(curriculum).encode()).hexdigest())
+
+
+def bump_plan_search_version(*plan_ids: int):
+    """
+    Mark lectures of plans as changed, so that cached search sessions of plans expire.
+    Bumped once the current transaction commits, or a search before the commit could cache lectures it changes.
+    """
+    transaction.on_commit(lambda: cache.set_many(
+        {PLAN_SEARCH_VERSION_KEY.format(plan_id): uuid.uuid4().hex for plan_id in plan_ids}, SEARCH_SESSION_TIMEOUT))
+
+
+def search_session_key(plan_id: int, *params) -> str:
+    """
+    Cache key of a search session of plan.
+    Changes with Lecture data or lectures of plan, and with equivalent majors and departments given in params.
+    """
+    session = cache_versions(CATALOG_VERSION_KEY)
+    session += cache_versions(PLAN_SEARCH_VERSION_KEY.format(plan_id), timeout=SEARCH_SESSION_TIMEOUT)
+    session += list(params)
+    return SEARCH_SESSION_KEY.format(plan_id, hashlib.md5(json.dumps(session).encode()).hexdigest())
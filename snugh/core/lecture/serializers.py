@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from django.db.models import Q
 from core.lecture.models import Lecture, SemesterLecture
 from core.lecture.const import *
 # TODO: Comments about serializers.
@@ -6,9 +7,39 @@ from core.lecture.const import *
 class LectureSerializer(serializers.ModelSerializer):
     class Meta:
         model = Lecture 
-        fields = '__all__'
+        exclude = ('lecture_name_choseong', 'lecture_name_jamo', 'popularity')
+
+class LecturePreviewSerializer(LectureSerializer):
+    """Lecture with the lecture info it would get when added to plan, given as 'previews' in context."""
+    preview = serializers.SerializerMethodField()
+
+    def get_preview(self, lecture):
+        semesterlecture = self.context['previews'][lecture.id]
+        return {
+            'lecture_type': semesterlecture.lecture_type,
+            'recognized_major1': semesterlecture.recognized_major1_id,
+            'lecture_type1': semesterlecture.lecture_type1,
+            'recognized_major2': semesterlecture.recognized_major2_id,
+            'lecture_type2': semesterlecture.lecture_type2,
+            'credit': semesterlecture.credit,
+        }
+
+class LectureAutocompleteSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Lecture 
+        fields = ('id', 'lecture_code', 'lecture_name')
 
 class SemesterLectureSerializer(serializers.ModelSerializer):
+    recent_sequence = serializers.SerializerMethodField()
+
     class Meta:
         model = SemesterLecture 
         fields = '__all__'
+
+    def get_recent_sequence(self, semesterlecture):
+        # recent_sequence is a sparse ordering key, exposed as a dense sequence.
+        return SemesterLecture.objects.filter(semester_id=semesterlecture.semester_id)\
+            .filter(
+                Q(recent_sequence__lt=semesterlecture.recent_sequence) |
+                Q(recent_sequence=semesterlecture.recent_sequence, id__lt=semesterlecture.id))\
+            .count()
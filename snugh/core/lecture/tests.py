@@ -1,13 +1,25 @@
-from django.test import TestCase
+from unittest.mock import patch
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Case, When, Value, IntegerField
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from rest_framework import status
 from user.utils import UserFactory
 from core.major.const import *
 from user.const import *
-from core.major.models import Major
-from core.lecture.models import Lecture, SemesterLecture
+from core.major.models import Major, MajorEquivalent
+from core.lecture.models import Lecture, SemesterLecture, MajorLecture, LectureCredit, LectureRecognition, RecognitionBuild
+from core.lecture.intervals import YearIntervalIndex
+from core.lecture.recognition import RecognitionEngine, build_recognitions
+from core.lecture.utils import encode_cursor, rebalance_sequences, recalculate_plans, update_lecture_info
+from core.lecture.catalog import get_catalog
+from core.lecture.search import bump_popularity_version, catalog_version
 from core.plan.models import Plan, PlanMajor
 from core.semester.models import Semester
 from core.semester.const import *
+from core.lecture.const import UPDATED_YEAR, SEQUENCE_GAP
+from core.semester.utils import add_semester_credits, sub_semester_credits
 from core.history.models import CreditChangeHistory, LectureTypeChangeHistory
 from core.const import *
 
@@ -16,6 +28,7 @@ class LectureTestCase(TestCase):
     # Test Lecture APIs.
         [POST] lecture/
         [GET] lecture/
+        [GET] lecture/autocomplete/
         [DELETE] lecture/<semesterlecture_id>/
     """
 
@@ -76,6 +89,10 @@ class LectureTestCase(TestCase):
                 recent_sequence=idx
                 )
 
+    def setUp(self):
+        # Cached searches and lecture catalog outlive rolled back test data.
+        cache.clear()
+
 
     def test_create_lecture_errors(self):
         """
@@ -115,7 +132,23 @@ class LectureTestCase(TestCase):
         Test cases in creating semester lecture.
             1) create semester lecture.
             2) lecture already exists in plan.
+            3) number of queries does not grow with lectures.
         """
+        # 3) number of queries does not grow with lectures.
+        n_queries = []
+        for lecture_id in [self.lectures_id[:1], self.lectures_id]:
+            with transaction.atomic():
+                with CaptureQueriesContext(connection) as context:
+                    response = self.client.post(
+                        '/lecture/', 
+                        data={"semester_id": self.semester_1.id, "lecture_id": lecture_id}, 
+                        HTTP_AUTHORIZATION=self.user_token, 
+                        content_type="application/json")
+                self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+                n_queries.append(len(context.captured_queries))
+                transaction.set_rollback(True)
+        self.assertEqual(n_queries[0], n_queries[1])
+
         # 1) create semester lecture.
         data = {
             "semester_id": self.semester_1.id,
@@ -420,6 +453,442 @@ class LectureTestCase(TestCase):
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
 
 
+    def test_search_lecture(self):
+        """
+        Test cases in searching lectures with n-gram index.
+            1) same result with chained icontains filters.
+            2) saved lecture is indexed.
+            3) search with initial consonants.
+            4) search with half-composed syllables.
+        """
+        # 1) same result with chained icontains filters.
+        for keyword in ["경영", "영경", "회계", "관리마", "Ab"]:
+            expected = Lecture.objects.all()
+            for c in keyword:
+                expected = expected.filter(lecture_name__icontains=c)
+            self.assertEqual(
+                set(Lecture.objects.search(keyword).values_list('id', flat=True)),
+                set(expected.values_list('id', flat=True)))
+
+        # 2) saved lecture is indexed.
+        lecture = Lecture.objects.create(lecture_code="TEST.001", lecture_name="와플스튜디오특강")
+        self.assertIn(lecture, Lecture.objects.search("플특"))
+        self.assertEqual(lecture.lecture_name_choseong, "ㅇㅍㅅㅌㄷㅇㅌㄱ")
+        lecture.lecture_name = "와플세미나"
+        lecture.save()
+        self.assertNotIn(lecture, Lecture.objects.search("플특"))
+
+        # 3) search with initial consonants.
+        lectures = Lecture.objects.search("ㄱㅇㄱㅎ")
+        self.assertIn("경영과학", lectures.values_list('lecture_name', flat=True))
+        for lecture in lectures:
+            self.assertIn("ㄱㅇㄱㅎ", lecture.lecture_name_choseong)
+        self.assertEqual(lectures.rank("ㄱㅇㄱㅎ")[0].priority, 0)
+
+        # 4) search with half-composed syllables.
+        for keyword in ["경영과ㅎ", "경영고ㅏ", "경여ㅇ"]:
+            self.assertIn("경영과학", Lecture.objects.search(keyword).values_list('lecture_name', flat=True))
+
+
+    def test_list_lecture_fuzzy(self):
+        """
+        Test cases in listing lecture with fuzzy search.
+            1) lecture name with a typo.
+            2) fuzzy matches ranked after exact matches.
+            3) part of lecture name with a typo.
+        """
+        lecture = Lecture.objects.create(lecture_code="TEST.004", lecture_name="와플스튜디오", recent_open_year=2021)
+        typo = Lecture.objects.create(lecture_code="TEST.005", lecture_name="와플스튜디어", recent_open_year=2021)
+        body = {
+            "search_type": "keyword", 
+            "search_year": 2018, 
+            "search_keyword": "와플스튜다오", 
+            "plan_id": self.plan.id
+        }
+        for enabled in [True, False]:
+            with override_settings(LECTURE_CATALOG_ENABLED=enabled):
+                # 1) lecture name with a typo.
+                response = self.client.get("/lecture/", data=body, HTTP_AUTHORIZATION=self.user_token)
+                self.assertNotIn(lecture.id, [lecture["id"] for lecture in response.json()])
+                response = self.client.get("/lecture/", data=dict(body, fuzzy="true"), HTTP_AUTHORIZATION=self.user_token)
+                self.assertIn(lecture.id, [lecture["id"] for lecture in response.json()])
+
+                # 2) fuzzy matches ranked after exact matches.
+                response = self.client.get(
+                    "/lecture/", 
+                    data=dict(body, search_keyword="와플스튜디오", fuzzy="true"), 
+                    HTTP_AUTHORIZATION=self.user_token)
+                lectures = [lecture["id"] for lecture in response.json()]
+                self.assertLess(lectures.index(lecture.id), lectures.index(typo.id))
+
+                # 3) part of lecture name with a typo.
+                response = self.client.get(
+                    "/lecture/", 
+                    data=dict(body, search_keyword="플스튜다", fuzzy="true"), 
+                    HTTP_AUTHORIZATION=self.user_token)
+                self.assertIn(lecture.id, [lecture["id"] for lecture in response.json()])
+
+    def test_list_lecture_popularity(self):
+        """
+        Test cases in ranking lectures by popularity.
+            1) popularity counts semester lectures.
+            2) popular lecture ranked first among equally matching lectures.
+            3) catalog version is kept.
+        """
+        # 1) popularity counts semester lectures.
+        Lecture.objects.all().rollup_popularity()
+        for lecture in self.existing_lectures.all():
+            self.assertEqual(lecture.popularity, lecture.semesterlecture.count())
+
+        # 2) popular lecture ranked first among equally matching lectures.
+        unpopular = Lecture.objects.create(lecture_code="TEST.006", lecture_name="와플랩가", recent_open_year=2021)
+        popular = Lecture.objects.create(lecture_code="TEST.007", lecture_name="와플랩나", recent_open_year=2021)
+        other_plan = Plan.objects.create(user=self.stranger, plan_name="other plan")
+        other_semester = Semester.objects.create(plan=other_plan, year=2021, semester_type=FIRST)
+        SemesterLecture.objects.create(semester=other_semester, lecture=popular, recent_sequence=0)
+        get_catalog()
+        version = catalog_version()
+        Lecture.objects.all().rollup_popularity()
+        bump_popularity_version()
+        body = {
+            "search_type": "keyword", 
+            "search_year": 2018, 
+            "search_keyword": "와플랩", 
+            "plan_id": self.plan.id
+        }
+        for enabled in [True, False]:
+            with override_settings(LECTURE_CATALOG_ENABLED=enabled):
+                response = self.client.get("/lecture/", data=body, HTTP_AUTHORIZATION=self.user_token)
+                lectures = [lecture["id"] for lecture in response.json()]
+                self.assertLess(lectures.index(popular.id), lectures.index(unpopular.id))
+
+        # 3) catalog version is kept.
+        self.assertEqual(catalog_version(), version)
+        self.assertEqual(get_catalog().version, version)
+
+    def test_autocomplete_lecture(self):
+        """
+        Test cases in autocompleting lecture.
+            1) lecture name prefix.
+            2) half-composed lecture name prefix.
+            3) lecture code prefix.
+            4) query parameter missing [prefix].
+            5) lecture not opened recently.
+            6) same result from database with lecture catalog disabled.
+        """
+        lecture = Lecture.objects.create(
+            lecture_code="WAFFLE.101", lecture_name="와플스튜디오개론", popularity=1000, recent_open_year=2021)
+        old_lecture = Lecture.objects.create(
+            lecture_code="WAFFLE.102", lecture_name="와플스튜디오특강", popularity=2000, recent_open_year=2015)
+
+        # 1) lecture name prefix.
+        response = self.client.get("/lecture/autocomplete/", data={"prefix": "와플스"}, HTTP_AUTHORIZATION=self.user_token)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()[0], {"id": lecture.id, "lecture_code": "WAFFLE.101", "lecture_name": "와플스튜디오개론"})
+
+        # 2) half-composed lecture name prefix.
+        response = self.client.get("/lecture/autocomplete/", data={"prefix": "와플슽"}, HTTP_AUTHORIZATION=self.user_token)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn(lecture.id, [lecture["id"] for lecture in response.json()])
+
+        # 3) lecture code prefix.
+        response = self.client.get("/lecture/autocomplete/", data={"prefix": "waffle.1"}, HTTP_AUTHORIZATION=self.user_token)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn(lecture.id, [lecture["id"] for lecture in response.json()])
+
+        # 4) query parameter missing [prefix].
+        response = self.client.get("/lecture/autocomplete/", HTTP_AUTHORIZATION=self.user_token)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json()['detail'], "query parameter missing [prefix]")
+
+        # 5) lecture not opened recently.
+        response = self.client.get("/lecture/autocomplete/", data={"prefix": "와플스"}, HTTP_AUTHORIZATION=self.user_token)
+        self.assertNotIn(old_lecture.id, [lecture["id"] for lecture in response.json()])
+        response = self.client.get(
+            "/lecture/autocomplete/", data={"prefix": "와플스", "search_year": 2015}, HTTP_AUTHORIZATION=self.user_token)
+        self.assertEqual(response.json()[0]["id"], old_lecture.id)
+
+        # 6) same result from database with lecture catalog disabled.
+        queries = [
+            {"prefix": "와플스"},
+            {"prefix": "와플슽"},
+            {"prefix": "waffle.1"},
+            {"prefix": "와플스", "search_year": 2015},
+        ]
+        for query in queries:
+            responses = []
+            for enabled in [True, False]:
+                with override_settings(LECTURE_CATALOG_ENABLED=enabled), \
+                        patch('core.lecture.views.get_catalog', wraps=get_catalog) as catalog:
+                    response = self.client.get("/lecture/autocomplete/", data=query, HTTP_AUTHORIZATION=self.user_token)
+                    self.assertEqual(response.status_code, status.HTTP_200_OK)
+                    self.assertEqual(catalog.called, enabled)
+                    responses.append(response.json())
+            self.assertEqual(responses[0], responses[1])
+
+    def test_list_lecture_catalog(self):
+        """
+        Test cases in listing lecture from lecture catalog.
+            1) same result with database search.
+        """
+        # 1) same result with database search.
+        queries = [
+            {"search_type": "major_requirement", "search_year": 2018, "major_name": self.major.major_name},
+            {"search_type": "major_elective", "search_year": 2021, "major_name": self.major.major_name, "page": 2},
+            {"search_type": "keyword", "search_year": 2018, "search_keyword": "경영"},
+            {"search_type": "keyword", "search_year": 2021, "search_keyword": "ㄱㅇ", "page": 3},
+        ]
+        for query in queries:
+            body = dict(query, plan_id=self.plan.id)
+            responses = []
+            for enabled in [True, False]:
+                with override_settings(LECTURE_CATALOG_ENABLED=enabled):
+                    response = self.client.get(
+                        "/lecture/",
+                        data=body,
+                        HTTP_AUTHORIZATION=self.user_token,
+                    )
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                responses.append([lecture["id"] for lecture in response.json()])
+            self.assertEqual(responses[0], responses[1])
+
+    def test_list_lecture_session(self):
+        """
+        Test cases in listing lecture with cached search session.
+            1) following pages reuse searched lectures.
+            2) lecture added to plan is excluded.
+            3) lecture deleted from plan is included again.
+        """
+        lecture = Lecture.objects.create(
+            lecture_code="TEST.002", 
+            lecture_name="와플경영특강", 
+            lecture_type=GENERAL, 
+            credit=3, 
+            recent_open_year=2021)
+        body = {
+            "search_type": "keyword", 
+            "search_year": 2018, 
+            "search_keyword": "와플경영특강", 
+            "plan_id": self.plan.id
+        }
+
+        # 1) following pages reuse searched lectures.
+        with override_settings(LECTURE_CATALOG_ENABLED=False):
+            response = self.client.get("/lecture/", data=body, HTTP_AUTHORIZATION=self.user_token)
+            self.assertIn(lecture.id, [lecture["id"] for lecture in response.json()])
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.get("/lecture/", data=dict(body, page=2), HTTP_AUTHORIZATION=self.user_token)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            for query in context.captured_queries:
+                self.assertNotIn("lecturengram", query["sql"])
+
+        # 2) lecture added to plan is excluded.
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                '/lecture/', 
+                data={"semester_id": self.semester_1.id, "lecture_id": [lecture.id]}, 
+                HTTP_AUTHORIZATION=self.user_token, 
+                content_type="application/json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        response = self.client.get("/lecture/", data=body, HTTP_AUTHORIZATION=self.user_token)
+        self.assertNotIn(lecture.id, [lecture["id"] for lecture in response.json()])
+
+        # 3) lecture deleted from plan is included again.
+        semesterlecture = SemesterLecture.objects.get(semester=self.semester_1, lecture=lecture)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.delete(f"/lecture/{semesterlecture.id}/", HTTP_AUTHORIZATION=self.user_token)
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        response = self.client.get("/lecture/", data=body, HTTP_AUTHORIZATION=self.user_token)
+        self.assertIn(lecture.id, [lecture["id"] for lecture in response.json()])
+
+    def test_list_lecture_curriculum(self):
+        """
+        Test cases in listing lecture with cached major curriculum.
+            1) lectures of plan are excluded from shared curriculum.
+            2) equivalent major added.
+            3) equivalent major written by queryset, bypassing save and delete.
+        """
+        body = {
+            "search_type": "major_requirement", 
+            "search_year": 2018, 
+            "major_name": self.major.major_name,
+            "plan_id": self.plan.id
+        }
+
+        # 1) lectures of plan are excluded from shared curriculum.
+        other_plan = Plan.objects.create(user=self.user, plan_name="other plan")
+        response = self.client.get("/lecture/", data=body, HTTP_AUTHORIZATION=self.user_token)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        lectures = [lecture["id"] for lecture in response.json()]
+        response = self.client.get("/lecture/", data=dict(body, plan_id=other_plan.id), HTTP_AUTHORIZATION=self.user_token)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        other_lectures = [lecture["id"] for lecture in response.json()]
+        for lecture in self.existing_lectures.filter(lecture_type=MAJOR_REQUIREMENT, recent_open_year__gte=2018):
+            self.assertNotIn(lecture.id, lectures)
+        self.assertTrue(set(lectures) <= set(other_lectures))
+
+        # 2) equivalent major added.
+        lecture = Lecture.objects.create(
+            lecture_code="TEST.003", 
+            lecture_name="가가가와플", 
+            open_major="와플학과", 
+            lecture_type=MAJOR_REQUIREMENT, 
+            recent_open_year=2021)
+        for enabled in [True, False]:
+            with override_settings(LECTURE_CATALOG_ENABLED=enabled):
+                response = self.client.get("/lecture/", data=dict(body, search_year=2021), HTTP_AUTHORIZATION=self.user_token)
+                self.assertNotIn(lecture.id, [lecture["id"] for lecture in response.json()])
+                equivalent = MajorEquivalent.objects.create(major_name=self.major.major_name, equivalent_major_name="와플학과")
+                response = self.client.get("/lecture/", data=dict(body, search_year=2021), HTTP_AUTHORIZATION=self.user_token)
+                self.assertIn(lecture.id, [lecture["id"] for lecture in response.json()])
+                equivalent.delete()
+
+        # 3) equivalent major written by queryset, bypassing save and delete.
+        for enabled in [True, False]:
+            with override_settings(LECTURE_CATALOG_ENABLED=enabled):
+                MajorEquivalent.objects.bulk_create([
+                    MajorEquivalent(major_name=self.major.major_name, equivalent_major_name="와플학과")])
+                response = self.client.get("/lecture/", data=dict(body, search_year=2021), HTTP_AUTHORIZATION=self.user_token)
+                self.assertIn(lecture.id, [lecture["id"] for lecture in response.json()])
+                MajorEquivalent.objects.filter(equivalent_major_name="와플학과").update(equivalent_major_name="와플학부")
+                response = self.client.get("/lecture/", data=dict(body, search_year=2021), HTTP_AUTHORIZATION=self.user_token)
+                self.assertNotIn(lecture.id, [lecture["id"] for lecture in response.json()])
+                MajorEquivalent.objects.filter(equivalent_major_name="와플학부").delete()
+
+    def test_list_lecture_exclusion(self):
+        """
+        Test cases in excluding lectures of plan from search.
+            1) excluded with anti-join, not with id list.
+        """
+        # 1) excluded with anti-join, not with id list.
+        body = {
+            "search_type": "keyword", 
+            "search_year": 2018, 
+            "search_keyword": "마케팅", 
+            "plan_id": self.plan.id
+        }
+        with override_settings(LECTURE_CATALOG_ENABLED=False):
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.get("/lecture/", data=body, HTTP_AUTHORIZATION=self.user_token)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        for lecture in response.json():
+            self.assertNotIn(lecture["lecture_name"], self.existing_lectures_name)
+        search_queries = [query["sql"] for query in context.captured_queries if "core_lecturengram" in query["sql"]]
+        self.assertTrue(search_queries)
+        for sql in search_queries:
+            self.assertIn("NOT (EXISTS", sql.upper())
+            self.assertNotRegex(sql, r'id\W* IN \(\d')
+
+    def test_list_lecture_cursor(self):
+        """
+        Test cases in listing lecture with cursor.
+            1) same result with page number.
+            2) invalid cursor.
+        """
+        # 1) same result with page number.
+        queries = [
+            {"search_type": "major_requirement", "search_year": 2018, "major_name": self.major.major_name},
+            {"search_type": "keyword", "search_year": 2018, "search_keyword": "경영"},
+            {"search_type": "keyword", "search_year": 2018, "search_keyword": "ㄱ"},
+        ]
+        for query in queries:
+            body = dict(query, plan_id=self.plan.id)
+            for enabled in [True, False]:
+                with override_settings(LECTURE_CATALOG_ENABLED=enabled):
+                    pages = []
+                    while True:
+                        response = self.client.get(
+                            "/lecture/",
+                            data=dict(body, page=len(pages) + 1),
+                            HTTP_AUTHORIZATION=self.user_token,
+                        )
+                        page = [lecture["id"] for lecture in response.json()]
+                        if not page or (pages and page == pages[-1]):
+                            break
+                        pages.append(page)
+                    lectures = []
+                    cursor = ""
+                    while cursor is not None:
+                        response = self.client.get(
+                            "/lecture/",
+                            data=dict(body, cursor=cursor),
+                            HTTP_AUTHORIZATION=self.user_token,
+                        )
+                        self.assertEqual(response.status_code, status.HTTP_200_OK)
+                        data = response.json()
+                        lectures += [lecture["id"] for lecture in data["results"]]
+                        cursor = data["next"]
+                self.assertEqual(lectures, sum(pages, []))
+
+        # 2) invalid cursor.
+        cursors = ["invalid", encode_cursor(["0", 0, 0, 2021, "경영", 1]), encode_cursor([0, 0, 0, 2021, None, 1])]
+        for cursor in cursors:
+            for enabled in [True, False]:
+                with override_settings(LECTURE_CATALOG_ENABLED=enabled):
+                    response = self.client.get(
+                        "/lecture/",
+                        data={"search_type": "keyword", "search_year": 2018, "search_keyword": "경영",
+                              "plan_id": self.plan.id, "cursor": cursor},
+                        HTTP_AUTHORIZATION=self.user_token,
+                    )
+                    self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_list_lecture_preview(self):
+        """
+        Test cases in listing lecture with preview.
+            1) same lecture info with adding lectures.
+            2) number of queries does not grow with lectures.
+            3) not plan's owner.
+        """
+        body = {
+            "search_type": "keyword", 
+            "search_year": 2018, 
+            "search_keyword": "경영", 
+            "plan_id": self.plan.id
+        }
+        # 1) same lecture info with adding lectures.
+        response = self.client.get("/lecture/", data=dict(body, preview="true"), HTTP_AUTHORIZATION=self.user_token)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()
+        self.assertTrue(data)
+        for lecture in data:
+            with transaction.atomic():
+                response = self.client.post(
+                    "/lecture/",
+                    data={"semester_id": self.semester_1.id, "lecture_id": [lecture["id"]]},
+                    content_type="application/json",
+                    HTTP_AUTHORIZATION=self.user_token)
+                self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+                semesterlecture = SemesterLecture.objects.get(semester=self.semester_1, lecture_id=lecture["id"])
+                self.assertEqual(lecture["preview"], {
+                    "lecture_type": semesterlecture.lecture_type,
+                    "recognized_major1": semesterlecture.recognized_major1_id,
+                    "lecture_type1": semesterlecture.lecture_type1,
+                    "recognized_major2": semesterlecture.recognized_major2_id,
+                    "lecture_type2": semesterlecture.lecture_type2,
+                    "credit": semesterlecture.credit})
+                transaction.set_rollback(True)
+
+        # 2) number of queries does not grow with lectures.
+        n_queries = []
+        for keyword in ["경영", "경영과학"]:
+            counts = []
+            for preview in ["true", "false"]:
+                with CaptureQueriesContext(connection) as context:
+                    self.client.get(
+                        "/lecture/", 
+                        data=dict(body, search_keyword=keyword, preview=preview), 
+                        HTTP_AUTHORIZATION=self.user_token)
+                counts.append(len(context.captured_queries))
+            n_queries.append(counts[0] - counts[1])
+        self.assertEqual(n_queries[0], n_queries[1])
+
+        # 3) not plan's owner.
+        response = self.client.get("/lecture/", data=dict(body, preview="true"), HTTP_AUTHORIZATION=self.stranger_token)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        response = self.client.get("/lecture/", data=body, HTTP_AUTHORIZATION=self.stranger_token)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
     def test_lecture_delete(self):
         """
         Test cases in deleting semester lecture.
@@ -850,6 +1319,54 @@ class LecturePositionTestCase(TestCase):
         )
         self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
 
+    def test_lecture_position_sparse(self):
+        """
+        Test cases in positioning semester lecture with sparse recent_sequence.
+            1) only the positioned semester lecture is written.
+            2) semester out of room is rebalanced.
+        """
+        def positions(semester):
+            return list(semester.semesterlecture.order_by('recent_sequence', 'id').values_list('id', flat=True))
+
+        def sequences(semester):
+            return dict(semester.semesterlecture.values_list('id', 'recent_sequence'))
+
+        semesterlectures = list(self.semester_2.semesterlecture.order_by('recent_sequence', 'id'))
+        SemesterLecture.objects.bulk_update(rebalance_sequences(semesterlectures), ['recent_sequence'])
+
+        # 1) only the positioned semester lecture is written.
+        order = positions(self.semester_2)
+        before = sequences(self.semester_2)
+        target_lecture = SemesterLecture.objects.get(id=order[-1])
+        response = self.client.put(
+            f"/lecture/{target_lecture.id}/position/",
+            data={"semester_to": self.semester_2.id, "position": 1},
+            content_type="application/json",
+            HTTP_AUTHORIZATION=self.user_token,
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        after = sequences(self.semester_2)
+        self.assertEqual([id for id in before if before[id] != after[id]], [target_lecture.id])
+        order.insert(1, order.pop())
+        self.assertEqual(positions(self.semester_2), order)
+        lectures = response.json()[1]['lectures']
+        self.assertEqual([lecture['semesterlecture_id'] for lecture in lectures], order)
+        self.assertEqual([lecture['recent_sequence'] for lecture in lectures], list(range(len(order))))
+
+        # 2) semester out of room is rebalanced.
+        for i in range(SEQUENCE_GAP.bit_length() + 1):
+            target_lecture = SemesterLecture.objects.get(id=order[-1])
+            response = self.client.put(
+                f"/lecture/{target_lecture.id}/position/",
+                data={"semester_to": self.semester_2.id, "position": 1},
+                content_type="application/json",
+                HTTP_AUTHORIZATION=self.user_token,
+            )
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            order.insert(1, order.pop())
+            self.assertEqual(positions(self.semester_2), order)
+        self.assertEqual(len(set(sequences(self.semester_2).values())), len(order))
+
 
 class LectureChangeTestCase(TestCase):
     """
@@ -1372,3 +1889,277 @@ class LectureChangeTestCase(TestCase):
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
         data = response.json()
         self.assertEqual(data['detail'], "Invalid field [lecture_type]")
+
+
+def legacy_update_lecture_info(user, majors, semesterlectures, semester, none_major):
+    """update_lecture_info before RecognitionEngine, querying MajorLecture per semester lecture and major."""
+    updated_semesterlectures = []
+    std1 = user.userprofile.entrance_year
+    std2 = semester.year
+    for semesterlecture in semesterlectures:
+        tmp_majors = majors
+        if not semesterlecture.is_modified:
+            semester = sub_semester_credits(semesterlecture, semester)
+            lecture = semesterlecture.lecture
+            if semesterlecture.lecture_type != GENERAL:
+                major_count = 0
+                majorlectures = lecture.majorlecture.all()
+                for major in tmp_majors:
+                    if major_count > 1:
+                        break
+                    candidate_majorlectures = majorlectures.filter(
+                        major=major,
+                        start_year__lte=std1,
+                        end_year__gte=std1)\
+                    .exclude(lecture_type__in=[GENERAL, GENERAL_ELECTIVE])\
+                    .order_by('-lecture_type')
+                    if candidate_majorlectures.exists():
+                        candidate_majorlecture = candidate_majorlectures[0]
+                        if major_count == 0:
+                            semesterlecture.lecture_type = candidate_majorlecture.lecture_type
+                            semesterlecture.lecture_type1 = candidate_majorlecture.lecture_type
+                            semesterlecture.recognized_major1 = major
+                        elif major_count == 1:
+                            semesterlecture.lecture_type2 = candidate_majorlecture.lecture_type
+                            semesterlecture.recognized_major2 = major
+                        major_count += 1
+                if major_count != 2:
+                    if major_count == 1:
+                        tmp_majors = tmp_majors.exclude(id=semesterlecture.recognized_major1.id)
+                    for major in tmp_majors:
+                        if major_count > 1:
+                            break
+                        candidate_majorlectures = lecture.majorlecture.filter(
+                            major=major,
+                            start_year__lte=std2,
+                            end_year__gte=std2)\
+                        .exclude(lecture_type__in=[GENERAL, GENERAL_ELECTIVE])\
+                        .order_by('-lecture_type')
+                        if candidate_majorlectures.exists() != 0:
+                            candidate_majorlecture = candidate_majorlectures[0]
+                            if major_count == 0:
+                                semesterlecture.lecture_type = candidate_majorlecture.lecture_type
+                                semesterlecture.lecture_type1 = candidate_majorlecture.lecture_type
+                                semesterlecture.recognized_major1 = major
+                            elif major_count == 1:
+                                semesterlecture.lecture_type2 = candidate_majorlecture.lecture_type
+                                semesterlecture.recognized_major2 = major
+                            major_count += 1
+                if major_count == 1:
+                    semesterlecture.lecture_type2 = NONE
+                    semesterlecture.recognized_major2 = none_major
+                elif major_count == 0:
+                    semesterlecture.lecture_type = GENERAL_ELECTIVE
+                    semesterlecture.lecture_type1 = GENERAL_ELECTIVE
+                    semesterlecture.recognized_major1 = none_major
+                    semesterlecture.lecture_type2 = NONE
+                    semesterlecture.recognized_major2 = none_major
+            # In id order, as returned through the index of lecture foreign key.
+            lecturecredits = lecture.lecturecredit.filter(start_year__lte=std2, end_year__gte=std2).order_by('id')
+            if lecturecredits.exists():
+                semesterlecture.credit = lecturecredits[0].credit
+            semester = add_semester_credits(semesterlecture, semester)
+            updated_semesterlectures.append(semesterlecture)
+    SemesterLecture.objects.bulk_update(
+        updated_semesterlectures, 
+        ['lecture_type', 'lecture_type1', 'lecture_type2', 'recognized_major1', 'recognized_major2'])
+    return semester
+
+
+class RecognitionEngineTestCase(TestCase):
+    """
+    # Test recognition of semester lectures in update_lecture_info.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = UserFactory.create(
+            email = "jaejae2374@test.com",
+            password = "waffle1234",
+            entrance_year = 2018,
+            full_name = "test user",
+            majors = [{
+                "major_name":"경영학과",
+                "major_type":"major"
+            }],
+            status = ACTIVE
+        )
+        cls.plan = Plan.objects.create(user=cls.user, plan_name="plan example")
+        cls.major_1 = Major.objects.get(major_name="경영학과", major_type="major")
+        cls.major_2 = Major.objects.get(major_name="심리학과", major_type="double_major")
+        PlanMajor.objects.create(major=cls.major_1, plan=cls.plan)
+        PlanMajor.objects.create(major=cls.major_2, plan=cls.plan)
+        cls.semesters = [
+            Semester.objects.create(plan=cls.plan, year=year, semester_type=semester_type)
+            for year in [2016, 2018, 2020, 2022] for semester_type in [FIRST, SECOND]]
+
+        major_lectures = MajorLecture.objects.filter(major__in=[cls.major_1, cls.major_2])\
+            .order_by('lecture_id').values_list('lecture_id', flat=True).distinct()[:40]
+        other_lectures = Lecture.objects.exclude(majorlecture__major__in=[cls.major_1, cls.major_2])\
+            .order_by('id').values_list('id', flat=True)[:8]
+        cls.lectures = list(Lecture.objects.filter(id__in=list(major_lectures) + list(other_lectures)).order_by('id'))
+        cls.new_lectures = cls.lectures[len(cls.lectures) // 2:]
+        for idx, lecture in enumerate(cls.lectures[:len(cls.lectures) // 2]):
+            cls.add_lecture(cls.semesters[idx % len(cls.semesters)], lecture)
+        cls.none_major = Major.objects.get(id=DEFAULT_MAJOR_ID)
+
+    @staticmethod
+    def add_lecture(semester, lecture):
+        semesterlecture = SemesterLecture.objects.create(
+            semester=semester,
+            lecture=lecture,
+            lecture_type=lecture.lecture_type,
+            credit=lecture.credit,
+            recent_sequence=semester.semesterlecture.count())
+        semester = add_semester_credits(semesterlecture, semester)
+        semester.save()
+        return semesterlecture
+
+    def majors(self):
+        return Major.objects.filter(id__in=[self.major_1.id, self.major_2.id])\
+            .annotate(custom_order=Case(When(major_type=MAJOR, then=Value(1)),
+                                        When(major_type=DOUBLE_MAJOR, then=Value(5)),
+                                        default=Value(9),
+                                        output_field=IntegerField(), ))\
+            .order_by('custom_order')
+
+    def snapshot(self):
+        semesterlectures = SemesterLecture.objects.filter(semester__plan=self.plan).order_by('lecture_id').values_list(
+            'lecture_id', 'lecture_type', 'lecture_type1', 'lecture_type2', 'recognized_major1', 'recognized_major2')
+        semesters = Semester.objects.filter(plan=self.plan).order_by('id').values_list(
+            'major_requirement_credit', 'major_elective_credit', 'general_credit', 'general_elective_credit')
+        return list(semesterlectures), list(semesters)
+
+    def legacy_calculate(self):
+        semesters = []
+        for semester in Semester.objects.filter(plan=self.plan).order_by('id'):
+            semesterlectures = semester.semesterlecture.select_related('lecture')
+            semesters.append(legacy_update_lecture_info(self.user, self.majors(), semesterlectures, semester, self.none_major))
+        Semester.objects.bulk_update(
+            semesters, 
+            ['major_requirement_credit', 'major_elective_credit', 'general_credit', 'general_elective_credit'])
+
+    def test_recognition_engine(self):
+        """
+        Test cases in recognizing semester lectures.
+            1) same result with legacy implementation [plan].
+            2) same result with legacy implementation [new semester lectures].
+            3) number of queries does not grow with lectures.
+        """
+        # 1) same result with legacy implementation [plan].
+        with transaction.atomic():
+            self.legacy_calculate()
+            expected = self.snapshot()
+            transaction.set_rollback(True)
+        with CaptureQueriesContext(connection) as context:
+            update_lecture_info(self.user, self.plan.id)
+        self.assertEqual(self.snapshot(), expected)
+        n_queries = len(context.captured_queries)
+
+        # 2) same result with legacy implementation [new semester lectures].
+        semester = self.semesters[3]
+        with transaction.atomic():
+            semester.refresh_from_db()
+            semesterlectures = [self.add_lecture(semester, lecture) for lecture in self.new_lectures]
+            legacy_semester = legacy_update_lecture_info(self.user, self.majors(), semesterlectures, semester, self.none_major)
+            legacy_semester.save()
+            expected = self.snapshot()
+            transaction.set_rollback(True)
+        semester.refresh_from_db()
+        semesterlectures = [self.add_lecture(semester, lecture) for lecture in self.new_lectures]
+        update_lecture_info(self.user, self.plan.id, semesterlectures, semester)
+        self.assertEqual(self.snapshot(), expected)
+
+        # 3) number of queries does not grow with lectures.
+        with CaptureQueriesContext(connection) as context:
+            update_lecture_info(self.user, self.plan.id)
+        self.assertEqual(len(context.captured_queries), n_queries)
+
+    def test_year_interval_index(self):
+        """
+        Test cases in looking up MajorLecture and LectureCredit by year with YearIntervalIndex.
+            1) same lecture types with range queries [majors of plan].
+            2) same credits with range queries, in id order.
+        """
+        lecture_ids = [lecture.id for lecture in self.lectures]
+        years = range(2013, UPDATED_YEAR + 1)
+
+        # 1) same lecture types with range queries [majors of plan].
+        majors = [self.major_1, self.major_2]
+        index = YearIntervalIndex(
+            ((lecture_id, major_id), start_year, end_year, lecture_type)
+            for lecture_id, major_id, start_year, end_year, lecture_type in MajorLecture.objects.filter(
+                lecture_id__in=lecture_ids, major__in=majors).values_list(
+                'lecture_id', 'major_id', 'start_year', 'end_year', 'lecture_type'))
+        for lecture_id in lecture_ids:
+            for major in majors:
+                for year in years:
+                    lecture_types = MajorLecture.objects.filter(
+                        lecture_id=lecture_id, major=major, start_year__lte=year, end_year__gte=year)\
+                        .values_list('lecture_type', flat=True)
+                    self.assertCountEqual(index.get((lecture_id, major.id), year), lecture_types)
+
+        # 2) same credits with range queries, in id order.
+        index = YearIntervalIndex(LectureCredit.objects.filter(lecture_id__in=lecture_ids)
+            .order_by('id').values_list('lecture_id', 'start_year', 'end_year', 'credit'))
+        for lecture_id in lecture_ids:
+            for year in years:
+                credits = LectureCredit.objects.filter(
+                    lecture_id=lecture_id, start_year__lte=year, end_year__gte=year)\
+                    .order_by('id').values_list('credit', flat=True)
+                self.assertEqual(list(index.get(lecture_id, year)), list(credits))
+
+    def test_recognition_table(self):
+        """
+        Test cases in recognizing semester lectures with LectureRecognition.
+            1) same result with legacy implementation.
+            2) readers use the last completed build.
+            3) previous build is kept, and older builds are dropped.
+        """
+        # 1) same result with legacy implementation.
+        with transaction.atomic():
+            self.legacy_calculate()
+            expected = self.snapshot()
+            transaction.set_rollback(True)
+        build = build_recognitions()
+        self.assertTrue(LectureRecognition.objects.filter(build=build).exists())
+        self.assertEqual(RecognitionEngine([], []).build, build.id)
+        update_lecture_info(self.user, self.plan.id)
+        self.assertEqual(self.snapshot(), expected)
+
+        # 2) readers use the last completed build.
+        RecognitionBuild.objects.create()
+        self.assertEqual(RecognitionEngine([], []).build, build.id)
+
+        # 3) previous build is kept, and older builds are dropped.
+        new_build = build_recognitions()
+        self.assertEqual(RecognitionEngine([], []).build, new_build.id)
+        self.assertTrue(LectureRecognition.objects.filter(build=build).exists())
+        last_build = build_recognitions()
+        self.assertEqual(
+            list(RecognitionBuild.objects.order_by('id').values_list('id', flat=True)), [new_build.id, last_build.id])
+        self.assertFalse(LectureRecognition.objects.filter(build=build).exists())
+
+    def test_recalculate_plans(self):
+        """
+        Test cases in recalculating plans in bulk.
+            1) dry run does not update plans.
+            2) same result with update_lecture_info.
+            3) recalculated plans do not change again.
+        """
+        with transaction.atomic():
+            update_lecture_info(self.user, self.plan.id)
+            expected = self.snapshot()
+            transaction.set_rollback(True)
+        before = self.snapshot()
+
+        # 1) dry run does not update plans.
+        semesterlectures, semesters = recalculate_plans([self.plan.id], dry_run=True)
+        self.assertEqual(self.snapshot(), before)
+
+        # 2) same result with update_lecture_info.
+        self.assertEqual(recalculate_plans([self.plan.id]), (semesterlectures, semesters))
+        self.assertEqual(self.snapshot(), expected)
+
+        # 3) recalculated plans do not change again.
+        self.assertEqual(recalculate_plans([self.plan.id]), (0, 0))
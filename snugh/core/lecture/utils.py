@@ -1,24 +1,73 @@
 """Utils related to Lecture APIs."""
 
-from core.lecture.models import SemesterLecture
+import base64
+import binascii
+import json
+from bisect import bisect_right
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+from core.lecture.models import Lecture, MajorLecture, SemesterLecture
 from core.lecture.const import *
+from core.lecture.recognition import RecognitionEngine
+from core.lecture.search import curriculum_key
 from core.plan.models import Plan
-from core.major.models import Major
+from core.plan.version import bump_plan_version
+from core.requirement.ledger import CreditLedger
+from core.major.models import Major, MajorEquivalent, DepartmentEquivalent
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from core.major.const import *
-from django.db.models import Case, When, Value, IntegerField
-from snugh.exceptions import NotOwner, NotFound
+from django.db.models import Case, Exists, When, Value, IntegerField, Max, OuterRef, Q, QuerySet
+from snugh.exceptions import NotOwner, NotFound, FieldError
 from core.semester.models import Semester
 from core.semester.utils import add_semester_credits, sub_semester_credits
 
 User = get_user_model()
 
+LECTURE_INFO_FIELDS = ['lecture_type', 'lecture_type1', 'lecture_type2', 'recognized_major1', 'recognized_major2']
+SEMESTER_CREDIT_FIELDS = ['major_requirement_credit', 'major_elective_credit', 'general_credit', 'general_elective_credit']
+
+# Priority of major types in recognizing lectures.
+MAJOR_PRIORITY = [
+    SINGLE_MAJOR,
+    MAJOR,
+    GRADUATE_MAJOR,
+    INTERDISCIPLINARY_MAJOR,
+    INTERDISCIPLINARY_MAJOR_FOR_TEACHER,
+    DOUBLE_MAJOR,
+    INTERDISCIPLINARY,
+    MINOR,
+    INTERDISCIPLINARY_PROGRAM,
+]
+
+
+def plan_majors(plan: Plan) -> QuerySet:
+    """Majors of plan in order of priority in recognizing lectures."""
+    return Major.objects.filter(planmajor__plan=plan)\
+        .annotate(custom_order=Case(*[When(major_type=major_type, then=Value(order))
+                                      for order, major_type in enumerate(MAJOR_PRIORITY)],
+                                    default=Value(len(MAJOR_PRIORITY)),
+                                    output_field=IntegerField(), ))\
+        .order_by('custom_order', 'id')
+
+
+def sort_majors(majors: Iterable[Major]) -> List[Major]:
+    """Majors in the same order with plan_majors."""
+    def custom_order(major):
+        if major.major_type in MAJOR_PRIORITY:
+            return MAJOR_PRIORITY.index(major.major_type), major.id
+        return len(MAJOR_PRIORITY), major.id
+    return sorted(majors, key=custom_order)
+
+
 def update_lecture_info(
     user: User, 
     plan_id: int, 
     semesterlectures: SemesterLecture = None, 
-    semester: Semester = None) -> Plan:
-    """Update lecture info."""
+    semester: Semester = None,
+    progress: Callable[[int, int], None] = None) -> Plan:
+    """Update lecture info. progress is called with semesters done and all semesters of plan."""
+    # Lock semester lectures of plan before prefetching them, as credit deltas are computed from them.
+    list(SemesterLecture.objects.select_for_update().filter(semester__plan_id=plan_id).values_list('id', flat=True))
     try:
         plan = Plan.objects.prefetch_related(
                 'user',
@@ -26,134 +75,409 @@ def update_lecture_info(
                 'semester', 
                 'planmajor',
                 'semester__semesterlecture',
-                'semester__semesterlecture__lecture',
-                'semester__semesterlecture__lecture__majorlecture',
-                'semester__semesterlecture__lecture__lecturecredit'
+                'semester__semesterlecture__lecture'
                 ).get(id=plan_id)
     except Plan.DoesNotExist:
         raise NotFound()
     owner = plan.user
     if user != owner:
         raise NotOwner()
-    planmajors = plan.planmajor.all()
-    majors = Major.objects.filter(planmajor__in=planmajors)\
-        .annotate(custom_order=Case(When(major_type=SINGLE_MAJOR, then=Value(0)),
-                                    When(major_type=MAJOR, then=Value(1)),
-                                    When(major_type=GRADUATE_MAJOR, then=Value(2)),
-                                    When(major_type=INTERDISCIPLINARY_MAJOR, then=Value(3)),
-                                    When(major_type=INTERDISCIPLINARY_MAJOR_FOR_TEACHER, then=Value(4)),
-                                    When(major_type=DOUBLE_MAJOR, then=Value(5)),
-                                    When(major_type=INTERDISCIPLINARY, then=Value(6)),
-                                    When(major_type=MINOR, then=Value(7)),
-                                    When(major_type=INTERDISCIPLINARY_PROGRAM, then=Value(8)),
-                                    default=Value(9),
-                                    output_field=IntegerField(), ))\
-        .order_by('custom_order')
+    majors = plan_majors(plan)
     none_major = Major.objects.get(id=DEFAULT_MAJOR_ID)
+    ledger = CreditLedger(plan.id)
     updated_semesters = []
     if semesterlectures and semester:
-        updated_semester = __update_lecture_info(user, majors, semesterlectures, semester, none_major)
+        engine = RecognitionEngine(majors, [semesterlecture.lecture_id for semesterlecture in semesterlectures])
+        updated_semester = __update_lecture_info(user, engine, semesterlectures, semester, none_major, ledger)
         updated_semesters.append(updated_semester)
     else:
         semesters = plan.semester.all()
-        for semester in semesters:
+        engine = RecognitionEngine(
+            majors, 
+            [semesterlecture.lecture_id for semester in semesters for semesterlecture in semester.semesterlecture.all()])
+        for i, semester in enumerate(semesters):
             semesterlectures = semester.semesterlecture.all()
-            updated_semester = __update_lecture_info(user, majors, semesterlectures, semester, none_major)
+            updated_semester = __update_lecture_info(user, engine, semesterlectures, semester, none_major, ledger)
             updated_semesters.append(updated_semester)
-    Semester.objects.bulk_update(
-        updated_semesters, 
-        ['major_requirement_credit', 
-        'major_elective_credit', 
-        'general_credit', 
-        'general_elective_credit'])
+            if progress:
+                progress(i + 1, len(semesters))
+    Semester.objects.bulk_update(updated_semesters, SEMESTER_CREDIT_FIELDS)
+    ledger.save()
+    bump_plan_version(plan.id)
+    return plan
+
+
+def update_recognition(
+    user: User,
+    plan_id: int,
+    removed_major_ids: Iterable[int],
+    added_major_ids: Iterable[int]) -> Plan:
+    """
+    Update lecture info of semester lectures whose recognition could change
+    by majors removed from and added to plan.
+    Recognition only depends on majors having MajorLecture of the lecture, in order of priority,
+    so semester lectures without MajorLecture of the changed majors keep their recognition.
+    """
+    try:
+        plan = Plan.objects.select_related('user', 'user__userprofile').get(id=plan_id)
+    except Plan.DoesNotExist:
+        raise NotFound()
+    if user != plan.user:
+        raise NotOwner()
+    removed_major_ids = set(removed_major_ids)
+    changed_major_ids = removed_major_ids | set(added_major_ids)
+    if not changed_major_ids:
+        return plan
+    # Lock semester lectures of plan before reading them, as credit deltas are computed from them.
+    list(SemesterLecture.objects.select_for_update().filter(semester__plan=plan).values_list('id', flat=True))
+    semesterlectures = list(SemesterLecture.objects.filter(semester__plan=plan, is_modified=False)\
+        .exclude(lecture_type=GENERAL)\
+        .filter(
+            Q(recognized_major1_id__in=removed_major_ids) |
+            Q(recognized_major2_id__in=removed_major_ids) |
+            Exists(MajorLecture.objects.filter(lecture=OuterRef('lecture'), major_id__in=changed_major_ids)
+                   .exclude(lecture_type__in=[GENERAL, GENERAL_ELECTIVE])))\
+        .select_related('semester'))
+    if not semesterlectures:
+        return plan
+    none_major = Major.objects.get(id=DEFAULT_MAJOR_ID)
+    engine = RecognitionEngine(plan_majors(plan), [semesterlecture.lecture_id for semesterlecture in semesterlectures])
+    std1 = user.userprofile.entrance_year
+    ledger = CreditLedger(plan.id)
+    semesters = {}
+    for semesterlecture in semesterlectures:
+        semester = semesters.setdefault(semesterlecture.semester_id, semesterlecture.semester)
+        __resolve_semesterlecture(engine, semesterlecture, semester, std1, none_major, ledger=ledger)
+    SemesterLecture.objects.bulk_update(semesterlectures, LECTURE_INFO_FIELDS)
+    Semester.objects.bulk_update(semesters.values(), SEMESTER_CREDIT_FIELDS)
+    ledger.save()
     return plan
 
 
+def search_year_standard(search_year: int) -> int:
+    """Lectures opened since this year are searched for search_year."""
+    return search_year if search_year < UPDATED_YEAR else UPDATED_YEAR-2
+
+
+def recalculate_plans(plan_ids: Iterable[int], dry_run: bool = False) -> Tuple[int, int]:
+    """
+    Update lecture info of every plan in plan_ids, as PUT /plan/:planId/calculate does,
+    with one RecognitionEngine for all of them. Only changed rows are written.
+    Returns the number of changed semester lectures and semesters.
+    """
+    # Lock semester lectures of plans before prefetching them, as credit deltas are computed from them.
+    list(SemesterLecture.objects.select_for_update().filter(semester__plan__in=plan_ids).values_list('id', flat=True))
+    plans = Plan.objects.filter(id__in=plan_ids)\
+        .select_related('user__userprofile')\
+        .prefetch_related('planmajor__major', 'semester__semesterlecture')
+    semesters = [semester for plan in plans for semester in plan.semester.all()]
+    engine = RecognitionEngine(
+        {planmajor.major for plan in plans for planmajor in plan.planmajor.all()},
+        [semesterlecture.lecture_id for semester in semesters for semesterlecture in semester.semesterlecture.all()])
+    none_major = Major.objects.get(id=DEFAULT_MAJOR_ID)
+
+    def lecture_info(semesterlecture):
+        return (semesterlecture.lecture_type, semesterlecture.lecture_type1, semesterlecture.lecture_type2,
+                semesterlecture.recognized_major1_id, semesterlecture.recognized_major2_id)
+
+    def semester_credits(semester):
+        return tuple(getattr(semester, field) for field in SEMESTER_CREDIT_FIELDS)
+
+    updated_semesterlectures = []
+    updated_semesters = []
+    updated_plan_ids = []
+    ledgers = []
+    for plan in plans:
+        updated = len(updated_semesterlectures) + len(updated_semesters)
+        majors = sort_majors(planmajor.major for planmajor in plan.planmajor.all())
+        std1 = plan.user.userprofile.entrance_year
+        ledger = CreditLedger(plan.id)
+        ledgers.append(ledger)
+        for semester in plan.semester.all():
+            credits = semester_credits(semester)
+            for semesterlecture in semester.semesterlecture.all():
+                if semesterlecture.is_modified:
+                    continue
+                info = lecture_info(semesterlecture)
+                semester = __resolve_semesterlecture(engine, semesterlecture, semester, std1, none_major, majors, ledger)
+                if lecture_info(semesterlecture) != info:
+                    updated_semesterlectures.append(semesterlecture)
+            if semester_credits(semester) != credits:
+                updated_semesters.append(semester)
+        if len(updated_semesterlectures) + len(updated_semesters) > updated:
+            updated_plan_ids.append(plan.id)
+    if not dry_run:
+        SemesterLecture.objects.bulk_update(updated_semesterlectures, LECTURE_INFO_FIELDS, batch_size=RECALCULATION_BATCH_SIZE)
+        Semester.objects.bulk_update(updated_semesters, SEMESTER_CREDIT_FIELDS, batch_size=RECALCULATION_BATCH_SIZE)
+        for ledger in ledgers:
+            ledger.save()
+        bump_plan_version(*updated_plan_ids)
+    return len(updated_semesterlectures), len(updated_semesters)
+
+
+def next_sequence(semester: Semester) -> int:
+    """recent_sequence of a semester lecture added at the end of semester."""
+    last_sequence = semester.semesterlecture.aggregate(last_sequence=Max('recent_sequence'))['last_sequence']
+    return 0 if last_sequence is None else last_sequence + SEQUENCE_GAP
+
+
+def rebalance_sequences(semesterlectures: Sequence[SemesterLecture]) -> List[SemesterLecture]:
+    """Spread recent_sequence of semester lectures SEQUENCE_GAP apart in order. Returns changed ones."""
+    changed = []
+    for i, semesterlecture in enumerate(semesterlectures):
+        if semesterlecture.recent_sequence != i * SEQUENCE_GAP:
+            semesterlecture.recent_sequence = i * SEQUENCE_GAP
+            changed.append(semesterlecture)
+    return changed
+
+
+def assign_sequences(
+    semesterlectures: Sequence[SemesterLecture], 
+    placed: Iterable[SemesterLecture]) -> List[SemesterLecture]:
+    """
+    Give placed semester lectures recent_sequence between their neighbours, in order of semesterlectures.
+    Others keep their recent_sequence, unless there is no room between neighbours and the semester is rebalanced.
+    Returns semester lectures whose recent_sequence changed.
+    """
+    placed = {id(semesterlecture) for semesterlecture in placed}
+    changed = []
+    before = -1
+    i = 0
+    while i < len(semesterlectures):
+        if id(semesterlectures[i]) not in placed:
+            if semesterlectures[i].recent_sequence <= before:
+                return rebalance_sequences(semesterlectures)
+            before = semesterlectures[i].recent_sequence
+            i += 1
+            continue
+        j = i
+        while j < len(semesterlectures) and id(semesterlectures[j]) in placed:
+            j += 1
+        after = semesterlectures[j].recent_sequence if j < len(semesterlectures) else before + (j-i+1) * SEQUENCE_GAP
+        step = (after - before) // (j-i+1)
+        if step < 1:
+            return rebalance_sequences(semesterlectures)
+        for k, semesterlecture in enumerate(semesterlectures[i:j], 1):
+            if semesterlecture.recent_sequence != before + k * step:
+                semesterlecture.recent_sequence = before + k * step
+                changed.append(semesterlecture)
+        before = semesterlectures[j-1].recent_sequence
+        i = j
+    return changed
+
+
+def create_semesterlectures(user: User, semester: Semester, lectures: Sequence[Lecture]) -> Semester:
+    """
+    Add lectures to semester with one bulk_create.
+    Lecture info of the new semester lectures is resolved before they are inserted,
+    and semester credits are saved in one statement.
+    """
+    plan = semester.plan
+    if user != plan.user:
+        raise NotOwner()
+    sequence = next_sequence(semester)
+    engine = RecognitionEngine(plan_majors(plan), [lecture.id for lecture in lectures])
+    none_major = Major.objects.get(id=DEFAULT_MAJOR_ID)
+    std1 = user.userprofile.entrance_year
+    ledger = CreditLedger(plan.id)
+    semesterlectures = []
+    for i, lecture in enumerate(lectures):
+        semesterlecture = SemesterLecture(
+            semester=semester,
+            lecture=lecture,
+            lecture_type=lecture.lecture_type,
+            credit=lecture.credit,
+            recent_sequence=sequence + i * SEQUENCE_GAP)
+        semester = resolve_new_semesterlecture(engine, semesterlecture, semester, std1, none_major)
+        ledger.add(semesterlecture)
+        semesterlectures.append(semesterlecture)
+    SemesterLecture.objects.bulk_create(semesterlectures)
+    semester.save(update_fields=SEMESTER_CREDIT_FIELDS)
+    ledger.save()
+    return semester
+
+
+def resolve_new_semesterlecture(
+    engine: RecognitionEngine,
+    semesterlecture: SemesterLecture,
+    semester: Semester,
+    std1: int,
+    none_major: Major) -> Semester:
+    """Resolve lecture info of an unsaved semester lecture added to semester, adding its credits to semester."""
+    semester = add_semester_credits(semesterlecture, semester)
+    return __resolve_semesterlecture(engine, semesterlecture, semester, std1, none_major)
+
+
+def preview_lecture_info(plan: Plan, lectures: Sequence[Lecture], year: int) -> Dict[int, SemesterLecture]:
+    """
+    Unsaved semester lectures by lecture id, resolved as if lectures were added to a semester of year in plan.
+    One RecognitionEngine resolves every lecture, so that the lookup does not grow with lectures.
+    """
+    engine = RecognitionEngine(plan_majors(plan), [lecture.id for lecture in lectures])
+    none_major = Major.objects.get(id=DEFAULT_MAJOR_ID)
+    semester = Semester(plan=plan, year=year)
+    std1 = plan.user.userprofile.entrance_year
+    semesterlectures = {}
+    for lecture in lectures:
+        semesterlecture = SemesterLecture(lecture=lecture, lecture_type=lecture.lecture_type, credit=lecture.credit)
+        semester = __resolve_semesterlecture(engine, semesterlecture, semester, std1, none_major)
+        semesterlectures[lecture.id] = semesterlecture
+    return semesterlectures
+
+
 def __update_lecture_info(
     user:User, 
-    majors: Major, 
+    engine: RecognitionEngine, 
     semesterlectures: SemesterLecture, 
     semester: Semester,
-    none_major: Major) -> Semester:
+    none_major: Major,
+    ledger: CreditLedger) -> Semester:
     """Private method using in updating lecture info."""
     updated_semesterlectures = []
     std1 = user.userprofile.entrance_year
-    std2 = semester.year
     for semesterlecture in semesterlectures:
-        tmp_majors = majors
-
         if not semesterlecture.is_modified:
-            semester = sub_semester_credits(semesterlecture, semester)
-            lecture = semesterlecture.lecture
-            if semesterlecture.lecture_type != GENERAL:
-                major_count = 0
-                majorlectures = lecture.majorlecture.all()
-                for major in tmp_majors:
-                    if major_count > 1:
-                        break
-                    candidate_majorlectures = majorlectures.filter(
-                        major=major,
-                        start_year__lte=std1,
-                        end_year__gte=std1)\
-                    .exclude(lecture_type__in=[GENERAL, GENERAL_ELECTIVE])\
-                    .order_by('-lecture_type')
-                    if candidate_majorlectures.exists():
-                        candidate_majorlecture = candidate_majorlectures[0]
-                        if major_count == 0:
-                            semesterlecture.lecture_type = candidate_majorlecture.lecture_type
-                            semesterlecture.lecture_type1 = candidate_majorlecture.lecture_type
-                            semesterlecture.recognized_major1 = major
-                        elif major_count == 1:
-                            semesterlecture.lecture_type2 = candidate_majorlecture.lecture_type
-                            semesterlecture.recognized_major2 = major
-                        major_count += 1
-
-                if major_count != 2:
-                    if major_count == 1:
-                        tmp_majors = tmp_majors.exclude(id=semesterlecture.recognized_major1.id)
-                    for major in tmp_majors:
-                        if major_count > 1:
-                            break
-
-                        candidate_majorlectures = lecture.majorlecture.filter(
-                            major=major,
-                            start_year__lte=std2,
-                            end_year__gte=std2)\
-                        .exclude(lecture_type__in=[GENERAL, GENERAL_ELECTIVE])\
-                        .order_by('-lecture_type')
-                        if candidate_majorlectures.exists() != 0:
-                            candidate_majorlecture = candidate_majorlectures[0]
-                            if major_count == 0:
-                                semesterlecture.lecture_type = candidate_majorlecture.lecture_type
-                                semesterlecture.lecture_type1 = candidate_majorlecture.lecture_type
-                                semesterlecture.recognized_major1 = major
-                            elif major_count == 1:
-                                semesterlecture.lecture_type2 = candidate_majorlecture.lecture_type
-                                semesterlecture.recognized_major2 = major
-                            major_count += 1
-
-                if major_count == 1:
-                    semesterlecture.lecture_type2 = NONE
-                    semesterlecture.recognized_major2 = none_major
-                elif major_count == 0:
-                    semesterlecture.lecture_type = GENERAL_ELECTIVE
-                    semesterlecture.lecture_type1 = GENERAL_ELECTIVE
-                    semesterlecture.recognized_major1 = none_major
-                    semesterlecture.lecture_type2 = NONE
-                    semesterlecture.recognized_major2 = none_major
-
-            lecturecredits = lecture.lecturecredit.filter(start_year__lte=std2,
-                                                            end_year__gte=std2)
-
-            if lecturecredits.exists():
-                semesterlecture.credit = lecturecredits[0].credit
-            semester = add_semester_credits(semesterlecture, semester)
+            semester = __resolve_semesterlecture(engine, semesterlecture, semester, std1, none_major, ledger=ledger)
             updated_semesterlectures.append(semesterlecture)
-    SemesterLecture.objects.bulk_update(
-        updated_semesterlectures, 
-        ['lecture_type',
-        'lecture_type1',
-        'lecture_type2',
-        'recognized_major1',
-        'recognized_major2'])
+    SemesterLecture.objects.bulk_update(updated_semesterlectures, LECTURE_INFO_FIELDS)
     return semester
+
+
+def __resolve_semesterlecture(
+    engine: RecognitionEngine,
+    semesterlecture: SemesterLecture,
+    semester: Semester,
+    std1: int,
+    none_major: Major,
+    majors: List[Major] = None,
+    ledger: CreditLedger = None) -> Semester:
+    """
+    Private method resolving recognition and credit of a semester lecture, and moving its credits in semester.
+    Changes of earned credits are kept in ledger if given.
+    """
+    std2 = semester.year
+    semester = sub_semester_credits(semesterlecture, semester)
+    if ledger:
+        ledger.remove(semesterlecture)
+    if semesterlecture.lecture_type != GENERAL:
+        recognized = engine.recognize(semesterlecture.lecture_id, std1, std2, majors)
+        if recognized:
+            major, lecture_type = recognized[0]
+            semesterlecture.lecture_type = lecture_type
+            semesterlecture.lecture_type1 = lecture_type
+            semesterlecture.recognized_major1 = major
+        if len(recognized) == 2:
+            major, lecture_type = recognized[1]
+            semesterlecture.lecture_type2 = lecture_type
+            semesterlecture.recognized_major2 = major
+        elif len(recognized) == 1:
+            semesterlecture.lecture_type2 = NONE
+            semesterlecture.recognized_major2 = none_major
+        else:
+            semesterlecture.lecture_type = GENERAL_ELECTIVE
+            semesterlecture.lecture_type1 = GENERAL_ELECTIVE
+            semesterlecture.recognized_major1 = none_major
+            semesterlecture.lecture_type2 = NONE
+            semesterlecture.recognized_major2 = none_major
+
+    # Recalculated credit only counts in semester credits and is not persisted, so the ledger keeps the saved one.
+    if ledger:
+        ledger.add(semesterlecture)
+    credit = engine.credit(semesterlecture.lecture_id, std2)
+    if credit is not None:
+        semesterlecture.credit = credit
+    return add_semester_credits(semesterlecture, semester)
+
+
+def encode_cursor(values: Sequence) -> str:
+    """Opaque cursor of lecture search pointing after the lecture having ordering values."""
+    return base64.urlsafe_b64encode(json.dumps(list(values), ensure_ascii=False).encode()).decode()
+
+
+def decode_cursor(cursor: str, ordering: Sequence[str]) -> list:
+    """Ordering values of cursor made by encode_cursor, each of the type in ORDERING_TYPES."""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, binascii.Error):
+        raise FieldError("Invalid field [cursor]")
+    if not (isinstance(values, list) and len(values) == len(ordering)):
+        raise FieldError("Invalid field [cursor]")
+    for field, value in zip(ordering, values):
+        if isinstance(value, bool) or not isinstance(value, ORDERING_TYPES[field]):
+            raise FieldError("Invalid field [cursor]")
+    return values
+
+
+def keyset_query(ordering: Sequence[str], values: Sequence) -> Q:
+    """Rows coming after values in ordering, ex) (a > 1) | (a = 1 & b > 2)."""
+    query = Q(**{f'{ordering[-1]}__gt': values[-1]})
+    for field, value in zip(reversed(ordering[:-1]), reversed(values[:-1])):
+        query = Q(**{f'{field}__gt': value}) | (Q(**{field: value}) & query)
+    return query
+
+
+def paginate_by_cursor(
+    lectures: Union[QuerySet, List[tuple]], 
+    ordering: Sequence[str], 
+    cursor: str, 
+    page_size: int = LECTURE_PAGE_SIZE) -> Tuple[list, Optional[str]]:
+    """
+    Page of lectures after cursor without COUNT or OFFSET, and cursor of the next page.
+    lectures is an ordered queryset, or sorted ordering keys from LectureCatalog.
+    """
+    values = decode_cursor(cursor, ordering) if cursor else None
+    if isinstance(lectures, QuerySet):
+        if values:
+            lectures = lectures.filter(keyset_query(ordering, values))
+        page = list(lectures[:page_size+1])
+        keys = [tuple(getattr(lecture, field) for field in ordering) for lecture in page]
+    else:
+        start = bisect_right(lectures, tuple(values)) if values else 0
+        page = keys = lectures[start:start+page_size+1]
+    if len(page) > page_size:
+        return page[:page_size], encode_cursor(keys[page_size-1])
+    return page, None
+
+
+def major_equivalents(major_name: str) -> Tuple[List[str], List[str]]:
+    """
+    Names of major and its equivalent majors, and of its equivalent departments.
+    Read on every lookup and put in cache keys, since equivalents are also written by loaddata or queryset updates.
+    """
+    majoreqv_names = MajorEquivalent.objects.filter(major_name=major_name).values_list('equivalent_major_name', flat=True)
+    depeqv_names = DepartmentEquivalent.objects.filter(major_name=major_name).values_list('department_name', flat=True)
+    return [major_name] + sorted(majoreqv_names), sorted(depeqv_names)
+
+
+def major_curriculum(major_name: str, lecture_type: str, year_standard: int, catalog=None) -> List[tuple]:
+    """
+    Sorted keys of CURRICULUM_ORDERING of lectures opened by major or its equivalents.
+    Shared by every plan through cache, so lectures of plan should be excluded by caller.
+    """
+    major_names, depeqv_names = major_equivalents(major_name)
+    key = curriculum_key(major_names, depeqv_names, lecture_type, year_standard)
+    lectures = cache.get(key)
+    if lectures is None:
+        if catalog:
+            lectures = catalog.curriculum(major_names, depeqv_names, lecture_type, year_standard)
+        else:
+            # Sorted in Python as catalog does, since cursor pages are found by bisecting keys.
+            lectures = sorted(Lecture.objects.filter(
+                (Q(open_major__in=major_names) | Q(open_department__in=depeqv_names)), 
+                lecture_type=lecture_type, recent_open_year__gte=year_standard)\
+                .values_list(*CURRICULUM_ORDERING))
+        cache.set(key, lectures, CURRICULUM_TIMEOUT)
+    return lectures
+
+
+def plan_lecture_ids(plan_id: int) -> List[int]:
+    """Ids of lectures in plan."""
+    return list(SemesterLecture.objects.filter(semester__plan_id=plan_id).values_list('lecture_id', flat=True))
+
+
+def get_lectures(lecture_ids: Sequence[int], catalog=None) -> List[Lecture]:
+    """Lectures of lecture ids in the same order, from catalog if given."""
+    if catalog:
+        return catalog.lectures(lecture_ids)
+    lectures = Lecture.objects.in_bulk(lecture_ids)
+    return [lectures[lecture_id] for lecture_id in lecture_ids if lecture_id in lectures]
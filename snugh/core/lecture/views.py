@@ -1,24 +1,32 @@
-from django.db.models import Case, When, Q, Value, IntegerField, F
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q, QuerySet
 from django.db import transaction
 from django.core.paginator import Paginator
-from django.db.models.functions import Length
 from rest_framework import status, viewsets
 from rest_framework.response import Response
 from rest_framework.decorators import action
 from core.lecture.models import Lecture, SemesterLecture
-from core.lecture.serializers import SemesterLectureSerializer, LectureSerializer
-from core.lecture.utils import update_lecture_info
+from core.lecture.catalog import LectureCatalog, get_catalog
+from core.lecture.search import bump_plan_search_version, search_session_key
+from core.lecture.serializers import (
+    SemesterLectureSerializer, LectureSerializer, LectureAutocompleteSerializer, LecturePreviewSerializer)
+from core.lecture.utils import (
+    assign_sequences, create_semesterlectures, paginate_by_cursor, major_curriculum, major_equivalents, get_lectures, plan_lecture_ids,
+    preview_lecture_info, search_year_standard)
 from core.lecture.const import *
 from core.semester.models import Semester
 from core.semester.serializers import SemesterSerializer
 from core.semester.utils import add_semester_credits, sub_semester_credits
 from core.plan.models import Plan
-from core.major.models import Major, MajorEquivalent, DepartmentEquivalent
+from core.major.models import Major
 from core.major.const import *
 from snugh.permissions import IsOwnerOrCreateReadOnly
-from snugh.exceptions import DuplicationError, FieldError, NotFound
+from snugh.exceptions import DuplicationError, FieldError, NotFound, NotOwner
 from core.history.utils import credit_history_generator, lecturetype_history_generator
-from typing import List
+from core.plan.version import bump_plan_version
+from core.requirement.ledger import CreditLedger
+from typing import List, Tuple, Union
 
 
 class LectureViewSet(viewsets.GenericViewSet):
@@ -30,9 +38,15 @@ class LectureViewSet(viewsets.GenericViewSet):
     permission_classes = [IsOwnerOrCreateReadOnly]
 
 
-    def get_select_related_object(self, pk: int, select_instances: List[str]) -> SemesterLecture:
-        """Get object using select related."""
+    def get_select_related_object(self, pk: int, select_instances: List[str], for_update: bool = False) -> SemesterLecture:
+        """
+        Get object using select related.
+        With for_update, semester lecture is locked until the transaction ends,
+        so that concurrent changes of it do not compute credit deltas from the same old row.
+        """
         try:
+            if for_update:
+                list(SemesterLecture.objects.select_for_update().filter(pk=pk).values_list('id', flat=True))
             semesterlecture = SemesterLecture.objects.select_related(*select_instances).get(pk=pk)
             self.check_object_permissions(self.request, semesterlecture)
             return semesterlecture
@@ -46,34 +60,20 @@ class LectureViewSet(viewsets.GenericViewSet):
         semester_id = request.data.get('semester_id')
         lecture_id_list = request.data.get('lecture_id')
         try:
-            semester = Semester.objects.select_related('plan').prefetch_related('semesterlecture').get(id=semester_id)
+            semester = Semester.objects.select_related('plan').get(id=semester_id)
         except Semester.DoesNotExist:
             raise NotFound('semester does not exist')
         plan = semester.plan
         lecture_id_list = list(set(map(lambda x: int(x), lecture_id_list)))
         if set(lecture_id_list) & set(plan.semester.values_list('semesterlecture__lecture', flat=True)):
             raise DuplicationError('some lecture already exists in plan.')
-
-        lecture_in_semester = semester.semesterlecture.all()
-        n_lectures = lecture_in_semester.count()
-
-        semesterlectures=[]
-        for i, lecture_id in enumerate(lecture_id_list):
-            try :
-                lecture = Lecture.objects.get(id=lecture_id)
-            except Lecture.DoesNotExist:
-                raise NotFound()
-            lecture_type = lecture.lecture_type
-            sl = SemesterLecture.objects.create(
-                semester=semester,
-                lecture=lecture,
-                lecture_type=lecture_type,
-                credit=lecture.credit,
-                recent_sequence=n_lectures+i)
-            semesterlectures.append(sl)
-            semester = add_semester_credits(sl, semester)
-    
-        update_lecture_info(request.user, plan.id, semesterlectures, semester)
+        lectures = Lecture.objects.in_bulk(lecture_id_list)
+        if len(lectures) != len(lecture_id_list):
+            raise NotFound()
+        semester = create_semesterlectures(
+            request.user, semester, [lectures[lecture_id] for lecture_id in lecture_id_list])
+        bump_plan_search_version(plan.id)
+        bump_plan_version(plan.id)
         data = SemesterSerializer(semester).data
         return Response(data, status=status.HTTP_201_CREATED)
     
@@ -81,28 +81,28 @@ class LectureViewSet(viewsets.GenericViewSet):
     @action(methods=['PUT'], detail=True)
     @transaction.atomic
     def position(self, request, pk=None):
-        """Position semester lecture."""
-        target_lecture = self.get_select_related_object(pk, ["semester"])
+        """
+        Position semester lecture.
+        Semester lecture takes a recent_sequence between its new neighbours, 
+        so the other semester lectures are written only when semester_to is out of room and rebalanced.
+        """
+        target_lecture = self.get_select_related_object(pk, ["semester"], for_update=True)
         semester_to = request.data.get('semester_to', None)
         semester_from = target_lecture.semester
         position = request.data.get('position', 0)
         if not semester_to:
             raise FieldError("Field missing [semester_to]")
-        position_prev = target_lecture.recent_sequence
-        semester_from_lectures = semester_from.semesterlecture.filter(recent_sequence__gt=position_prev).order_by('recent_sequence')
         try:
-            semester_to = Semester.objects.prefetch_related('semesterlecture').get(id=semester_to)
+            semester_to = Semester.objects.get(id=semester_to)
         except Semester.DoesNotExist:
             raise NotFound()
-        semester_to_lectures = semester_to.semesterlecture.all()
-        max_num = len(semester_to_lectures)
-        semester_to_lectures = semester_to_lectures.filter(recent_sequence__gte=position).order_by('recent_sequence')
-
-        if not (0<=position<=max_num):
+        semester_to_lectures = list(semester_to.semesterlecture.exclude(id=target_lecture.id).order_by('recent_sequence', 'id'))
+        if not (0<=position<=len(semester_to_lectures)):
             raise FieldError("Invalid field [position]")
+        if semester_from.id == semester_to.id:
+            semester_to = semester_from
         semester_from = sub_semester_credits(target_lecture, semester_from)
         target_lecture.semester = semester_to
-        target_lecture.recent_sequence = position
         semester_to = add_semester_credits(target_lecture, semester_to)
         Semester.objects.bulk_update(
             [semester_from, semester_to], 
@@ -111,15 +111,18 @@ class LectureViewSet(viewsets.GenericViewSet):
                 'major_elective_credit', 
                 'general_credit', 
                 'general_elective_credit'])
-        sl_list = []
-        for sl in semester_from_lectures:
-            sl.recent_sequence-=1
-            sl_list.append(sl)
-        for sl in semester_to_lectures:
-            sl.recent_sequence+=1
-            sl_list.append(sl)
-        semesterlectures = sl_list + [target_lecture]
+        semester_to_lectures.insert(position, target_lecture)
+        semesterlectures = assign_sequences(semester_to_lectures, [target_lecture])
+        semesterlectures = [target_lecture] + [sl for sl in semesterlectures if sl.id != target_lecture.id]
         SemesterLecture.objects.bulk_update(semesterlectures, fields=['recent_sequence', 'semester'])
+        if semester_from.plan_id != semester_to.plan_id:
+            ledger_from, ledger_to = CreditLedger(semester_from.plan_id), CreditLedger(semester_to.plan_id)
+            ledger_from.remove(target_lecture)
+            ledger_to.add(target_lecture)
+            ledger_from.save()
+            ledger_to.save()
+            bump_plan_search_version(semester_from.plan_id, semester_to.plan_id)
+        bump_plan_version(semester_from.plan_id, semester_to.plan_id)
         
         serializer = SemesterSerializer([semester_from, semester_to], many=True)
         data = serializer.data
@@ -139,18 +142,24 @@ class LectureViewSet(viewsets.GenericViewSet):
             ['semester',
             'recognized_major1',
             'recognized_major2',
-            'lecture'])
+            'lecture'],
+            for_update=True)
         semester = semesterlecture.semester
         if credit == semesterlecture.credit:
             return Response(SemesterLectureSerializer(semesterlecture).data, status=status.HTTP_200_OK)
 
         credit_history_generator(request.user, semesterlecture, credit)
+        ledger = CreditLedger(semester.plan_id)
+        ledger.remove(semesterlecture)
         semester = sub_semester_credits(semesterlecture, semester)
         semesterlecture.credit = credit
         semesterlecture.is_modified = True
         semesterlecture.save()
         semester = add_semester_credits(semesterlecture, semester)
         semester.save()
+        ledger.add(semesterlecture)
+        ledger.save()
+        bump_plan_version(semester.plan_id)
 
         data = SemesterLectureSerializer(semesterlecture).data
         return Response(data, status=status.HTTP_200_OK)
@@ -165,11 +174,14 @@ class LectureViewSet(viewsets.GenericViewSet):
             ['semester', 
             'lecture',
             'recognized_major1',
-            'recognized_major2'])
+            'recognized_major2'],
+            for_update=True)
         lecture_type = request.data.get('lecture_type', None)
         user = request.user
         semester = semesterlecture.semester
         semester = sub_semester_credits(semesterlecture, semester)
+        ledger = CreditLedger(semester.plan_id)
+        ledger.remove(semesterlecture)
 
         if lecture_type in [GENERAL, GENERAL_ELECTIVE]:
             lecturetype_history_generator(user, semesterlecture, lecture_type)
@@ -217,6 +229,9 @@ class LectureViewSet(viewsets.GenericViewSet):
 
         semester = add_semester_credits(semesterlecture, semester)
         semester.save()
+        ledger.add(semesterlecture)
+        ledger.save()
+        bump_plan_version(semester.plan_id)
 
         return Response(serializer.data, status=status.HTTP_200_OK)
 
@@ -224,69 +239,158 @@ class LectureViewSet(viewsets.GenericViewSet):
     @transaction.atomic
     def destroy(self, request, pk=None):
         """Destroy semester lecture."""
-        semesterlecture = self.get_select_related_object(pk, ['semester'])
+        semesterlecture = self.get_select_related_object(pk, ['semester'], for_update=True)
         semester = sub_semester_credits(semesterlecture, semesterlecture.semester)
         semester.save()
+        ledger = CreditLedger(semester.plan_id)
+        ledger.remove(semesterlecture)
         semesterlecture.delete()
+        ledger.save()
+        bump_plan_search_version(semester.plan_id)
+        bump_plan_version(semester.plan_id)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+    def search_lectures(
+        self,
+        search_type: str,
+        search_keyword: str,
+        major_name: str,
+        year_standard: int,
+        plan: Plan,
+        catalog: LectureCatalog = None,
+        fuzzy: bool = False) -> Tuple[Union[QuerySet, List[tuple]], Tuple[str, ...]]:
+        """
+        Ordered lectures of search and their ordering.
+        Catalog, major curriculum and fuzzy searches return sorted keys of the ordering.
+        """
+        # Case 1: major requirement or major elective
+        if search_type in [MAJOR_REQUIREMENT, MAJOR_ELECTIVE]:
+            if not major_name:
+                raise FieldError('query parameter missing [major_name]')
+            existing_lectures = set(plan_lecture_ids(plan.id))
+            lectures = major_curriculum(major_name, search_type, year_standard, catalog)
+            lectures = [key for key in lectures if key[-1] not in existing_lectures]
+            return lectures, CURRICULUM_ORDERING
+
+        # Case 2: keyword
+        if catalog:
+            lectures = catalog.search(search_keyword, year_standard, plan_lecture_ids(plan.id))
+        else:
+            lectures = Lecture.objects.search(search_keyword)\
+                .filter(recent_open_year__gte = year_standard)\
+                .exclude_plan(plan.id)\
+                .rank(search_keyword)
+        if fuzzy:
+            # Typo-tolerant matches, appended after exact matches.
+            if catalog:
+                fuzzy_lectures = catalog.fuzzy(search_keyword, year_standard, plan_lecture_ids(plan.id))
+            else:
+                lectures = list(lectures.values_list(*SEARCH_ORDERING))
+                fuzzy_lectures = Lecture.objects.filter(recent_open_year__gte = year_standard)\
+                    .exclude_plan(plan.id)\
+                    .fuzzy(search_keyword)
+            matched = {key[-1] for key in lectures}
+            lectures = sorted(lectures + [key for key in fuzzy_lectures if key[-1] not in matched])
+        return lectures, SEARCH_ORDERING
+
     # GET /lecture/?search_type=(string)&search_keyword=(string)&major=(string)&credit=(string)
-    # TODO: n-gram 서치 고도화
+    # GET /lecture/?search_type=(string)&search_keyword=(string)&major=(string)&cursor=(string)
+    # GET /lecture/?search_type=(string)&search_keyword=(string)&major=(string)&fuzzy=(bool)
+    # GET /lecture/?search_type=(string)&search_keyword=(string)&major=(string)&preview=(bool)
     def list(self, request):
-        """List semester lecture."""
+        """
+        List semester lecture.
+        Paginated by page number, or by cursor when 'cursor' is given (empty for the first page).
+        Page number mode caches ordered lecture ids of the search, so following pages skip searching.
+        Cursor mode returns {"results": [...], "next": (string)} and skips counting lectures.
+        Keyword search with fuzzy=true also returns lectures whose name has a typo of keyword.
+        With preview=true, each lecture has the lecture info it would get when added to a semester of search_year.
+        """
         page = request.GET.get('page', '1')
+        cursor = request.query_params.get('cursor')
         search_type = request.query_params.get("search_type")
         search_year = request.query_params.get("search_year")
         search_keyword = request.query_params.get("search_keyword")
+        major_name = request.query_params.get("major_name")
         plan_id = request.query_params.get("plan_id")
+        fuzzy = request.query_params.get("fuzzy") == "true"
+        preview = request.query_params.get("preview") == "true"
         if not (search_type and search_year and plan_id):
             raise FieldError('query parameter missing [search_type, search_year, plan_id]')
+        search_year = int(search_year)
+        year_standard = search_year_standard(search_year)
+        catalog = get_catalog() if settings.LECTURE_CATALOG_ENABLED else None
+
+        if cursor is None:
+            equivalents = major_equivalents(major_name) if search_type in [MAJOR_REQUIREMENT, MAJOR_ELECTIVE] else None
+            session_key = search_session_key(
+                plan_id, search_type, search_keyword, major_name, equivalents, year_standard, fuzzy)
+            lecture_ids = cache.get(session_key)
+        else:
+            lecture_ids = None
+        if lecture_ids is None:
+            try:
+                plan = Plan.objects.get(id=plan_id)
+            except Plan.DoesNotExist:
+                raise NotFound()
+            if search_type not in [MAJOR_REQUIREMENT, MAJOR_ELECTIVE] and not search_keyword:
+                data = [] if cursor is None else {"results": [], "next": None}
+                return Response(data, status=status.HTTP_200_OK)
+            lectures, ordering = self.search_lectures(
+                search_type, search_keyword, major_name, year_standard, plan, catalog, fuzzy)
+
+        if cursor is None:
+            if lecture_ids is None:
+                if isinstance(lectures, QuerySet):
+                    lecture_ids = list(lectures.values_list('id', flat=True))
+                else:
+                    lecture_ids = [key[-1] for key in lectures]
+                cache.set(session_key, lecture_ids, SEARCH_SESSION_TIMEOUT)
+            lecture_ids = list(Paginator(lecture_ids, LECTURE_PAGE_SIZE).get_page(page))
+            lectures = get_lectures(lecture_ids, catalog)
+            data = self.serialize_lectures(lectures, plan_id, search_year, preview)
+            return Response(data, status=status.HTTP_200_OK)
+
+        page, next_cursor = paginate_by_cursor(lectures, ordering, cursor)
+        if isinstance(lectures, QuerySet):
+            lectures = page
+        else:
+            lectures = get_lectures([key[-1] for key in page], catalog)
+        data = self.serialize_lectures(lectures, plan_id, search_year, preview)
+        return Response({"results": data, "next": next_cursor}, status=status.HTTP_200_OK)
+
+    def serialize_lectures(self, lectures: List[Lecture], plan_id: int, search_year: int, preview: bool) -> list:
+        """Serialized page of lectures, with lecture info previewed in one batch for user's plan if preview."""
+        if not preview:
+            return LectureSerializer(lectures, many=True).data
         try:
-            existing_lectures = Plan.objects.get(id=plan_id).semester.values_list('semesterlecture__lecture__id', flat=True)
-            existing_lectures = list(filter(lambda x: x!=None, existing_lectures))
+            plan = Plan.objects.select_related('user__userprofile').get(id=plan_id)
         except Plan.DoesNotExist:
             raise NotFound()
-        search_year = int(search_year)
+        if plan.user != self.request.user:
+            raise NotOwner()
+        previews = preview_lecture_info(plan, lectures, search_year)
+        return LecturePreviewSerializer(lectures, many=True, context={'previews': previews}).data
 
-        # Case 1: major requirement or major elective
-        if search_type in [MAJOR_REQUIREMENT, MAJOR_ELECTIVE]:
-            major_name = request.query_params.get("major_name")
-            if major_name:
-                year_standard = search_year if search_year < UPDATED_YEAR else UPDATED_YEAR-2
-                depeqv_name = DepartmentEquivalent.objects.filter(major_name=major_name).values_list('department_name', flat=True)
-                majoreqv_names = MajorEquivalent.objects.filter(major_name=major_name).values_list('equivalent_major_name', flat=True)
-                major_names = [major_name] + list(majoreqv_names)
-                lectures = Lecture.objects.filter(
-                    (Q(open_major__in=major_names) | Q(open_department__in=depeqv_name)), 
-                    lecture_type=search_type, recent_open_year__gte=year_standard)\
-                    .exclude(id__in=existing_lectures).order_by('lecture_name', 'recent_open_year')
-            else: 
-                raise FieldError('query parameter missing [major_name]')
-
-        # Case 2: keyword
+    # GET /lecture/autocomplete/?prefix=(string)&search_year=(int)
+    @action(methods=['GET'], detail=False)
+    def autocomplete(self, request):
+        """
+        Autocomplete lecture names and codes starting with prefix.
+        Only lectures opened recently for search_year are completed, as in listing lectures. Defaults to UPDATED_YEAR.
+        Completed from the database when the lecture catalog is disabled.
+        """
+        prefix = request.query_params.get('prefix')
+        search_year = request.query_params.get('search_year', str(UPDATED_YEAR))
+        if not prefix:
+            raise FieldError('query parameter missing [prefix]')
+        if not search_year.isdigit():
+            raise FieldError('Invalid field [search_year]')
+        year_standard = search_year_standard(int(search_year))
+        if settings.LECTURE_CATALOG_ENABLED:
+            catalog = get_catalog()
+            lectures = catalog.lectures(catalog.autocomplete(prefix, year_standard))
         else:
-            if search_keyword:
-                year_standard = search_year if search_year < UPDATED_YEAR else UPDATED_YEAR-2
-                lectures = Lecture.objects.search(search_keyword)\
-                    .filter(recent_open_year__gte = year_standard)\
-                    .exclude(id__in=existing_lectures)\
-                    .annotate(
-                        first_letter=Case(
-                            When(lecture_name__startswith=search_keyword[0], 
-                                then=Value(0)),
-                            default=Value(1),
-                            output_field=IntegerField(),),
-                        icontains_priority=Case(
-                            When(lecture_name__icontains=search_keyword, 
-                                then=Value(0)),
-                            default=Value(1),
-                            output_field=IntegerField(),),
-                        priority = F('first_letter')+F('icontains_priority'),
-                        match_rate=Length('lecture_name'))\
-                    .order_by('priority', 'match_rate', 'recent_open_year', 'lecture_name')
-            else:
-                return Response([], status=status.HTTP_200_OK)
-        
-        lectures = Paginator(lectures, 20).get_page(page)
-        serializer = LectureSerializer(lectures, many=True)
+            lectures = Lecture.objects.autocomplete(prefix, year_standard)
+        serializer = LectureAutocompleteSerializer(lectures, many=True)
         return Response(serializer.data, status=status.HTTP_200_OK)
@@ -0,0 +1,41 @@
+# Generated by Django 3.2.4 on 2026-10-18 15:22
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def lecture_ngrams(text):
+    # Frozen copy of core.lecture.search.lecture_ngrams as of this migration.
+    return set(text.lower()) if text else set()
+
+
+def index_lecture_ngrams(apps, schema_editor):
+    Lecture = apps.get_model('core', 'Lecture')
+    LectureNgram = apps.get_model('core', 'LectureNgram')
+    lecturengrams = []
+    for lecture_id, lecture_name in Lecture.objects.values_list('id', 'lecture_name').iterator():
+        for gram in lecture_ngrams(lecture_name):
+            lecturengrams.append(LectureNgram(gram=gram, lecture_id=lecture_id))
+    LectureNgram.objects.bulk_create(lecturengrams, batch_size=5000, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_planmajor_planmajor_integrity_error'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LectureNgram',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('gram', models.CharField(max_length=1)),
+                ('lecture', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lecturengram', to='core.lecture')),
+            ],
+            options={
+                'unique_together': {('gram', 'lecture')},
+            },
+        ),
+        migrations.RunPython(index_lecture_ngrams, migrations.RunPython.noop),
+    ]
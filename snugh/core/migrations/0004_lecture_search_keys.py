@@ -0,0 +1,73 @@
+# Generated by Django 3.2.4 on 2026-10-18 15:25
+
+from django.db import migrations, models
+
+# Frozen copies of core.lecture.search helpers as of this migration.
+HANGUL_BASE = 0xAC00
+HANGUL_END = 0xD7A3
+CHOSEONG = 'ㄱㄲㄴㄷㄸㄹㅁㅂㅃㅅㅆㅇㅈㅉㅊㅋㅌㅍㅎ'
+JUNGSEONG = ['ㅏ', 'ㅐ', 'ㅑ', 'ㅒ', 'ㅓ', 'ㅔ', 'ㅕ', 'ㅖ', 'ㅗ', 'ㅗㅏ', 'ㅗㅐ', 'ㅗㅣ', 'ㅛ', 'ㅜ', 'ㅜㅓ', 'ㅜㅔ',
+             'ㅜㅣ', 'ㅠ', 'ㅡ', 'ㅡㅣ', 'ㅣ']
+JONGSEONG = ['', 'ㄱ', 'ㄲ', 'ㄱㅅ', 'ㄴ', 'ㄴㅈ', 'ㄴㅎ', 'ㄷ', 'ㄹ', 'ㄹㄱ', 'ㄹㅁ', 'ㄹㅂ', 'ㄹㅅ', 'ㄹㅌ', 'ㄹㅍ',
+             'ㄹㅎ', 'ㅁ', 'ㅂ', 'ㅂㅅ', 'ㅅ', 'ㅆ', 'ㅇ', 'ㅈ', 'ㅊ', 'ㅋ', 'ㅌ', 'ㅍ', 'ㅎ']
+COMPOUND_JAMO = {
+    'ㅘ': 'ㅗㅏ', 'ㅙ': 'ㅗㅐ', 'ㅚ': 'ㅗㅣ', 'ㅝ': 'ㅜㅓ', 'ㅞ': 'ㅜㅔ', 'ㅟ': 'ㅜㅣ', 'ㅢ': 'ㅡㅣ',
+    'ㄳ': 'ㄱㅅ', 'ㄵ': 'ㄴㅈ', 'ㄶ': 'ㄴㅎ', 'ㄺ': 'ㄹㄱ', 'ㄻ': 'ㄹㅁ', 'ㄼ': 'ㄹㅂ', 'ㄽ': 'ㄹㅅ',
+    'ㄾ': 'ㄹㅌ', 'ㄿ': 'ㄹㅍ', 'ㅀ': 'ㄹㅎ', 'ㅄ': 'ㅂㅅ',
+}
+
+
+def is_hangul_syllable(c):
+    return HANGUL_BASE <= ord(c) <= HANGUL_END
+
+
+def choseong(text):
+    return ''.join(CHOSEONG[(ord(c) - HANGUL_BASE) // 588] if is_hangul_syllable(c) else c for c in text.lower())
+
+
+def jamo(text):
+    result = []
+    for c in text.lower():
+        if is_hangul_syllable(c):
+            code = ord(c) - HANGUL_BASE
+            result.append(CHOSEONG[code // 588])
+            result.append(JUNGSEONG[code % 588 // 28])
+            result.append(JONGSEONG[code % 28])
+        else:
+            result.append(COMPOUND_JAMO.get(c, c))
+    return ''.join(result)
+
+
+def update_search_keys(apps, schema_editor):
+    Lecture = apps.get_model('core', 'Lecture')
+    LectureNgram = apps.get_model('core', 'LectureNgram')
+    lectures = list(Lecture.objects.only('id', 'lecture_name'))
+    lecturengrams = []
+    for lecture in lectures:
+        lecture.lecture_name_choseong = choseong(lecture.lecture_name)
+        lecture.lecture_name_jamo = jamo(lecture.lecture_name)
+        for gram in set(lecture.lecture_name_jamo):
+            lecturengrams.append(LectureNgram(gram=gram, lecture_id=lecture.id))
+    Lecture.objects.bulk_update(lectures, ['lecture_name_choseong', 'lecture_name_jamo'], batch_size=1000)
+    LectureNgram.objects.bulk_create(lecturengrams, batch_size=5000, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_lecturengram'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lecture',
+            name='lecture_name_choseong',
+            field=models.CharField(default='', max_length=50),
+        ),
+        migrations.AddField(
+            model_name='lecture',
+            name='lecture_name_jamo',
+            field=models.CharField(default='', max_length=250),
+        ),
+        migrations.RunPython(update_search_keys, migrations.RunPython.noop),
+    ]
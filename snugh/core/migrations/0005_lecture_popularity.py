@@ -0,0 +1,28 @@
+# Generated by Django 3.2.4 on 2026-10-18 15:35
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def rollup_popularity(apps, schema_editor):
+    Lecture = apps.get_model('core', 'Lecture')
+    SemesterLecture = apps.get_model('core', 'SemesterLecture')
+    counts = SemesterLecture.objects.values('lecture').annotate(count=Count('id')).values_list('lecture', 'count')
+    lectures = [Lecture(id=lecture_id, popularity=count) for lecture_id, count in counts]
+    Lecture.objects.bulk_update(lectures, ['popularity'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_lecture_search_keys'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lecture',
+            name='popularity',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(rollup_popularity, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 3.2.4 on 2026-10-18 15:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_lecture_popularity'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='lecturecredit',
+            index=models.Index(fields=['lecture', 'start_year', 'end_year'], name='core_lectur_lecture_34adcc_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='majorlecture',
+            index=models.Index(fields=['lecture', 'major', 'start_year', 'end_year'], name='core_majorl_lecture_39e02a_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='majorlecture',
+            index=models.Index(fields=['major', 'lecture_type', 'start_year', 'end_year'], name='core_majorl_major_i_c8fff7_idx'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 3.2.4 on 2026-10-18 15:45
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_curriculum_year_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecognitionBuild',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('is_completed', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('completed_at', models.DateTimeField(null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='LectureRecognition',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start_year', models.PositiveSmallIntegerField()),
+                ('end_year', models.PositiveSmallIntegerField()),
+                ('lecture_type', models.CharField(choices=[('none', 'none'), ('major_requirement', 'major_requirement'), ('major_elective', 'major_elective'), ('general', 'general'), ('general_elective', 'general_elective'), ('teaching', 'teaching')], default='none', max_length=50)),
+                ('build', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lecturerecognition', to='core.recognitionbuild')),
+                ('lecture', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lecturerecognition', to='core.lecture')),
+                ('major', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lecturerecognition', to='core.major')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='lecturerecognition',
+            index=models.Index(fields=['build', 'lecture', 'major'], name='core_lectur_build_i_19e933_idx'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 3.2.4 on 2026-10-18 16:03
+
+from django.db import migrations, models
+from django.db.models import F
+
+SEQUENCE_GAP = 1024
+
+
+def spread_sequences(apps, schema_editor):
+    SemesterLecture = apps.get_model('core', 'SemesterLecture')
+    SemesterLecture.objects.update(recent_sequence=F('recent_sequence') * SEQUENCE_GAP)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_job'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='semesterlecture',
+            name='recent_sequence',
+            field=models.PositiveIntegerField(),
+        ),
+        migrations.RunPython(spread_sequences, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 3.2.4 on 2026-10-18 16:07
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_semesterlecture_sparse_sequence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EarnedCredit',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('requirement_type', models.CharField(choices=[('none', 'none'), ('major_requirement', 'major_requirement'), ('major_all', 'major_all'), ('general', 'general'), ('general_elective', 'general_elective'), ('teaching', 'teaching'), ('all', 'all')], max_length=50)),
+                ('earned_credit', models.IntegerField(default=0)),
+                ('major', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='earnedcredit', to='core.major')),
+                ('plan', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='earnedcredit', to='core.plan')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='earnedcredit',
+            constraint=models.UniqueConstraint(fields=('plan', 'major', 'requirement_type'), name='earnedcredit_integrity_error'),
+        ),
+    ]
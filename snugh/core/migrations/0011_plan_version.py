@@ -0,0 +1,18 @@
+# Generated by Django 3.2.4 on 2026-10-18 16:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_earned_credit_ledger'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='plan',
+            name='version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
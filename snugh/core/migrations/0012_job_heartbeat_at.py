@@ -0,0 +1,25 @@
+# Generated by Django 3.2.4 on 2026-10-18 16:30
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def set_heartbeat_at(apps, schema_editor):
+    Job = apps.get_model('core', 'Job')
+    Job.objects.filter(status='running').update(heartbeat_at=F('started_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_plan_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='job',
+            name='heartbeat_at',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.RunPython(set_heartbeat_at, migrations.RunPython.noop),
+    ]
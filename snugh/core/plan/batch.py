@@ -0,0 +1,284 @@
+"""Batch edit of semester lectures of a plan, applied in memory and written at once."""
+
+from functools import reduce
+from operator import or_
+from typing import List
+from django.db.models import Prefetch, Q
+from core.history.models import CreditChangeHistory, LectureTypeChangeHistory
+from core.history.utils import (
+    CREDIT_HISTORY_FIELDS, LECTURETYPE_HISTORY_FIELDS, count_histories, credit_history_keys, lecturetype_history_keys)
+from core.lecture.const import *
+from core.lecture.models import Lecture, SemesterLecture
+from core.lecture.recognition import RecognitionEngine
+from core.lecture.search import bump_plan_search_version
+from core.lecture.utils import (
+    LECTURE_INFO_FIELDS, SEMESTER_CREDIT_FIELDS, assign_sequences, plan_majors, resolve_new_semesterlecture)
+from core.major.const import *
+from core.major.models import Major
+from core.plan.const import *
+from core.plan.models import Plan
+from core.plan.version import bump_plan_version
+from core.requirement.ledger import CreditLedger
+from core.semester.models import Semester
+from core.semester.utils import add_semester_credits, sub_semester_credits
+from snugh.exceptions import DuplicationError, FieldError, NotFound, NotOwner
+from user.models import User
+
+SEMESTERLECTURE_FIELDS = LECTURE_INFO_FIELDS + ['credit', 'is_modified', 'semester', 'recent_sequence']
+
+
+class PlanBatch:
+    """
+    Ordered add / move / delete / credit / recognized_major operations on semester lectures of a plan.
+    Semesters and semester lectures of plan, lectures to add and majors to recognize are read once,
+    operations are applied in memory in order, then changed rows, and change histories of credit and
+    recognized_major operations, are written with one statement per table.
+    Credits of semesters are moved in memory as each operation goes,
+    and added or moved semester lectures take recent_sequence between their neighbours at the end.
+
+        # Fields
+        user (User): Owner of plan.
+        plan (Plan): Plan operations are applied to.
+        semesters (dict): Semesters of plan by id.
+        sequences (dict): Semester lectures of each semester in order, by semester id.
+        semesterlectures (dict): Existing semester lectures of plan by id.
+        lecture_ids (set): Ids of lectures in plan.
+        changed (dict): Semesters changed by operations, by id.
+        updated (dict): Existing semester lectures changed by operations, by id.
+        created (list): New semester lectures.
+        placed (list): Semester lectures added or moved, needing recent_sequence.
+        deleted (list): Ids of deleted semester lectures.
+        ledger (CreditLedger): Changes of earned credits of plan.
+        credit_histories (list): Keys of credit change histories of operations.
+        lecturetype_histories (list): Keys of lecture type change histories of operations.
+    """
+
+    def __init__(self, user: User, plan: Plan):
+        if user != plan.user:
+            raise NotOwner()
+        self.user = user
+        self.plan = plan
+        # Lock semester lectures of plan before reading them, as credit deltas are computed from them.
+        list(SemesterLecture.objects.select_for_update().filter(semester__plan=plan).values_list('id', flat=True))
+        semesterlectures = SemesterLecture.objects\
+            .select_related('lecture', 'recognized_major1', 'recognized_major2')\
+            .order_by('recent_sequence', 'id')
+        semesters = plan.semester.prefetch_related(Prefetch('semesterlecture', queryset=semesterlectures))
+        self.semesters = {}
+        self.sequences = {}
+        self.semesterlectures = {}
+        for semester in semesters:
+            self.semesters[semester.id] = semester
+            self.sequences[semester.id] = list(semester.semesterlecture.all())
+            for semesterlecture in self.sequences[semester.id]:
+                semesterlecture.semester = semester
+                self.semesterlectures[semesterlecture.id] = semesterlecture
+        self.lecture_ids = {semesterlecture.lecture_id for semesterlecture in self.semesterlectures.values()}
+        self.changed = {}
+        self.updated = {}
+        self.created = []
+        self.placed = []
+        self.deleted = []
+        self.ledger = CreditLedger(plan.id)
+        self.credit_histories = []
+        self.lecturetype_histories = []
+
+    def apply(self, operations: List[dict]) -> List[Semester]:
+        """Apply operations in order and write them. Returns changed semesters."""
+        if not isinstance(operations, list) or not operations:
+            raise FieldError("Field missing [operations]")
+        if not all(isinstance(operation, dict) for operation in operations):
+            raise FieldError("Invalid field [operations]")
+        handlers = {
+            ADD: self.add,
+            MOVE: self.move,
+            DELETE: self.delete,
+            CREDIT: self.credit,
+            RECOGNIZED_MAJOR: self.recognized_major,
+        }
+        if any(operation.get('op') not in handlers for operation in operations):
+            raise FieldError("Invalid field [op]")
+        self.load(operations)
+        for operation in operations:
+            handlers[operation['op']](operation)
+        return self.save()
+
+    def load(self, operations: List[dict]):
+        """Read lectures to add and majors to recognize of every operation at once."""
+        lecture_ids = [
+            lecture_id for operation in operations if operation['op'] == ADD
+            for lecture_id in self.get_ids(operation, 'lecture_id')]
+        self.lectures = Lecture.objects.in_bulk(lecture_ids)
+        if len(self.lectures) != len(set(lecture_ids)):
+            raise NotFound()
+        self.engine = RecognitionEngine(plan_majors(self.plan), list(self.lectures)) if self.lectures else None
+        self.none_major = Major.objects.get(id=DEFAULT_MAJOR_ID)
+        major_keys = set()
+        for operation in operations:
+            if operation['op'] == RECOGNIZED_MAJOR and operation.get('lecture_type') in [MAJOR_ELECTIVE, MAJOR_REQUIREMENT]:
+                major_keys.add((operation.get('recognized_major_name1'), operation.get('recognized_major_type1')))
+                major_keys.add((
+                    operation.get('recognized_major_name2', DEFAULT_MAJOR_NAME),
+                    operation.get('recognized_major_type2', DEFAULT_MAJOR_TYPE)))
+        self.majors = {}
+        if major_keys:
+            query = reduce(or_, (Q(major_name=major_name, major_type=major_type) for major_name, major_type in major_keys))
+            self.majors = {(major.major_name, major.major_type): major for major in Major.objects.filter(query)}
+
+    @staticmethod
+    def get_ids(operation: dict, field: str) -> List[int]:
+        """Distinct ids of field of operation in order."""
+        ids = operation.get(field)
+        if not isinstance(ids, list):
+            ids = [ids]
+        try:
+            return list(dict.fromkeys(int(id) for id in ids))
+        except (TypeError, ValueError):
+            raise FieldError(f"Invalid field [{field}]")
+
+    def get_semester(self, semester_id) -> Semester:
+        try:
+            return self.semesters[int(semester_id)]
+        except (KeyError, TypeError, ValueError):
+            raise NotFound('semester does not exist')
+
+    def get_semesterlecture(self, operation: dict) -> SemesterLecture:
+        try:
+            return self.semesterlectures[int(operation.get('semesterlecture_id'))]
+        except (KeyError, TypeError, ValueError):
+            raise NotFound('semester lecture does not exist')
+
+    def change(self, semesterlecture: SemesterLecture):
+        """Mark semester lecture and its semester as changed."""
+        self.changed[semesterlecture.semester.id] = semesterlecture.semester
+        if semesterlecture.id:
+            self.updated[semesterlecture.id] = semesterlecture
+
+    def add(self, operation: dict):
+        """Add lectures at the end of semester, as POST /lecture does."""
+        semester = self.get_semester(operation.get('semester_id'))
+        lecture_ids = self.get_ids(operation, 'lecture_id')
+        if self.lecture_ids & set(lecture_ids):
+            raise DuplicationError('some lecture already exists in plan.')
+        std1 = self.user.userprofile.entrance_year
+        sequence = self.sequences[semester.id]
+        for lecture_id in lecture_ids:
+            lecture = self.lectures[lecture_id]
+            semesterlecture = SemesterLecture(
+                semester=semester,
+                lecture=lecture,
+                lecture_type=lecture.lecture_type,
+                credit=lecture.credit,
+                recent_sequence=0)
+            resolve_new_semesterlecture(self.engine, semesterlecture, semester, std1, self.none_major)
+            self.ledger.add(semesterlecture)
+            sequence.append(semesterlecture)
+            self.created.append(semesterlecture)
+            self.placed.append(semesterlecture)
+            self.lecture_ids.add(lecture_id)
+        self.changed[semester.id] = semester
+
+    def move(self, operation: dict):
+        """Move semester lecture to position of semester_to, as PUT /lecture/:semesterlectureId/position does."""
+        semesterlecture = self.get_semesterlecture(operation)
+        if not operation.get('semester_to'):
+            raise FieldError("Field missing [semester_to]")
+        semester_to = self.get_semester(operation['semester_to'])
+        position = operation.get('position', 0)
+        self.change(semesterlecture)
+        self.sequences[semesterlecture.semester.id].remove(semesterlecture)
+        sequence = self.sequences[semester_to.id]
+        if not (isinstance(position, int) and 0 <= position <= len(sequence)):
+            raise FieldError("Invalid field [position]")
+        sequence.insert(position, semesterlecture)
+        sub_semester_credits(semesterlecture, semesterlecture.semester)
+        semesterlecture.semester = semester_to
+        add_semester_credits(semesterlecture, semester_to)
+        self.placed.append(semesterlecture)
+        self.change(semesterlecture)
+
+    def delete(self, operation: dict):
+        """Delete semester lecture, as DELETE /lecture/:semesterlectureId does."""
+        semesterlecture = self.get_semesterlecture(operation)
+        self.changed[semesterlecture.semester.id] = semesterlecture.semester
+        self.sequences[semesterlecture.semester.id].remove(semesterlecture)
+        sub_semester_credits(semesterlecture, semesterlecture.semester)
+        self.ledger.remove(semesterlecture)
+        del self.semesterlectures[semesterlecture.id]
+        self.updated.pop(semesterlecture.id, None)
+        self.lecture_ids.discard(semesterlecture.lecture_id)
+        self.deleted.append(semesterlecture.id)
+
+    def credit(self, operation: dict):
+        """Change credit of semester lecture, as PUT /lecture/:semesterlectureId/credit does."""
+        credit = operation.get('credit', 0)
+        if not (isinstance(credit, int) and 0 < credit < 5):
+            raise FieldError("Invalid field [credit]")
+        semesterlecture = self.get_semesterlecture(operation)
+        if credit == semesterlecture.credit:
+            return
+        self.credit_histories += credit_history_keys(semesterlecture, credit, self.none_major)
+        sub_semester_credits(semesterlecture, semesterlecture.semester)
+        self.ledger.remove(semesterlecture)
+        semesterlecture.credit = credit
+        semesterlecture.is_modified = True
+        add_semester_credits(semesterlecture, semesterlecture.semester)
+        self.ledger.add(semesterlecture)
+        self.change(semesterlecture)
+
+    def recognized_major(self, operation: dict):
+        """Change lecture types and recognized majors of semester lecture, as PUT /lecture/:semesterlectureId/recognized_major does."""
+        semesterlecture = self.get_semesterlecture(operation)
+        lecture_type = operation.get('lecture_type')
+        if lecture_type in [GENERAL, GENERAL_ELECTIVE]:
+            self.lecturetype_histories += lecturetype_history_keys(semesterlecture, lecture_type, self.none_major)
+            recognized_majors = [self.none_major, self.none_major]
+            lecture_types = [lecture_type, NONE]
+        elif lecture_type in [MAJOR_ELECTIVE, MAJOR_REQUIREMENT]:
+            try:
+                recognized_majors = [
+                    self.majors[(operation.get('recognized_major_name1'), operation.get('recognized_major_type1'))],
+                    self.majors[(
+                        operation.get('recognized_major_name2', DEFAULT_MAJOR_NAME),
+                        operation.get('recognized_major_type2', DEFAULT_MAJOR_TYPE))]]
+            except KeyError:
+                raise NotFound()
+            lecture_types = [operation.get('lecture_type1', NONE), operation.get('lecture_type2', NONE)]
+            self.lecturetype_histories += lecturetype_history_keys(
+                semesterlecture, lecture_type, self.none_major, recognized_majors, lecture_types)
+        else:
+            raise FieldError("Invalid field [lecture_type]")
+        sub_semester_credits(semesterlecture, semesterlecture.semester)
+        self.ledger.remove(semesterlecture)
+        semesterlecture.lecture_type = lecture_type
+        semesterlecture.recognized_major1, semesterlecture.recognized_major2 = recognized_majors
+        semesterlecture.lecture_type1, semesterlecture.lecture_type2 = lecture_types
+        semesterlecture.is_modified = True
+        add_semester_credits(semesterlecture, semesterlecture.semester)
+        self.ledger.add(semesterlecture)
+        self.change(semesterlecture)
+
+    def save(self) -> List[Semester]:
+        """Place semester lectures of changed semesters once and write every change. Returns changed semesters."""
+        for semester_id in self.changed:
+            for semesterlecture in assign_sequences(self.sequences[semester_id], self.placed):
+                if semesterlecture.id:
+                    self.updated[semesterlecture.id] = semesterlecture
+        if self.deleted:
+            SemesterLecture.objects.filter(id__in=self.deleted).delete()
+        SemesterLecture.objects.bulk_update(self.updated.values(), SEMESTERLECTURE_FIELDS)
+        SemesterLecture.objects.bulk_create(self.created)
+        Semester.objects.bulk_update(self.changed.values(), SEMESTER_CREDIT_FIELDS)
+        self.ledger.save()
+        entrance_year = self.user.userprofile.entrance_year
+        count_histories(CreditChangeHistory, CREDIT_HISTORY_FIELDS, entrance_year, self.credit_histories)
+        count_histories(LectureTypeChangeHistory, LECTURETYPE_HISTORY_FIELDS, entrance_year, self.lecturetype_histories)
+        bump_plan_version(self.plan.id)
+        if self.created or self.deleted:
+            bump_plan_search_version(self.plan.id)
+        return sorted(self.changed.values(), key=lambda semester: semester.id)
+
+
+def apply_plan_batch(user: User, plan: Plan, operations: List[dict]) -> List[Semester]:
+    """Apply ordered operations on semester lectures of plan. Returns changed semesters."""
+    return PlanBatch(user, plan).apply(operations)
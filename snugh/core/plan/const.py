@@ -0,0 +1,8 @@
+"""Constants related to Plan."""
+
+# Batch Operation
+ADD = 'add'
+MOVE = 'move'
+DELETE = 'delete'
+CREDIT = 'credit'
+RECOGNIZED_MAJOR = 'recognized_major'
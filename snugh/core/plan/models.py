@@ -11,6 +11,7 @@ class Plan(models.Model):
     user = models.ForeignKey(User, related_name='plan', on_delete=models.CASCADE)
     plan_name = models.CharField(max_length=50, db_index=True, default="새로운 계획")
     is_first_simulation = models.BooleanField(default = True)
+    version = models.PositiveIntegerField(default=0)
 
 
 class PlanMajor(models.Model):
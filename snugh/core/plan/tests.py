@@ -1,4 +1,6 @@
+from django.db import connection, transaction
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from rest_framework import status
 from core.major.models import Major
 from user.utils import UserFactory
@@ -10,6 +12,7 @@ from core.semester.const import *
 from core.lecture.models import Lecture, SemesterLecture
 from core.lecture.utils_test import SemesterLectureFactory
 from core.requirement.models import PlanRequirement
+from core.history.models import CreditChangeHistory, LectureTypeChangeHistory
 from core.const import *
 from user.const import *
 
@@ -368,6 +371,88 @@ class PlanTestCase(TestCase):
             HTTP_AUTHORIZATION=self.user_token,
         )
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_retrieve_plan_not_modified(self):
+        """
+        Test cases in conditional requests of plan and semester.
+            1) responses carry ETag of plan version.
+            2) not modified.
+            3) modified by writes on the plan.
+        """
+        plan = Plan.objects.create(user=self.user, plan_name="plan example")
+        PlanMajor.objects.create(major=self.major_1, plan=plan)
+        semester = Semester.objects.create(plan=plan, year=2016, semester_type="first")
+
+        # 1) responses carry ETag of plan version.
+        response = self.client.get(
+            f"/plan/{plan.id}/",
+            content_type="application/json",
+            HTTP_AUTHORIZATION=self.user_token,
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response['ETag']
+        response = self.client.get(
+            f"/semester/{semester.id}/",
+            content_type="application/json",
+            HTTP_AUTHORIZATION=self.user_token,
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['ETag'], etag)
+
+        # 2) not modified.
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(
+                f"/plan/{plan.id}/",
+                content_type="application/json",
+                HTTP_AUTHORIZATION=self.user_token,
+                HTTP_IF_NONE_MATCH=etag,
+            )
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+        self.assertFalse(any('core_semester' in query['sql'] for query in context.captured_queries))
+        response = self.client.get(
+            f"/semester/{semester.id}/",
+            content_type="application/json",
+            HTTP_AUTHORIZATION=self.user_token,
+            HTTP_IF_NONE_MATCH=etag,
+        )
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        # 3) modified by writes on the plan.
+        lecture = Lecture.objects.get(lecture_name="경영과학")
+        response = self.client.post(
+            "/lecture/",
+            data={"semester_id": semester.id, "lecture_id": [lecture.id]},
+            content_type="application/json",
+            HTTP_AUTHORIZATION=self.user_token,
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        response = self.client.get(
+            f"/semester/{semester.id}/",
+            content_type="application/json",
+            HTTP_AUTHORIZATION=self.user_token,
+            HTTP_IF_NONE_MATCH=etag,
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(len(response.json()['lectures']), 1)
+        etag = response['ETag']
+
+        response = self.client.put(
+            f"/plan/{plan.id}/",
+            data={"plan_name": "new plan name"},
+            content_type="application/json",
+            HTTP_AUTHORIZATION=self.user_token,
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.get(
+            f"/plan/{plan.id}/",
+            content_type="application/json",
+            HTTP_AUTHORIZATION=self.user_token,
+            HTTP_IF_NONE_MATCH=etag,
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['plan_name'], "new plan name")
         
 
 class PlanMajorCopyTestCase(TestCase):
@@ -375,6 +460,7 @@ class PlanMajorCopyTestCase(TestCase):
     # Test Plan APIs.
         [POST] plan/<plan_id>/copy/
         [PUT] plan/<plan_id>/major/
+        [POST] plan/<plan_id>/batch/
     """
 
     @classmethod
@@ -648,6 +734,210 @@ class PlanMajorCopyTestCase(TestCase):
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
     
 
+    def test_major_update_incremental(self):
+        """
+        Test cases in updating plan's major incrementally.
+            1) same result with recalculating the plan.
+            2) unchanged majors do not update semester lectures.
+        """
+        def snapshot():
+            semesterlectures = SemesterLecture.objects.filter(semester__plan=self.plan).order_by('lecture_id')\
+                .values_list('lecture_id', 'lecture_type', 'lecture_type1', 'lecture_type2',
+                             'recognized_major1', 'recognized_major2', 'credit')
+            semesters = Semester.objects.filter(plan=self.plan).order_by('id')\
+                .values_list('major_requirement_credit', 'major_elective_credit', 'general_credit', 'general_elective_credit')
+            return list(semesterlectures), list(semesters)
+
+        # 1) same result with recalculating the plan.
+        response = self.client.put(
+            f"/plan/{self.plan.id}/calculate/",
+            content_type="application/json",
+            HTTP_AUTHORIZATION=self.user_token,
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        majors = {
+            "majors": [
+                {
+                    "major_name": "경영학과",
+                    "major_type": "major"
+                },
+                {
+                    "major_name": "컴퓨터공학부",
+                    "major_type": "double_major"
+                }
+            ]
+        }
+        response = self.client.put(
+            f"/plan/{self.plan.id}/major/",
+            data=majors,
+            content_type="application/json",
+            HTTP_AUTHORIZATION=self.user_token,
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        result = snapshot()
+        response = self.client.put(
+            f"/plan/{self.plan.id}/calculate/",
+            content_type="application/json",
+            HTTP_AUTHORIZATION=self.user_token,
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(snapshot(), result)
+
+        # 2) unchanged majors do not update semester lectures.
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.put(
+                f"/plan/{self.plan.id}/major/",
+                data=majors,
+                content_type="application/json",
+                HTTP_AUTHORIZATION=self.user_token,
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(any(
+            query['sql'].startswith('UPDATE') and 'core_semesterlecture' in query['sql'] 
+            for query in context.captured_queries))
+        self.assertEqual(snapshot(), result)
+
+    def test_batch_plan(self):
+        """
+        Test cases in editing plan with batch operations.
+            1) same result with operating one by one.
+            2) only changed semesters are returned.
+            3) failed operation rolls back every operation.
+            4) not plan's owner.
+            5) number of queries does not grow with credit and recognized_major operations.
+        """
+        def snapshot():
+            return list(SemesterLecture.objects.filter(semester__plan=self.plan)\
+                .order_by('semester_id', 'recent_sequence')\
+                .values_list('semester_id', 'lecture_id', 'lecture_type', 'lecture_type1', 'lecture_type2',
+                             'recognized_major1', 'recognized_major2', 'credit', 'is_modified')), \
+                list(Semester.objects.filter(plan=self.plan).order_by('id')\
+                .values_list('major_requirement_credit', 'major_elective_credit', 'general_credit', 'general_elective_credit')), \
+                list(CreditChangeHistory.objects.order_by('id')\
+                .values_list('major', 'lecture', 'entrance_year', 'year_taken', 'past_credit', 'curr_credit', 'change_count')), \
+                list(LectureTypeChangeHistory.objects.order_by('id')\
+                .values_list('major', 'lecture', 'entrance_year', 'past_lecture_type', 'curr_lecture_type', 'change_count'))
+
+        semesterlecture = SemesterLecture.objects.get(semester=self.semester_1, lecture=self.lecture_general_elective_1)
+        moved = SemesterLecture.objects.filter(semester=self.semester_1, lecture__in=self.lectures_1).first()
+        lecture = Lecture.objects.get(lecture_name="경영학원론")
+        operations = [
+            {"op": "add", "semester_id": self.semester_1.id, "lecture_id": [lecture.id]},
+            {"op": "move", "semesterlecture_id": moved.id, "semester_to": self.semester_2.id, "position": 0},
+            {"op": "credit", "semesterlecture_id": semesterlecture.id, "credit": 4},
+            {"op": "recognized_major", "semesterlecture_id": semesterlecture.id, "lecture_type": GENERAL},
+        ]
+
+        # 1) same result with operating one by one.
+        with transaction.atomic():
+            responses = [
+                self.client.post(
+                    "/lecture/",
+                    data={"semester_id": self.semester_1.id, "lecture_id": [lecture.id]},
+                    content_type="application/json",
+                    HTTP_AUTHORIZATION=self.user_token),
+                self.client.put(
+                    f"/lecture/{moved.id}/position/",
+                    data={"semester_to": self.semester_2.id, "position": 0},
+                    content_type="application/json",
+                    HTTP_AUTHORIZATION=self.user_token),
+                self.client.put(
+                    f"/lecture/{semesterlecture.id}/credit/",
+                    data={"credit": 4},
+                    content_type="application/json",
+                    HTTP_AUTHORIZATION=self.user_token),
+                self.client.put(
+                    f"/lecture/{semesterlecture.id}/recognized_major/",
+                    data={"lecture_type": GENERAL},
+                    content_type="application/json",
+                    HTTP_AUTHORIZATION=self.user_token),
+            ]
+            for response in responses:
+                self.assertIn(response.status_code, [status.HTTP_200_OK, status.HTTP_201_CREATED])
+            result = snapshot()
+            transaction.set_rollback(True)
+
+        response = self.client.post(
+            f"/plan/{self.plan.id}/batch/",
+            data={"operations": operations},
+            content_type="application/json",
+            HTTP_AUTHORIZATION=self.user_token,
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(snapshot(), result)
+
+        # 2) only changed semesters are returned.
+        data = response.json()
+        self.assertEqual([semester["id"] for semester in data], [self.semester_1.id, self.semester_2.id])
+        self.assertEqual(data[1]["lectures"][0]["semesterlecture_id"], moved.id)
+        response = self.client.post(
+            f"/plan/{self.plan.id}/batch/",
+            data={"operations": [{"op": "credit", "semesterlecture_id": semesterlecture.id, "credit": 3}]},
+            content_type="application/json",
+            HTTP_AUTHORIZATION=self.user_token,
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([semester["id"] for semester in response.json()], [self.semester_1.id])
+        result = snapshot()
+
+        # 3) failed operation rolls back every operation.
+        response = self.client.post(
+            f"/plan/{self.plan.id}/batch/",
+            data={"operations": [
+                {"op": "delete", "semesterlecture_id": moved.id},
+                {"op": "credit", "semesterlecture_id": semesterlecture.id, "credit": 5},
+            ]},
+            content_type="application/json",
+            HTTP_AUTHORIZATION=self.user_token,
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json()['detail'], "Invalid field [credit]")
+        response = self.client.post(
+            f"/plan/{self.plan.id}/batch/",
+            data={"operations": [{"op": "add", "semester_id": self.semester_2.id, "lecture_id": [lecture.id]}]},
+            content_type="application/json",
+            HTTP_AUTHORIZATION=self.user_token,
+        )
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(snapshot(), result)
+
+        # 4) not plan's owner.
+        response = self.client.post(
+            f"/plan/{self.plan.id}/batch/",
+            data={"operations": [{"op": "delete", "semesterlecture_id": moved.id}]},
+            content_type="application/json",
+            HTTP_AUTHORIZATION=self.stranger_token,
+        )
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(snapshot(), result)
+
+        # 5) number of queries does not grow with credit and recognized_major operations.
+        # Semesters changed are returned, so lectures of one semester are edited.
+        # Histories of semesterlecture exist already, so every history of the others is created by the batch.
+        semesterlectures = list(SemesterLecture.objects.filter(semester=self.semester_1).exclude(id=semesterlecture.id))
+        n_queries = []
+        for edited in [semesterlectures[:1], semesterlectures]:
+            operations = []
+            for semesterlecture in edited:
+                operations.append({
+                    "op": "credit",
+                    "semesterlecture_id": semesterlecture.id,
+                    "credit": 4 if semesterlecture.credit != 4 else 3})
+                operations.append({"op": "recognized_major", "semesterlecture_id": semesterlecture.id, "lecture_type": GENERAL})
+            with transaction.atomic():
+                with CaptureQueriesContext(connection) as context:
+                    response = self.client.post(
+                        f"/plan/{self.plan.id}/batch/",
+                        data={"operations": operations},
+                        content_type="application/json",
+                        HTTP_AUTHORIZATION=self.user_token,
+                    )
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                n_queries.append(len(context.captured_queries))
+                transaction.set_rollback(True)
+        self.assertGreater(len(semesterlectures), 1)
+        self.assertEqual(n_queries[0], n_queries[1])
+
     def test_copy_plan(self):
         """
         Test cases in copying plan.
@@ -1,11 +1,20 @@
 """Utils related to Plan APIs."""
 
+from typing import Callable
 from core.plan.models import Plan, PlanMajor
 from core.major.models import Major
+from core.lecture.models import SemesterLecture
+from core.lecture.utils import update_recognition
+from core.plan.version import bump_plan_version
+from core.requirement.ledger import build_ledger
 from core.requirement.models import PlanRequirement
-from snugh.exceptions import DuplicationError, FieldError, NotFound
+from core.semester.models import Semester
+from snugh.exceptions import DuplicationError, FieldError, NotFound, NotOwner
+from django.contrib.auth import get_user_model
 from django.db.utils import IntegrityError
 
+User = get_user_model()
+
 
 def plan_major_requirement_generator(plan: Plan, majors: dict, entrance_year: int) -> bool:
     """Generate PlanMajor & PlanRequirement."""
@@ -33,4 +42,86 @@ def plan_major_requirement_generator(plan: Plan, majors: dict, entrance_year: in
         raise DuplicationError("Already exists [PlanMajor]")
 
     return True
-    
\ No newline at end of file
+
+
+def update_plan_majors(user: User, plan: Plan, majors: dict, progress: Callable[[int, int], None] = None) -> Plan:
+    """
+    Overwrite PlanMajor & PlanRequirement, recalculating only lectures whose recognition could change.
+    progress is called with steps done and all steps.
+    """
+    old_major_ids = set(plan.planmajor.values_list('major_id', flat=True))
+    plan.planmajor.all().delete()
+    plan.planrequirement.all().delete()
+    plan_major_requirement_generator(plan, majors, user.userprofile.entrance_year)
+    new_major_ids = set(plan.planmajor.values_list('major_id', flat=True))
+    if progress:
+        progress(1, 2)
+    update_recognition(user, plan.id, old_major_ids - new_major_ids, new_major_ids - old_major_ids)
+    bump_plan_version(plan.id)
+    return plan
+
+
+def copy_plan(user: User, plan_id: int, progress: Callable[[int, int], None] = None) -> Plan:
+    """
+    Copy plan with its majors, requirements, semesters and lectures.
+    progress is called with semesters copied and all semesters of plan.
+    """
+    try:
+        plan = Plan.objects.prefetch_related(
+            'user', 
+            'planmajor', 
+            'planrequirement', 
+            'semester',
+            'planmajor__major',
+            'planrequirement__requirement',
+            'semester__semesterlecture',
+            'semester__semesterlecture__lecture',
+            'semester__semesterlecture__recognized_major1',
+            'semester__semesterlecture__recognized_major2'
+            ).get(pk=plan_id)
+    except Plan.DoesNotExist:
+        raise NotFound()
+    if user != plan.user:
+        raise NotOwner()
+    new_plan = Plan.objects.create(user=plan.user, plan_name=f"{plan.plan_name} (복사본)")
+
+    planmajors = plan.planmajor.all()
+    new_planmajors = []
+    for planmajor in planmajors:
+        new_planmajors.append(PlanMajor(plan=new_plan, major=planmajor.major))
+    PlanMajor.objects.bulk_create(new_planmajors)
+
+    planrequirements = plan.planrequirement.all()
+    new_planrequirements = []
+    for planrequirement in planrequirements:
+        new_planrequirements.append(PlanRequirement(plan=new_plan, requirement=planrequirement.requirement, required_credit=planrequirement.required_credit))
+    PlanRequirement.objects.bulk_create(new_planrequirements)
+
+    semesters = plan.semester.all()
+    for i, semester in enumerate(semesters):
+        new_semester = Semester.objects.create(plan=new_plan,
+                                               year=semester.year,
+                                               semester_type=semester.semester_type,
+                                               major_requirement_credit=semester.major_requirement_credit,
+                                               major_elective_credit=semester.major_elective_credit,
+                                               general_credit=semester.general_credit,
+                                               general_elective_credit=semester.general_elective_credit)
+
+        semesterlectures = semester.semesterlecture.all()
+        new_semesterlectures = []
+        for semesterlecture in semesterlectures:
+            new_semesterlectures.append(SemesterLecture(semester=new_semester,
+                                           lecture=semesterlecture.lecture,
+                                           lecture_type=semesterlecture.lecture_type,
+                                           recognized_major1=semesterlecture.recognized_major1,
+                                           lecture_type1=semesterlecture.lecture_type1,
+                                           recognized_major2=semesterlecture.recognized_major2,
+                                           lecture_type2=semesterlecture.lecture_type2,
+                                           credit=semesterlecture.credit,
+                                           recent_sequence=semesterlecture.recent_sequence,
+                                           is_modified=semesterlecture.is_modified))
+        SemesterLecture.objects.bulk_create(new_semesterlectures)
+        if progress:
+            progress(i + 1, len(semesters))
+    build_ledger(new_plan)
+    return new_plan
@@ -0,0 +1,22 @@
+"""Versions of plans, sent as ETag so that unchanged plans are not serialized again."""
+
+from django.db.models import F
+from django.utils.http import parse_etags, quote_etag
+from core.lecture.search import catalog_version
+from core.plan.models import Plan
+
+
+def bump_plan_version(*plan_ids: int):
+    """Bump version of plans. Call in the transaction writing their semesters, lectures, majors or requirements."""
+    Plan.objects.filter(id__in=plan_ids).update(version=F('version') + 1)
+
+
+def plan_etag(version: int) -> str:
+    """Strong ETag of plan data at version. Lecture data shown with plans changes it too."""
+    return quote_etag(f'{version}.{catalog_version()}')
+
+
+def is_not_modified(request, etag: str) -> bool:
+    """Whether If-None-Match of request has etag, so that the response can be 304."""
+    etags = parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))
+    return etag in etags or '*' in etags
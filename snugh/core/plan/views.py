@@ -4,13 +4,17 @@ from rest_framework.response import Response
 from rest_framework.decorators import action
 from snugh.permissions import IsOwnerOrCreateReadOnly
 from snugh.exceptions import NotOwner, NotFound, FieldError
+from core.job.const import CALCULATE_JOB, COPY_JOB, MAJOR_JOB
+from core.job.serializers import JobSerializer
+from core.job.utils import enqueue_job
 from core.lecture.utils import update_lecture_info
-from core.lecture.models import SemesterLecture
+from core.plan.batch import apply_plan_batch
 from core.plan.serializers import PlanSerializer, PlanRetrieveSerializer
-from core.plan.models import Plan, PlanMajor
-from core.plan.utils import plan_major_requirement_generator
-from core.semester.models import Semester
-from core.requirement.models import PlanRequirement
+from core.plan.models import Plan
+from core.plan.utils import copy_plan, plan_major_requirement_generator, update_plan_majors
+from core.plan.version import bump_plan_version, is_not_modified, plan_etag
+from core.requirement.ledger import build_ledger
+from core.semester.serializers import SemesterSerializer
 
 class PlanViewSet(viewsets.GenericViewSet, generics.RetrieveUpdateDestroyAPIView):
     """
@@ -20,6 +24,12 @@ class PlanViewSet(viewsets.GenericViewSet, generics.RetrieveUpdateDestroyAPIView
     serializer_class = PlanSerializer 
     permission_classes = [IsOwnerOrCreateReadOnly]
 
+    def get_queryset(self):
+        if self.action == 'update':
+            # Plan is saved as a whole, so lock it against concurrent version bumps.
+            return Plan.objects.select_for_update()
+        return super().get_queryset()
+
     # POST /plan
     @transaction.atomic
     def create(self, request):
@@ -32,6 +42,7 @@ class PlanViewSet(viewsets.GenericViewSet, generics.RetrieveUpdateDestroyAPIView
         if not majors:
             raise FieldError("Field missing [majors]")
         plan_major_requirement_generator(plan, majors, request.user.userprofile.entrance_year)
+        build_ledger(plan)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     # PUT /plan/:planId
@@ -39,6 +50,10 @@ class PlanViewSet(viewsets.GenericViewSet, generics.RetrieveUpdateDestroyAPIView
     def update(self, request, pk=None):
         """Update user's plan."""
         return super().update(request, pk)
+
+    def perform_update(self, serializer):
+        plan = serializer.save()
+        bump_plan_version(plan.id)
     
     # DEL /plan/:planId
     def destroy(self, request, pk=None):
@@ -47,9 +62,12 @@ class PlanViewSet(viewsets.GenericViewSet, generics.RetrieveUpdateDestroyAPIView
 
     # GET /plan/:planId
     def retrieve(self, request, pk=None):
-        """Retrieve user's plan."""
+        """Retrieve user's plan. Returns 304 if If-None-Match has ETag of its current version."""
         plan = self.get_object()
-        return Response(PlanRetrieveSerializer(plan).data, status=status.HTTP_200_OK)
+        etag = plan_etag(plan.version)
+        if is_not_modified(request, etag):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+        return Response(PlanRetrieveSerializer(plan).data, status=status.HTTP_200_OK, headers={'ETag': etag})
 
     # GET /plan
     def list(self, request):
@@ -59,90 +77,64 @@ class PlanViewSet(viewsets.GenericViewSet, generics.RetrieveUpdateDestroyAPIView
         return Response(self.get_serializer(plans, many=True).data, status=status.HTTP_200_OK)
 
     # 강의구분 자동계산
-    # PUT /plan/:planId/calculate
+    # PUT /plan/:planId/calculate?background=(bool)
     @action(detail=True, methods=['PUT'])
     @transaction.atomic
     def calculate(self, request, pk=None):
-        """Calculate credits."""
+        """Calculate credits. With background=true, returns a job calculating in background."""
+        if request.query_params.get("background") == "true":
+            return self.background(request, CALCULATE_JOB)
         plan = update_lecture_info(request.user, pk)
         serializer = self.get_serializer(plan)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
-    # PUT /plan/:planId/major
+    # PUT /plan/:planId/major?background=(bool)
     @action(detail=True, methods=['PUT'])
     @transaction.atomic
     def major(self, request, pk=None):
-        """Update plan's majors."""
-        plan = self.get_object()
-        # overwrite planmajors, planrequirements
-        plan.planmajor.all().delete()
-        plan.planrequirement.all().delete()
-        majors = request.data.get('majors', [])
-        plan_major_requirement_generator(plan, majors, request.user.userprofile.entrance_year)
-        self.calculate(request, pk=pk)
+        """Update plan's majors, recalculating only lectures whose recognition could change."""
+        if request.query_params.get("background") == "true":
+            return self.background(request, MAJOR_JOB, {'majors': request.data.get('majors', [])})
+        plan = update_plan_majors(request.user, self.get_object(), request.data.get('majors', []))
         serializer = self.get_serializer(plan)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
-    # POST /plan/:planId/copy
+    # POST /plan/:planId/copy?background=(bool)
     @action(detail=True, methods=['POST'])
     @transaction.atomic
     def copy(self, request, pk=None):
-        """Copy existing plan."""
+        """Copy existing plan. With background=true, returns a job copying in background."""
+        if request.query_params.get("background") == "true":
+            return self.background(request, COPY_JOB)
+        new_plan = copy_plan(request.user, pk)
+        serializer = self.get_serializer(new_plan)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    # POST /plan/:planId/batch
+    @action(detail=True, methods=['POST'])
+    @transaction.atomic
+    def batch(self, request, pk=None):
+        """
+        Apply ordered operations on semester lectures of plan in one transaction.
+        Returns only semesters changed by operations.
+            ex) {"operations": [
+                    {"op": "add", "semester_id": 1, "lecture_id": [1, 2]},
+                    {"op": "move", "semesterlecture_id": 3, "semester_to": 2, "position": 0},
+                    {"op": "delete", "semesterlecture_id": 4},
+                    {"op": "credit", "semesterlecture_id": 5, "credit": 3},
+                    {"op": "recognized_major", "semesterlecture_id": 6, "lecture_type": "general"}]}
+        """
+        semesters = apply_plan_batch(request.user, self.get_object(), request.data.get('operations'))
+        serializer = SemesterSerializer(semesters, many=True)
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+    def background(self, request, job_type: str, params: dict = None) -> Response:
+        """Enqueue a job of plan for runjobs workers, polled with GET /job/:jobId."""
         try:
-            plan = Plan.objects.prefetch_related(
-                'user', 
-                'planmajor', 
-                'planrequirement', 
-                'semester',
-                'planmajor__major',
-                'planrequirement__requirement',
-                'semester__semesterlecture',
-                'semester__semesterlecture__lecture',
-                'semester__semesterlecture__recognized_major1',
-                'semester__semesterlecture__recognized_major2'
-                ).get(pk=pk)
-            user = plan.user
+            plan = Plan.objects.get(pk=self.kwargs['pk'])
         except Plan.DoesNotExist:
             raise NotFound()
         if request.user != plan.user:
             raise NotOwner()
-        new_plan = Plan.objects.create(user=user, plan_name=f"{plan.plan_name} (복사본)")
-
-        planmajors = plan.planmajor.all()
-        new_planmajors = []
-        for planmajor in planmajors:
-            new_planmajors.append(PlanMajor(plan=new_plan, major=planmajor.major))
-        PlanMajor.objects.bulk_create(new_planmajors)
-
-        planrequirements = plan.planrequirement.all()
-        new_planrequirements = []
-        for planrequirement in planrequirements:
-            new_planrequirements.append(PlanRequirement(plan=new_plan, requirement=planrequirement.requirement, required_credit=planrequirement.required_credit))
-        PlanRequirement.objects.bulk_create(new_planrequirements)
-
-        semesters = plan.semester.all()
-        for semester in semesters:
-            new_semester = Semester.objects.create(plan=new_plan,
-                                                   year=semester.year,
-                                                   semester_type=semester.semester_type,
-                                                   major_requirement_credit=semester.major_requirement_credit,
-                                                   major_elective_credit=semester.major_elective_credit,
-                                                   general_credit=semester.general_credit,
-                                                   general_elective_credit=semester.general_elective_credit)
-
-            semesterlectures = semester.semesterlecture.all()
-            new_semesterlectures = []
-            for semesterlecture in semesterlectures:
-                new_semesterlectures.append(SemesterLecture(semester=new_semester,
-                                               lecture=semesterlecture.lecture,
-                                               lecture_type=semesterlecture.lecture_type,
-                                               recognized_major1=semesterlecture.recognized_major1,
-                                               lecture_type1=semesterlecture.lecture_type1,
-                                               recognized_major2=semesterlecture.recognized_major2,
-                                               lecture_type2=semesterlecture.lecture_type2,
-                                               credit=semesterlecture.credit,
-                                               recent_sequence=semesterlecture.recent_sequence,
-                                               is_modified=semesterlecture.is_modified))
-            SemesterLecture.objects.bulk_create(new_semesterlectures)
-        serializer = self.get_serializer(new_plan)
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
+        job = enqueue_job(request.user, plan, job_type, params)
+        return Response(JobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
@@ -12,3 +12,7 @@ REQUIREMENT_TYPE = (
     (TEACHING, 'teaching'),
     (ALL, 'all'),
 )
+
+# Progress
+PROGRESS_PREFETCH = ('planmajor__major', 'planrequirement__requirement__major')
+COMPARED_PLANS_LIMIT = 10
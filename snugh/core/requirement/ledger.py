@@ -0,0 +1,170 @@
+"""Ledger of earned credits of plans, updated by deltas of semester lectures instead of recomputed per request."""
+
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+from django.db.models import Q, Sum
+from core.const import *
+from core.lecture.models import SemesterLecture
+from core.plan.models import Plan
+from core.requirement.models import EarnedCredit
+
+# (major id, requirement type) of a ledger entry.
+LedgerKey = Tuple[int, str]
+
+# Entries every plan on the ledger has, even with no semester lecture.
+PLAN_LEDGER_KEYS = [(DEFAULT_MAJOR_ID, ALL), (DEFAULT_MAJOR_ID, GENERAL), (DEFAULT_MAJOR_ID, MAJOR_ALL)]
+
+
+def ledger_keys(
+    lecture_type1: str,
+    lecture_type2: str,
+    recognized_major1_id: int,
+    recognized_major2_id: int) -> Iterable[LedgerKey]:
+    """
+    Ledger entries credit of a semester lecture is earned for.
+    Credits of the plan are all, general or major ones by lecture_type1,
+    and credits of each recognized major are major_all and major_requirement ones.
+    """
+    yield DEFAULT_MAJOR_ID, ALL
+    if lecture_type1 == GENERAL:
+        yield DEFAULT_MAJOR_ID, GENERAL
+    elif lecture_type1 in [MAJOR_REQUIREMENT, MAJOR_ELECTIVE]:
+        yield DEFAULT_MAJOR_ID, MAJOR_ALL
+        if recognized_major1_id != DEFAULT_MAJOR_ID:
+            yield recognized_major1_id, MAJOR_ALL
+            if lecture_type1 == MAJOR_REQUIREMENT:
+                yield recognized_major1_id, MAJOR_REQUIREMENT
+        if recognized_major2_id != DEFAULT_MAJOR_ID and lecture_type2 in [MAJOR_REQUIREMENT, MAJOR_ELECTIVE]:
+            yield recognized_major2_id, MAJOR_ALL
+            if lecture_type2 == MAJOR_REQUIREMENT:
+                yield recognized_major2_id, MAJOR_REQUIREMENT
+
+
+def plans_earned_credits(plan_ids: List[int]) -> Dict[int, Dict[LedgerKey, int]]:
+    """
+    Earned credits of plans by plan id, recomputed from their semester lectures.
+    Credits are summed by the database per plan and pair of recognized majors, the same way as ledger_keys.
+    """
+    is_major1 = Q(lecture_type1__in=[MAJOR_REQUIREMENT, MAJOR_ELECTIVE])
+    sums = SemesterLecture.objects.filter(semester__plan_id__in=plan_ids)\
+        .order_by()\
+        .values_list('semester__plan_id', 'recognized_major1', 'recognized_major2')\
+        .annotate(
+            all_credit=Sum('credit'),
+            general_credit=Sum('credit', filter=Q(lecture_type1=GENERAL)),
+            major_all_credit1=Sum('credit', filter=is_major1),
+            major_requirement_credit1=Sum('credit', filter=Q(lecture_type1=MAJOR_REQUIREMENT)),
+            major_all_credit2=Sum('credit', filter=is_major1 & Q(lecture_type2__in=[MAJOR_REQUIREMENT, MAJOR_ELECTIVE])),
+            major_requirement_credit2=Sum('credit', filter=is_major1 & Q(lecture_type2=MAJOR_REQUIREMENT)))
+    credits_by_plan = {plan_id: dict.fromkeys(PLAN_LEDGER_KEYS, 0) for plan_id in plan_ids}
+
+    def add(credits: Dict[LedgerKey, int], key: LedgerKey, credit: Optional[int]):
+        if credit:
+            credits[key] = credits.get(key, 0) + credit
+
+    for plan_id, recognized_major1_id, recognized_major2_id, all_credit, general_credit, \
+            major_all_credit1, major_requirement_credit1, major_all_credit2, major_requirement_credit2 in sums:
+        credits = credits_by_plan[plan_id]
+        add(credits, (DEFAULT_MAJOR_ID, ALL), all_credit)
+        add(credits, (DEFAULT_MAJOR_ID, GENERAL), general_credit)
+        add(credits, (DEFAULT_MAJOR_ID, MAJOR_ALL), major_all_credit1)
+        if recognized_major1_id != DEFAULT_MAJOR_ID:
+            add(credits, (recognized_major1_id, MAJOR_ALL), major_all_credit1)
+            add(credits, (recognized_major1_id, MAJOR_REQUIREMENT), major_requirement_credit1)
+        if recognized_major2_id != DEFAULT_MAJOR_ID:
+            add(credits, (recognized_major2_id, MAJOR_ALL), major_all_credit2)
+            add(credits, (recognized_major2_id, MAJOR_REQUIREMENT), major_requirement_credit2)
+    return credits_by_plan
+
+
+def earned_credits(plan: Plan) -> Dict[LedgerKey, int]:
+    """Earned credits of plan recomputed from its semester lectures."""
+    return plans_earned_credits([plan.id])[plan.id]
+
+
+def plans_ledger_credits(plan_ids: List[int]) -> Dict[int, Dict[LedgerKey, int]]:
+    """Earned credits of plans from the ledger by plan id. Plans not on the ledger yet are left out."""
+    credits_by_plan = defaultdict(dict)
+    for plan_id, major_id, requirement_type, earned_credit in EarnedCredit.objects.filter(plan_id__in=plan_ids)\
+            .values_list('plan_id', 'major_id', 'requirement_type', 'earned_credit'):
+        credits_by_plan[plan_id][(major_id, requirement_type)] = earned_credit
+    return dict(credits_by_plan)
+
+
+def ledger_credits(plan: Plan) -> Optional[Dict[LedgerKey, int]]:
+    """Earned credits of plan from the ledger, None if plan is not on the ledger yet."""
+    return plans_ledger_credits([plan.id]).get(plan.id)
+
+
+def plans_credits(plan_ids: List[int]) -> Dict[int, Dict[LedgerKey, int]]:
+    """Earned credits of plans by plan id, from the ledger or recomputed for plans not on it yet."""
+    credits = plans_ledger_credits(plan_ids)
+    missing_plan_ids = [plan_id for plan_id in plan_ids if plan_id not in credits]
+    if missing_plan_ids:
+        credits.update(plans_earned_credits(missing_plan_ids))
+    return credits
+
+
+def build_ledger(plan: Plan) -> Dict[LedgerKey, int]:
+    """Put plan on the ledger, overwriting its entries with credits recomputed from semester lectures."""
+    credits = earned_credits(plan)
+    plan.earnedcredit.all().delete()
+    EarnedCredit.objects.bulk_create(
+        EarnedCredit(plan=plan, major_id=major_id, requirement_type=requirement_type, earned_credit=earned_credit)
+        for (major_id, requirement_type), earned_credit in credits.items())
+    return credits
+
+
+class CreditLedger:
+    """
+    Changes of earned credits of a plan by semester lectures, written to its ledger at once.
+    Remove semester lectures before they change and add them after, then save.
+    Semester lectures must be locked with select_for_update before they are read,
+    or concurrent changes of the same lecture remove its old credit twice.
+    Plans not on the ledger are left to be built, e.g. by reconcileledger --fix.
+    Writes bypassing the ledger must take the plans off it, as Lecture.delete does for semester lectures
+    deleted by cascade, or be followed by reconcileledger --fix.
+
+        # Fields
+        plan_id (int): Id of plan.
+        deltas (defaultdict): Changes of earned credits by (major id, requirement type).
+    """
+
+    def __init__(self, plan_id: int):
+        self.plan_id = plan_id
+        self.deltas = defaultdict(int)
+
+    def add(self, semesterlecture: SemesterLecture, sign: int = 1):
+        for key in ledger_keys(
+            semesterlecture.lecture_type1,
+            semesterlecture.lecture_type2,
+            semesterlecture.recognized_major1_id,
+            semesterlecture.recognized_major2_id):
+            self.deltas[key] += sign * semesterlecture.credit
+
+    def remove(self, semesterlecture: SemesterLecture):
+        self.add(semesterlecture, -1)
+
+    def save(self):
+        """Apply deltas to ledger entries of plan, locking them against concurrent changes."""
+        deltas = {key: delta for key, delta in self.deltas.items() if delta}
+        self.deltas.clear()
+        if not deltas:
+            return
+        entries = {
+            (entry.major_id, entry.requirement_type): entry
+            for entry in EarnedCredit.objects.select_for_update().filter(plan_id=self.plan_id)}
+        if not entries:
+            return
+        updated = []
+        created = []
+        for (major_id, requirement_type), delta in deltas.items():
+            entry = entries.get((major_id, requirement_type))
+            if entry is None:
+                created.append(EarnedCredit(
+                    plan_id=self.plan_id, major_id=major_id, requirement_type=requirement_type, earned_credit=delta))
+            else:
+                entry.earned_credit += delta
+                updated.append(entry)
+        EarnedCredit.objects.bulk_update(updated, ['earned_credit'])
+        EarnedCredit.objects.bulk_create(created)
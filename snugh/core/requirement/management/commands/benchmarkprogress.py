@@ -0,0 +1,82 @@
+from core.const import *
+from core.lecture.const import SEQUENCE_GAP
+from core.lecture.management.benchmark import BenchmarkCommand
+from core.lecture.management.commands.benchmarksearch import BENCHMARK_CODE_PREFIX
+from core.lecture.models import Lecture, SemesterLecture
+from core.major.const import MAJOR
+from core.major.models import Major
+from core.plan.models import Plan, PlanMajor
+from core.requirement.ledger import earned_credits, ledger_keys
+from core.semester.const import FIRST, SECOND
+from core.semester.models import Semester
+from user.models import User
+
+
+def python_earned_credits(plan: Plan) -> dict:
+    """Earned credits of plan summed in Python over one row per semester lecture, as calculate used to."""
+    credits = {}
+    semesterlectures = plan.semester.all().values_list(
+        'semesterlecture__credit',
+        'semesterlecture__lecture_type1',
+        'semesterlecture__lecture_type2',
+        'semesterlecture__recognized_major1',
+        'semesterlecture__recognized_major2')
+    for credit, *recognition in semesterlectures:
+        if credit is None:
+            continue
+        for key in ledger_keys(*recognition):
+            credits[key] = credits.get(key, 0) + credit
+    return credits
+
+
+class Command(BenchmarkCommand):
+    help = "Compare earned credits of a plan summed in Python with ones summed by the database"
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--semesters', type=int, default=8, help='Number of semesters of the synthetic plan.')
+        parser.add_argument('--lectures', type=int, default=7, help='Number of lectures per semester.')
+        parser.add_argument('--majors', type=int, default=2, help='Number of majors of the synthetic plan.')
+
+    def setup(self, **options):
+        user = User.objects.create(username=f'{BENCHMARK_CODE_PREFIX}user')
+        self.plan = Plan.objects.create(user=user, plan_name=f'{BENCHMARK_CODE_PREFIX}plan')
+        Major.objects.bulk_create(
+            Major(major_name=f'{BENCHMARK_CODE_PREFIX}{i}', major_type=MAJOR) for i in range(options['majors']))
+        majors = list(Major.objects.filter(major_name__startswith=BENCHMARK_CODE_PREFIX))
+        PlanMajor.objects.bulk_create(PlanMajor(plan=self.plan, major=major) for major in majors)
+        Semester.objects.bulk_create(
+            Semester(plan=self.plan, year=2018 + i // 2, semester_type=[FIRST, SECOND][i % 2])
+            for i in range(options['semesters']))
+        semesters = list(self.plan.semester.all())
+        count = options['semesters'] * options['lectures']
+        Lecture.objects.bulk_create(
+            Lecture(lecture_code=f'{BENCHMARK_CODE_PREFIX}{i}', lecture_name=f'{BENCHMARK_CODE_PREFIX}{i}')
+            for i in range(count))
+        lectures = list(Lecture.objects.filter(lecture_code__startswith=BENCHMARK_CODE_PREFIX))
+        semesterlectures = []
+        for i, lecture in enumerate(lectures):
+            lecture_type = self.random.choice([MAJOR_REQUIREMENT, MAJOR_ELECTIVE, GENERAL, GENERAL_ELECTIVE])
+            semesterlecture = SemesterLecture(
+                semester=semesters[i % len(semesters)], lecture=lecture, lecture_type=lecture_type,
+                lecture_type1=lecture_type, credit=self.random.randint(1, 4),
+                recent_sequence=i // len(semesters) * SEQUENCE_GAP)
+            if lecture_type in [MAJOR_REQUIREMENT, MAJOR_ELECTIVE]:
+                semesterlecture.recognized_major1 = self.random.choice(majors)
+                if len(majors) > 1 and self.random.random() < 0.2:
+                    semesterlecture.recognized_major2 = self.random.choice(majors)
+                    semesterlecture.lecture_type2 = MAJOR_ELECTIVE
+            semesterlectures.append(semesterlecture)
+        SemesterLecture.objects.bulk_create(semesterlectures)
+        self.info(f'{len(semesters)} semesters, {len(semesterlectures)} semester lectures')
+
+    def run(self, **options):
+        python_rows = self.plan.semester.all().values_list('semesterlecture').count()
+        sql_rows = SemesterLecture.objects.filter(semester__plan=self.plan).order_by()\
+            .values_list('recognized_major1', 'recognized_major2').distinct().count()
+        self.info(f'Rows transferred: {python_rows} summed in Python, {sql_rows} summed by the database')
+        nonzero = lambda credits: {key: credit for key, credit in credits.items() if credit}
+        if nonzero(python_earned_credits(self.plan)) != nonzero(earned_credits(self.plan)):
+            self.stdout.write(self.style.ERROR('Earned credits differ.'))
+        self.measure('Summed in Python', python_earned_credits, [self.plan])
+        self.measure('Summed by the database', earned_credits, [self.plan])
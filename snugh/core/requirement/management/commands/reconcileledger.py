@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from core.plan.models import Plan
+from core.plan.version import bump_plan_version
+from core.requirement.ledger import build_ledger, earned_credits, ledger_credits
+
+
+class Command(BaseCommand):
+    help = "Compare earned credits of plans on the ledger with ones recomputed from semester lectures. Run periodically, e.g. daily with cron, and once with --fix to backfill plans."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true', help='Rebuild ledger of plans mismatched or not on the ledger.')
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.NOTICE('Reconciling ledger of plans...'))
+        plan_ids = Plan.objects.order_by('id').values_list('id', flat=True)
+        mismatched = []
+        missing = []
+        for plan_id in plan_ids.iterator():
+            with transaction.atomic():
+                plan = Plan.objects.select_for_update().get(id=plan_id)
+                credits = ledger_credits(plan)
+                if credits is None:
+                    missing.append(plan_id)
+                elif self.nonzero(credits) != self.nonzero(earned_credits(plan)):
+                    mismatched.append(plan_id)
+                    self.stdout.write(self.style.WARNING(f'Plan {plan_id} has mismatched earned credits.'))
+                else:
+                    continue
+                if options['fix']:
+                    build_ledger(plan)
+                    bump_plan_version(plan_id)
+        self.stdout.write(f'{len(mismatched)} plans mismatched, {len(missing)} plans not on the ledger.')
+        if options['fix']:
+            self.stdout.write(self.style.SUCCESS(
+                f'Successfully rebuilt ledger of {len(mismatched) + len(missing)} plans.'))
+
+    @staticmethod
+    def nonzero(credits: dict) -> dict:
+        return {key: credit for key, credit in credits.items() if credit}
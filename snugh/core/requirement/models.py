@@ -33,3 +33,21 @@ class PlanRequirement(models.Model):
     required_credit = models.PositiveSmallIntegerField(default=0)
     earned_credit = models.PositiveSmallIntegerField(default=0)
     auto_calculate = models.BooleanField(default=False)
+
+
+class EarnedCredit(models.Model):
+    """
+    Ledger of credits a plan earned for a requirement type of a major, kept up to date as semester lectures change.
+    Credits earned by the whole plan are kept with the default major.
+    """
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['plan', 'major', 'requirement_type'],
+                name='earnedcredit_integrity_error'
+            )
+        ]
+    plan = models.ForeignKey(Plan, related_name='earnedcredit', on_delete=models.CASCADE)
+    major = models.ForeignKey(Major, related_name='earnedcredit', on_delete=models.CASCADE)
+    requirement_type = models.CharField(max_length=50, choices=REQUIREMENT_TYPE)
+    earned_credit = models.IntegerField(default=0)
@@ -1,17 +1,25 @@
-from django.test import TestCase
+import threading
+import time
+from unittest.mock import patch
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
 from rest_framework import status
 from core.major.models import Major
 from user.utils import UserFactory
 from user.const import *
 from core.major.const import *
 from core.plan.models import Plan
-from core.plan.utils import plan_major_requirement_generator
+from core.plan.utils import copy_plan, plan_major_requirement_generator
 from core.semester.const import *
 from core.semester.models import Semester
 from core.lecture.const import *
-from core.lecture.models import Lecture, SemesterLecture
+from core.lecture.models import Lecture, MajorLecture, SemesterLecture
+from core.lecture.recognition import RecognitionEngine
+from core.lecture.utils import recalculate_plans, update_lecture_info
 from core.history.models import RequirementChangeHistory
 from core.requirement.const import *
+from core.requirement.ledger import build_ledger, earned_credits, ledger_credits, plans_earned_credits
 from core.requirement.models import PlanRequirement
 
 
@@ -19,6 +27,7 @@ class RequirementTestCase(TestCase):
     """
     # Test Requirement APIs.
         [GET] requirement/<plan_id>/calculate/
+        [GET] requirement/compare/
         [PUT] requirement/<plan_id>/
     """
 
@@ -261,6 +270,181 @@ class RequirementTestCase(TestCase):
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
 
 
+    def test_earned_credit_ledger(self):
+        """
+        Test cases in keeping earned credits of plan in the ledger.
+            1) calculate is unchanged with plan on the ledger.
+            2) ledger follows credit change of semester lecture.
+            3) ledger follows deleting semester lecture.
+            4) ledger follows deleting semester.
+        """
+        def calculate():
+            response = self.client.get(
+                f'/requirement/{self.plan.id}/calculate/', 
+                HTTP_AUTHORIZATION=self.user_token, 
+                content_type="application/json")
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            return response.json()
+
+        def nonzero(credits):
+            return {key: credit for key, credit in credits.items() if credit}
+
+        # 1) calculate is unchanged with plan on the ledger.
+        self.assertIsNone(ledger_credits(self.plan))
+        expected = calculate()
+        build_ledger(self.plan)
+        self.assertEqual(calculate(), expected)
+
+        # 2) ledger follows credit change of semester lecture.
+        semesterlecture = SemesterLecture.objects.filter(semester=self.semester_1, recognized_major1=self.major_1).first()
+        response = self.client.put(
+            f'/lecture/{semesterlecture.id}/credit/', 
+            data={"credit": semesterlecture.credit + 1},
+            HTTP_AUTHORIZATION=self.user_token, 
+            content_type="application/json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(nonzero(ledger_credits(self.plan)), nonzero(earned_credits(self.plan)))
+        self.assertEqual(calculate()['all_progress']['all']['earned_credit'], 25)
+
+        # 3) ledger follows deleting semester lecture.
+        response = self.client.delete(
+            f'/lecture/{semesterlecture.id}/', 
+            HTTP_AUTHORIZATION=self.user_token, 
+            content_type="application/json")
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(nonzero(ledger_credits(self.plan)), nonzero(earned_credits(self.plan)))
+
+        # 4) ledger follows deleting semester.
+        response = self.client.delete(
+            f'/semester/{self.semester_2.id}/', 
+            HTTP_AUTHORIZATION=self.user_token, 
+            content_type="application/json")
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(nonzero(ledger_credits(self.plan)), nonzero(earned_credits(self.plan)))
+        ledger_data = calculate()
+        self.plan.earnedcredit.all().delete()
+        self.assertEqual(calculate(), ledger_data)
+
+
+    def test_calculate_requirement_not_modified(self):
+        """
+        Test cases in conditional requests of plan's progress.
+            1) not modified.
+            2) modified by updating requirements.
+        """
+        response = self.client.get(
+            f'/requirement/{self.plan.id}/calculate/', 
+            HTTP_AUTHORIZATION=self.user_token, 
+            content_type="application/json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response['ETag']
+
+        # 1) not modified.
+        response = self.client.get(
+            f'/requirement/{self.plan.id}/calculate/', 
+            HTTP_AUTHORIZATION=self.user_token, 
+            HTTP_IF_NONE_MATCH=etag,
+            content_type="application/json")
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        # 2) modified by updating requirements.
+        response = self.client.put(
+            f'/requirement/{self.plan.id}/', 
+            data={"all": 140},
+            HTTP_AUTHORIZATION=self.user_token, 
+            content_type="application/json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.get(
+            f'/requirement/{self.plan.id}/calculate/', 
+            HTTP_AUTHORIZATION=self.user_token, 
+            HTTP_IF_NONE_MATCH=etag,
+            content_type="application/json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['all_progress']['all']['required_credit'], 140)
+
+
+    def test_calculate_requirement_read_only(self):
+        """
+        Test cases in calculating plan's requirements without writes.
+            1) calculating does not write.
+            2) updating requirements finishes the first simulation.
+        """
+        # 1) calculating does not write.
+        self.assertTrue(Plan.objects.get(id=self.plan.id).is_first_simulation)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(
+                f'/requirement/{self.plan.id}/calculate/', 
+                HTTP_AUTHORIZATION=self.user_token, 
+                content_type="application/json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        writes = [query['sql'] for query in context.captured_queries if not query['sql'].startswith('SELECT')]
+        self.assertEqual(writes, [])
+        self.assertTrue(Plan.objects.get(id=self.plan.id).is_first_simulation)
+
+        # 2) updating requirements finishes the first simulation.
+        response = self.client.put(
+            f'/requirement/{self.plan.id}/', 
+            data={"all": 140},
+            HTTP_AUTHORIZATION=self.user_token, 
+            content_type="application/json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(Plan.objects.get(id=self.plan.id).is_first_simulation)
+
+
+    def test_compare_requirement(self):
+        """
+        Test cases in comparing plans' requirements.
+            1) compare plans.
+            2) number of queries does not grow with plans.
+            3) not plan's owner.
+            4) invalid plans.
+        """
+        # 1) compare plans.
+        copied_plan = copy_plan(self.user, self.plan.id)
+        expected = []
+        for plan in [self.plan, copied_plan]:
+            response = self.client.get(
+                f'/requirement/{plan.id}/calculate/', 
+                HTTP_AUTHORIZATION=self.user_token, 
+                content_type="application/json")
+            expected.append({"plan_id": plan.id, "plan_name": plan.plan_name, **response.json()})
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(
+                f'/requirement/compare/?plans={self.plan.id},{copied_plan.id}', 
+                HTTP_AUTHORIZATION=self.user_token, 
+                content_type="application/json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['plans'], expected)
+
+        # 2) number of queries does not grow with plans.
+        plans_queries = len(context.captured_queries)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(
+                f'/requirement/compare/?plans={self.plan.id}', 
+                HTTP_AUTHORIZATION=self.user_token, 
+                content_type="application/json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(context.captured_queries), plans_queries)
+
+        # 3) not plan's owner.
+        response = self.client.get(
+            f'/requirement/compare/?plans={self.plan.id},{copied_plan.id}', 
+            HTTP_AUTHORIZATION=self.stranger_token, 
+            content_type="application/json")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        # 4) invalid plans.
+        for plans, status_code in [
+            ('', status.HTTP_400_BAD_REQUEST),
+            ('1,a', status.HTTP_400_BAD_REQUEST),
+            (f'{self.plan.id},9999', status.HTTP_404_NOT_FOUND)]:
+            response = self.client.get(
+                f'/requirement/compare/?plans={plans}', 
+                HTTP_AUTHORIZATION=self.user_token, 
+                content_type="application/json")
+            self.assertEqual(response.status_code, status_code)
+
+
     def test_update_requirement(self):
         """
         Test cases in updating plan's requirements required credits.
@@ -534,3 +718,111 @@ class RequirementTestCase(TestCase):
             'all': 135, 
             'general': 40}
         self.assertEqual(data, result)
+
+
+@skipUnlessDBFeature('has_select_for_update')
+class LedgerConcurrencyTestCase(TransactionTestCase):
+    """
+    # Test the ledger of earned credits under concurrent changes of semester lectures.
+        Recalculations run in one thread, and a credit change in another while they hold the rows they read.
+    """
+    serialized_rollback = True
+
+    # Seconds a recalculation waits between reading semester lectures and writing them.
+    RACE_DELAY = 0.5
+
+    def setUp(self):
+        """
+            1) create user and plan.
+            2) create a lecture recognized by major of plan.
+        """
+        # 1) create user and plan.
+        self.majors = [{"major_name": "경영학과", "major_type": "single_major"}]
+        self.user = UserFactory.create(
+            email="ledger@test.com",
+            password="waffle1234",
+            entrance_year=2018,
+            full_name="ledger user",
+            majors=self.majors,
+            status=ACTIVE)
+        self.user_token = "Token " + str(self.user.auth_token)
+        self.plan = Plan.objects.create(user=self.user, plan_name="ledger plan")
+        plan_major_requirement_generator(self.plan, self.majors, 2018)
+        self.semester = Semester.objects.create(plan=self.plan, year=2018, semester_type=FIRST)
+
+        # 2) create a lecture recognized by major of plan.
+        self.lecture = Lecture.objects.create(
+            lecture_code="LEDGER.001", lecture_name="원장테스트", lecture_type=MAJOR_REQUIREMENT, credit=3)
+        MajorLecture.objects.create(
+            major=self.plan.planmajor.get().major,
+            lecture=self.lecture,
+            start_year=2000,
+            end_year=3000,
+            lecture_type=MAJOR_REQUIREMENT)
+
+    def test_recalculation_racing_credit_change(self):
+        """
+        Test cases in recalculating a plan while credit of its semester lecture changes.
+            1) update_lecture_info.
+            2) recalculate_plans.
+        """
+        # 1) update_lecture_info.
+        self.race(lambda: update_lecture_info(self.user, self.plan.id))
+
+        # 2) recalculate_plans.
+        self.race(lambda: recalculate_plans([self.plan.id]))
+
+    def race(self, recalculate):
+        """
+        Change credit of an unrecognized semester lecture after recalculate read it and before it wrote,
+        then check that the ledger equals earned credits recomputed from semester lectures.
+        """
+        SemesterLecture.objects.filter(semester__plan=self.plan).delete()
+        semesterlecture = SemesterLecture.objects.create(
+            semester=self.semester,
+            lecture=self.lecture,
+            lecture_type=MAJOR_REQUIREMENT,
+            lecture_type1=MAJOR_ELECTIVE,
+            credit=3,
+            recent_sequence=0)
+        build_ledger(self.plan)
+        read = threading.Event()
+        responses = []
+
+        def engine(*args, **kwargs):
+            read.set()
+            time.sleep(self.RACE_DELAY)
+            return RecognitionEngine(*args, **kwargs)
+
+        def run_recalculation():
+            try:
+                with transaction.atomic():
+                    recalculate()
+            finally:
+                connection.close()
+
+        def change_credit():
+            try:
+                responses.append(self.client.put(
+                    f'/lecture/{semesterlecture.id}/credit/',
+                    data={"credit": 4},
+                    HTTP_AUTHORIZATION=self.user_token,
+                    content_type="application/json"))
+            finally:
+                connection.close()
+
+        with patch('core.lecture.utils.RecognitionEngine', side_effect=engine):
+            recalculation = threading.Thread(target=run_recalculation)
+            recalculation.start()
+            self.assertTrue(read.wait(10))
+            change = threading.Thread(target=change_credit)
+            change.start()
+            recalculation.join()
+            change.join()
+
+        def nonzero(credits):
+            return {key: credit for key, credit in credits.items() if credit}
+
+        self.assertEqual(responses[0].status_code, status.HTTP_200_OK)
+        self.assertEqual(SemesterLecture.objects.get(id=semesterlecture.id).credit, 4)
+        self.assertEqual(nonzero(ledger_credits(self.plan)), nonzero(plans_earned_credits([self.plan.id])[self.plan.id]))
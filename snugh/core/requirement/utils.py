@@ -1,6 +1,12 @@
 """Utils related to Requirement APIs."""
 
-from typing import Union
+from typing import Dict, Iterable, Union
+from core.const import *
+from core.lecture.intervals import YearIntervalIndex
+from core.lecture.models import MajorLecture
+from core.major.models import Major
+from core.plan.models import Plan
+from core.requirement.ledger import LedgerKey, plans_credits
 from core.requirement.models import *
 
 
@@ -10,3 +16,104 @@ def calculate_progress(std: int, value: int) -> Union[int, float]:
         return 1
     else:
         return 1 if round(value / std, 2) > 1 else round(value / std, 2)
+
+
+def major_requirement_credits(majors: Iterable[Major]) -> YearIntervalIndex:
+    """Credits of major requirement lectures by major id, valid for the years of their curriculum."""
+    majorlectures = MajorLecture.objects.filter(major__in=majors, lecture_type=MAJOR_REQUIREMENT)\
+        .values_list('major_id', 'start_year', 'end_year', 'lecture__credit')
+    return YearIntervalIndex(majorlectures)
+
+
+def plan_progress(plan: Plan, credits: Dict[LedgerKey, int] = None) -> dict:
+    """
+    Progress of plan based on its plan requirements, without writing anything.
+    Earned credits come from the ledger, or from semester lectures for plans not on the ledger yet.
+    Pass credits from plans_credits when computing progress of several plans together.
+    Prefetch 'planmajor__major' and 'planrequirement__requirement__major' of plan.
+    """
+    majors_info = {}
+    for planmajor in plan.planmajor.all():
+        majors_info[planmajor.major_id] = {
+            'major_name':planmajor.major.major_name,
+            'major_type':planmajor.major.major_type
+        }
+
+    planrequirements = plan.planrequirement.all()
+    all_required_credit = 0
+    general_requirement_credit = 0
+    major_all_pr_list = {}
+    major_requirement_pr_list = {}
+
+    for pr in planrequirements:
+        req = pr.requirement
+        if req.requirement_type == ALL:
+            if all_required_credit < pr.required_credit:
+                all_required_credit = pr.required_credit
+        elif req.requirement_type == GENERAL:
+            if general_requirement_credit < pr.required_credit:
+                general_requirement_credit = pr.required_credit
+        elif req.requirement_type == MAJOR_ALL:
+            req_major_id = req.major.id
+            if req_major_id in majors_info.keys():
+                major_all_pr_list[req_major_id] = pr
+        elif req.requirement_type == MAJOR_REQUIREMENT:
+            req_major_id = req.major.id
+            if req_major_id in majors_info.keys():
+                major_requirement_pr_list[req_major_id] = pr
+
+    if credits is None:
+        credits = plans_credits([plan.id])[plan.id]
+    all_earned_credit = credits.get((DEFAULT_MAJOR_ID, ALL), 0)
+    general_earned_credit = credits.get((DEFAULT_MAJOR_ID, GENERAL), 0)
+    major_earned_credit = credits.get((DEFAULT_MAJOR_ID, MAJOR_ALL), 0)
+
+    major_requirement_progress_required  = 0
+    major_requirement_progress_earned = 0
+
+    for major_id, pr in major_all_pr_list.items():
+        major_requirement_progress_required += pr.required_credit
+        major_requirement_progress_earned += credits.get((major_id, MAJOR_ALL), 0)
+
+    all_requirement = {"required_credit": all_required_credit,
+                       "earned_credit": all_earned_credit,
+                       "progress": calculate_progress(all_required_credit, all_earned_credit)}
+
+    general_requirement = {"earned_credit": general_earned_credit,
+                         "progress": calculate_progress(general_requirement_credit, general_earned_credit)}
+
+    major_requirement = {"earned_credit": major_earned_credit,
+                           "progress": calculate_progress(major_requirement_progress_required, major_requirement_progress_earned)}
+
+    other_requirement = {"earned_credit": all_earned_credit - general_earned_credit - major_earned_credit}
+
+    all_progress_summary = {"all": all_requirement,
+                            "major": major_requirement,
+                            "general": general_requirement,
+                            "other": other_requirement,
+                            "current_planmajors": majors_info.values()
+                            }
+
+    # calculate major progress
+    major_progress = []
+    for major_id in majors_info.keys():
+        mr_rc = major_requirement_pr_list[major_id].required_credit
+        mr_ec = credits.get((major_id, MAJOR_REQUIREMENT), 0)
+        major_requirement_required_credit = {"required_credit": mr_rc,
+                                             "earned_credit": mr_ec,
+                                             "progress": calculate_progress(mr_rc, mr_ec)}
+
+        ma_rc = major_all_pr_list[major_id].required_credit
+        ma_ec = credits.get((major_id, MAJOR_ALL), 0)
+        major_all_required_credit = {"required_credit": ma_rc,
+                                     "earned_credit": ma_ec,
+                                     "progress": calculate_progress(ma_rc, ma_ec)}
+
+        major_progress.append({"major_id": major_id,
+                               "major_name": majors_info[major_id]['major_name'],
+                               "major_type": majors_info[major_id]['major_type'],
+                               "major_requirement_credit": major_requirement_required_credit,
+                               "major_all_credit": major_all_required_credit})
+
+    return {"all_progress": all_progress_summary,
+            "major_progress": major_progress}
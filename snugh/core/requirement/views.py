@@ -1,5 +1,5 @@
 from django.db import transaction
-from django.db.models import Prefetch, Sum
+from django.db.models import Prefetch, prefetch_related_objects
 from rest_framework import status, viewsets
 from rest_framework.response import Response
 from rest_framework.permissions import IsAdminUser
@@ -9,8 +9,11 @@ from core.major.serializers import MajorSerializer
 from core.major.const import *
 from core.plan.models import Plan
 from core.plan.serializers import PlanSerializer
+from core.plan.version import bump_plan_version, is_not_modified, plan_etag
+from core.requirement.const import COMPARED_PLANS_LIMIT, PROGRESS_PREFETCH
+from core.requirement.ledger import plans_credits
 from core.requirement.models import Requirement, PlanRequirement
-from core.requirement.utils import calculate_progress
+from core.requirement.utils import major_requirement_credits, plan_progress
 from core.history.models import RequirementChangeHistory
 from core.history.utils import requirement_histroy_generator
 from core.const import *
@@ -91,147 +94,46 @@ class RequirementViewSet(viewsets.GenericViewSet):
     # GET /requirement/:planId/calculate
     @action(methods=['GET'], detail=True)
     def calculate(self, request, pk=None):
-        """Show user plan's current progress based on plan requirements."""
-        plan = self.get_prefetch_related_object(
-            pk,
-            ['planmajor', 
-            'planrequirement', 
-            'planrequirement__requirement', 
-            'planrequirement__requirement__major', 
-            'semester']
-        )
-        majors = plan.planmajor.all().values('major', 'major__major_name', 'major__major_type')
-        majors_info = {}
-        for major in majors:
-            major_id = major['major']
-            major_name = major['major__major_name']
-            major_type = major['major__major_type']
-            majors_info[major_id] = {
-                'major_name':major_name,
-                'major_type':major_type
-            }
-
-        planrequirements = plan.planrequirement.all()
-        all_earned_credit = 0
-        all_required_credit = 0
-        general_earned_credit = 0
-        general_requirement_credit = 0
-        major_earned_credit = 0
-        major_all_pr_list = {}
-        major_requirement_pr_list = {}
-
-        for pr in planrequirements:
-            pr.earned_credit = 0
-            req = pr.requirement
-            if req.requirement_type == ALL:
-                if all_required_credit < pr.required_credit:
-                    all_required_credit = pr.required_credit
-                    all_planrequirement = pr
-            elif req.requirement_type == GENERAL:
-                if general_requirement_credit < pr.required_credit:
-                    general_requirement_credit = pr.required_credit
-                    general_planrequirement = pr
-            elif req.requirement_type == MAJOR_ALL:
-                req_major_id = req.major.id
-                if req_major_id in majors_info.keys():
-                    major_all_pr_list[req_major_id] = pr
-            elif req.requirement_type == MAJOR_REQUIREMENT:
-                req_major_id = req.major.id
-                if req_major_id in majors_info.keys():
-                    major_requirement_pr_list[req_major_id] = pr
-
-        sl_list = plan.semester.all().values(
-            'semesterlecture', 
-            'semesterlecture__credit', 
-            'semesterlecture__lecture_type1',
-            'semesterlecture__lecture_type2',
-            'semesterlecture__recognized_major1',
-            'semesterlecture__recognized_major2')
-
-        for sl in sl_list:
-            credit = sl['semesterlecture__credit']
-            lecture_type1 = sl['semesterlecture__lecture_type1']
-            lecture_type2 = sl['semesterlecture__lecture_type2']
-            recognized_major1_id = sl['semesterlecture__recognized_major1']
-            recognized_major2_id = sl['semesterlecture__recognized_major2']
-
-            # all
-            all_earned_credit+=credit
-
-            # general
-            if lecture_type1 == GENERAL:
-                general_earned_credit+=credit
-
-            # major_all, major_requirement (주의: 만약 plan의 major가 아닌데 전필/전선으로 되어 있으면 에러뜸)
-            elif lecture_type1 in [MAJOR_REQUIREMENT, MAJOR_ELECTIVE]:
-                major_earned_credit+=credit
-                major_all_pr_list[recognized_major1_id].earned_credit += credit
-                if lecture_type1 == MAJOR_REQUIREMENT:
-                    major_requirement_pr_list[recognized_major1_id].earned_credit += credit
-                if recognized_major2_id != DEFAULT_MAJOR_ID:
-                    if lecture_type2 in [MAJOR_REQUIREMENT, MAJOR_ELECTIVE]:
-                        major_all_pr_list[recognized_major2_id].earned_credit += credit
-                        if lecture_type2 == MAJOR_REQUIREMENT:
-                            major_requirement_pr_list[recognized_major2_id].earned_credit += credit
-
-        all_planrequirement.earned_credit = all_earned_credit
-        general_planrequirement.earned_credit = general_earned_credit
-
-        major_requirement_progress_required  = 0
-        major_requirement_progress_earned = 0
-
-        for pr in major_all_pr_list.values():
-            major_requirement_progress_required += pr.required_credit
-            major_requirement_progress_earned += pr.earned_credit
-        
-        all_requirement = {"required_credit": all_required_credit,
-                           "earned_credit": all_earned_credit,
-                           "progress": calculate_progress(all_required_credit, all_earned_credit)}
-
-        general_requirement = {"earned_credit": general_earned_credit,
-                             "progress": calculate_progress(general_requirement_credit, general_earned_credit)}
-
-        major_requirement = {"earned_credit": major_earned_credit,
-                               "progress": calculate_progress(major_requirement_progress_required, major_requirement_progress_earned)}
-
-        other_requirement = {"earned_credit": all_earned_credit - general_earned_credit - major_earned_credit}
-
-        all_progress_summary = {"all": all_requirement,
-                                "major": major_requirement,
-                                "general": general_requirement,
-                                "other": other_requirement,
-                                "current_planmajors": majors_info.values()
-                                }
-
-        # calculate major progress
-        major_progress = []
-        for major_id in majors_info.keys():
-            mr_rc = major_requirement_pr_list[major_id].required_credit
-            mr_ec = major_requirement_pr_list[major_id].earned_credit
-            major_requirement_required_credit = {"required_credit": mr_rc,
-                                                 "earned_credit": mr_ec,
-                                                 "progress": calculate_progress(mr_rc, mr_ec)}
-
-            ma_rc = major_all_pr_list[major_id].required_credit
-            ma_ec = major_all_pr_list[major_id].earned_credit
-            major_all_required_credit = {"required_credit": ma_rc,
-                                         "earned_credit": ma_ec,
-                                         "progress": calculate_progress(ma_rc, ma_ec)}
-
-            major_progress.append({"major_id": major_id,
-                                   "major_name": majors_info[major_id]['major_name'],
-                                   "major_type": majors_info[major_id]['major_type'],
-                                   "major_requirement_credit": major_requirement_required_credit,
-                                   "major_all_credit": major_all_required_credit})
-
-        if plan.is_first_simulation:
-            plan.is_first_simulation = False
-            plan.save()
-
-        PlanRequirement.objects.bulk_update(planrequirements, fields=['earned_credit'])
-
-        data = {"all_progress": all_progress_summary,
-                "major_progress": major_progress}
+        """
+        Show user plan's current progress based on plan requirements.
+        Returns 304 if If-None-Match has ETag of the plan's current version.
+        """
+        plan = self.get_prefetch_related_object(pk, [])
+        etag = plan_etag(plan.version)
+        if is_not_modified(request, etag):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+        prefetch_related_objects([plan], *PROGRESS_PREFETCH)
+        data = plan_progress(plan)
+        return Response(data, status=status.HTTP_200_OK, headers={'ETag': etag})
+
+
+    # GET /requirement/compare?plans=(int),(int)
+    @action(methods=['GET'], detail=False)
+    def compare(self, request):
+        """
+        Compare progress of user's plans side by side, computed together in one pass.
+            ex) /requirement/compare/?plans=1,2,3
+        """
+        plan_ids = request.query_params.get('plans')
+        if not plan_ids:
+            raise FieldError("Field missing [plans]")
+        try:
+            plan_ids = list(dict.fromkeys(int(plan_id) for plan_id in plan_ids.split(',')))
+        except ValueError:
+            raise FieldError("Invalid field [plans]")
+        if len(plan_ids) > COMPARED_PLANS_LIMIT:
+            raise FieldError("Invalid field [plans]")
+        plans = Plan.objects.select_related('user').prefetch_related(*PROGRESS_PREFETCH).in_bulk(plan_ids)
+        if len(plans) != len(plan_ids):
+            raise NotFound()
+        for plan in plans.values():
+            self.check_object_permissions(request, plan)
+        credits = plans_credits(plan_ids)
+        data = {"plans": [
+            {"plan_id": plan_id,
+             "plan_name": plans[plan_id].plan_name,
+             **plan_progress(plans[plan_id], credits[plan_id])}
+            for plan_id in plan_ids]}
         return Response(data, status=status.HTTP_200_OK)
 
 
@@ -292,15 +194,13 @@ class RequirementViewSet(viewsets.GenericViewSet):
     # PUT /requirement/:planId
     @transaction.atomic
     def update(self, request, pk=None):
-        """Update plan requirements required credits."""
+        """Update plan requirements required credits, which finishes the first simulation of plan."""
         user = request.user
         plan = self.get_prefetch_related_object(
             pk,
             ["planrequirement",
             "planrequirement__requirement",
-            "planrequirement__requirement__major",
-            "planrequirement__requirement__major__majorlecture",
-            "planrequirement__requirement__major__majorlecture__lecture"]
+            "planrequirement__requirement__major"]
         )
         majors = request.data.get('majors', [])
         all_credit = request.data.get('all', -1)
@@ -315,6 +215,7 @@ class RequirementViewSet(viewsets.GenericViewSet):
         year_std = user.userprofile.entrance_year
         histories = []
         pr_list = []
+        major_requirement_credit_index = None
         for pr in planrequirements:
             req = pr.requirement
             if not (req.major.major_name in data['majors'].keys()):
@@ -354,12 +255,10 @@ class RequirementViewSet(viewsets.GenericViewSet):
                         if req.major.major_name == major['major_name'] and req.major.major_type == major['major_type']:
                             pr.auto_calculate = major.get('auto_calculate', False)
                             if pr.auto_calculate:
-                                major_requirement_credit = req.major.majorlecture.filter(
-                                    lecture_type=MAJOR_REQUIREMENT, 
-                                    start_year__lte=year_std,
-                                    end_year__gte=year_std).values(
-                                        'lecture__credit'
-                                    ).aggregate(mrc=Sum('lecture__credit'))['mrc']
+                                if major_requirement_credit_index is None:
+                                    major_requirement_credit_index = major_requirement_credits(
+                                        [planrequirement.requirement.major for planrequirement in planrequirements])
+                                major_requirement_credit = sum(major_requirement_credit_index.get(req.major.id, year_std))
                             else:
                                 major_requirement_credit = major.get("major_requirement_credit", -1)
                                 
@@ -403,6 +302,10 @@ class RequirementViewSet(viewsets.GenericViewSet):
         data["all"] = all_pr.required_credit
         data["general"] = gen_pr.required_credit
         PlanRequirement.objects.bulk_update(pr_list, fields=["required_credit"])
+        if plan.is_first_simulation:
+            plan.is_first_simulation = False
+            plan.save(update_fields=['is_first_simulation'])
+        bump_plan_version(plan.id)
         RequirementChangeHistory.objects.bulk_update(histories, ["change_count", "updated_at"])
 
         for major_name, value in data['majors'].items():
@@ -35,9 +35,10 @@ class SemesterSerializer(serializers.ModelSerializer):
 
 
     def get_lectures(self, semester):
-        semesterlectures = semester.semesterlecture.select_related('lecture', 'recognized_major1', 'recognized_major2').all().order_by('recent_sequence')
+        semesterlectures = semester.semesterlecture.select_related('lecture', 'recognized_major1', 'recognized_major2').all().order_by('recent_sequence', 'id')
         ls = [] 
-        for semesterlecture in semesterlectures:
+        # recent_sequence is a sparse ordering key, exposed as a dense sequence.
+        for sequence, semesterlecture in enumerate(semesterlectures):
             lecture = semesterlecture.lecture
             ls.append({
                 "semesterlecture_id": semesterlecture.id,
@@ -54,6 +55,6 @@ class SemesterSerializer(serializers.ModelSerializer):
                 "recognized_major_type2": semesterlecture.recognized_major2.major_type,
                 "lecture_type2": semesterlecture.lecture_type2,
                 "is_modified": semesterlecture.is_modified,
-                "recent_sequence": semesterlecture.recent_sequence
+                "recent_sequence": sequence
             })
         return ls
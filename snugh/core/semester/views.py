@@ -2,6 +2,9 @@ from django.db import transaction
 from rest_framework import status, viewsets, generics
 from rest_framework.response import Response
 from snugh.permissions import IsOwnerOrCreateReadOnly
+from core.lecture.search import bump_plan_search_version
+from core.plan.version import bump_plan_version, is_not_modified, plan_etag
+from core.requirement.ledger import CreditLedger
 from core.semester.models import Semester
 from core.semester.serializers import SemesterSerializer
 
@@ -10,7 +13,7 @@ class SemesterViewSet(viewsets.GenericViewSet, generics.RetrieveDestroyAPIView):
     """
     Generic ViewSet of Semester Object.
     """
-    queryset = Semester.objects.all()
+    queryset = Semester.objects.select_related('plan')
     serializer_class = SemesterSerializer
     permission_classes = [IsOwnerOrCreateReadOnly]
 
@@ -21,16 +24,32 @@ class SemesterViewSet(viewsets.GenericViewSet, generics.RetrieveDestroyAPIView):
         data = request.data
         serializer = self.get_serializer(data=data)
         serializer.is_valid(raise_exception=True)
-        serializer.save()
+        semester = serializer.save()
+        bump_plan_version(semester.plan_id)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     
     # DEL /semester/:semesterId
+    @transaction.atomic
     def destroy(self, request, pk=None):
         """Destroy semester."""
         return super().destroy(request, pk)
+
+    def perform_destroy(self, instance):
+        ledger = CreditLedger(instance.plan_id)
+        for semesterlecture in instance.semesterlecture.all():
+            ledger.remove(semesterlecture)
+        instance.delete()
+        ledger.save()
+        bump_plan_search_version(instance.plan_id)
+        bump_plan_version(instance.plan_id)
     
     # GET /semester/:semesterId
     def retrieve(self, request, pk=None):
-        """Retrieve semester."""
-        return super().retrieve(request, pk)
+        """Retrieve semester. Returns 304 if If-None-Match has ETag of the plan's current version."""
+        semester = self.get_object()
+        etag = plan_etag(semester.plan.version)
+        if is_not_modified(request, etag):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+        serializer = self.get_serializer(semester)
+        return Response(serializer.data, status=status.HTTP_200_OK, headers={'ETag': etag})
@@ -5,6 +5,7 @@ from core.lecture.views import LectureViewSet
 from core.requirement.views import RequirementViewSet
 from core.semester.views import SemesterViewSet
 from core.major.views import MajorViewSet
+from core.job.views import JobViewSet
 
 app_name = 'core'
 
@@ -14,6 +15,7 @@ router.register('requirement', RequirementViewSet, basename='requirement')
 router.register('lecture', LectureViewSet, basename='lecture')
 router.register('semester', SemesterViewSet, basename='semester')
 router.register('major', MajorViewSet, basename='major')  
+router.register('job', JobViewSet, basename='job')
 
 urlpatterns = [
     path('', include((router.urls))),
@@ -123,6 +123,9 @@ CACHES = {
     }
 }
 
+# Serve lecture search from a per-worker snapshot of Lecture (core.lecture.catalog).
+LECTURE_CATALOG_ENABLED = True
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.1/ref/settings/#auth-password-validators